@@ -23,9 +23,18 @@ document.addEventListener('DOMContentLoaded', () => {
     const urlParams = new URLSearchParams(window.location.search);
     let botId = urlParams.get('bot_id');
     const backendUrl = urlParams.get('backend_url');
+    const agentToken = urlParams.get('agent_token'); // Identifies our bot even if {BOT_ID} wasn't substituted
+    
+    // Build a backend API URL that carries our agent token
+    const apiUrl = (path) => {
+        if (!agentToken) return `${backendUrl}${path}`;
+        const separator = path.includes('?') ? '&' : '?';
+        return `${backendUrl}${path}${separator}agent_token=${encodeURIComponent(agentToken)}`;
+    };
     
     console.log('Raw URL parameters:', {
         botId: botId,
+        agentToken: agentToken,
         backendUrl: backendUrl,
         fullUrl: window.location.href
     });
@@ -97,8 +106,8 @@ document.addEventListener('DOMContentLoaded', () => {
             try {
                 console.log('Attempting to get the latest deployed bot ID from backend...');
                 
-                // First, try to get the exact bot ID that was just deployed
-                const latestBotResponse = await fetch(`${backendUrl}/api/latest-bot-id`);
+                // First, try to get the exact bot ID for our agent token (or the one just deployed)
+                const latestBotResponse = await fetch(apiUrl('/api/latest-bot-id'));
                 if (latestBotResponse.ok) {
                     const latestBotData = await latestBotResponse.json();
                     if (latestBotData.success && latestBotData.bot_id) {
@@ -212,9 +221,11 @@ document.addEventListener('DOMContentLoaded', () => {
         let audioStatus = 'idle';
         let isAudioPlaying = false;
         let transcriptPollingInterval = null;
-        let audioPollingInterval = null;
         let lastTimestamp = 0;
-        let lastAudioCommandTimestamp = 0; // Track last audio command to prevent duplicates
+        let lastSeq = 0; // Highest transcript sequence number seen, sent as ?since= when polling
+        let transcriptStream = null; // EventSource pushing transcript lines as they arrive
+        let lastAudioCommandId = 0; // Last audio command handled - acknowledged on the next long poll
+        let audioCommandEpoch = ''; // Server queue the IDs belong to - they restart with a new one
         let lastProcessedAudioCommand = null; // Track last processed chat audio command
         let versionInfo = null;
         
@@ -251,9 +262,33 @@ document.addEventListener('DOMContentLoaded', () => {
         updateDebugInfo();
         setInterval(updateDebugInfo, 3000);
         
+        // Caption latency tracing - how long each line took from arriving here to being painted,
+        // reported back in batches so the server can put together the whole pipeline's latency
+        let renderReports = [];
+        const traceRendered = (lines, receivedAt) => {
+            // The next frame is when the new lines are actually on screen
+            requestAnimationFrame(() => {
+                const renderMs = Math.round(performance.now() - receivedAt);
+                lines.forEach(line => {
+                    if (line.seq) renderReports.push({ seq: line.seq, render_ms: renderMs });
+                });
+            });
+        };
+        const flushRenderReports = () => {
+            if (renderReports.length === 0) return;
+            fetch(apiUrl(`/api/bot/${botId}/caption-trace`), {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ rendered: renderReports.splice(0, 100) }),
+                keepalive: true
+            }).catch(error => console.error('Caption trace report error:', error));
+        };
+        setInterval(flushRenderReports, 2000);
+        
         // Message display
-        const addMessage = (sender, message) => {
+        const addMessage = (sender, message, seq) => {
             const messageEl = document.createElement('div');
+            if (seq) messageEl.dataset.seq = seq; // Lets a merged line find the fragment it replaces
             messageEl.style.cssText = `
                 margin-bottom: 10px; padding: 10px; border-radius: 8px;
                 background: rgba(96, 165, 250, 0.2); 
@@ -272,6 +307,7 @@ document.addEventListener('DOMContentLoaded', () => {
             while (transcriptEl.children.length > 20) {
                 transcriptEl.removeChild(transcriptEl.firstChild);
             }
+            return messageEl;
         };
         
         // HTML5 audio element approach - exactly like the working dashboard
@@ -346,42 +382,55 @@ document.addEventListener('DOMContentLoaded', () => {
             }
         };
         
-        // Polling functions with moderate reduction during audio
+        // Long-poll for the next audio command; the server holds the request until one arrives
         const pollAudioCommands = async () => {
             try {
-                const response = await fetch(`${backendUrl}/api/bot/${botId}/audio-command`);
-                if (!response.ok) return;
+                const response = await fetch(apiUrl(`/api/bot/${botId}/audio-command?wait=25&ack=${lastAudioCommandId}&epoch=${encodeURIComponent(audioCommandEpoch)}`));
+                if (!response.ok) return false;
                 
                 const data = await response.json();
-                if (data.command && data.timestamp) {
-                    // Prevent duplicate commands by checking timestamp
-                    if (data.timestamp <= lastAudioCommandTimestamp) {
-                        console.log('Skipping duplicate audio command:', data.command, 'timestamp:', data.timestamp);
-                        return;
-                    }
-                    
-                    lastAudioCommandTimestamp = data.timestamp;
-                    console.log('New audio command:', data);
-                    
-                    if (data.command === 'play' && data.audio_file) {
-                        // Don't play if already playing the same file
-                        if (isAudioPlaying && currentAudio && currentAudio.src.includes(data.audio_file)) {
-                            console.log('Already playing this file, skipping duplicate play command');
-                            return;
-                        }
-                        await playAudioFile(data.audio_file);
-                    } else if (data.command === 'stop') {
-                        stopAudio();
-                    }
+                if (!data.id || data.command === 'none') return true;
+                
+                // The server's queue started over (restart, or the bot's queue was removed) - so do the IDs
+                if (data.epoch !== audioCommandEpoch) {
+                    audioCommandEpoch = data.epoch;
+                    lastAudioCommandId = 0;
+                }
+                
+                // A redelivered command we already handled - the ack on the next poll clears it
+                if (data.id <= lastAudioCommandId) {
+                    console.log('Skipping duplicate audio command:', data.command, 'id:', data.id);
+                    return true;
                 }
+                
+                lastAudioCommandId = data.id;
+                console.log('New audio command:', data);
+                
+                if (data.command === 'play' && data.audio_file) {
+                    await playAudioFile(data.audio_file);
+                } else if (data.command === 'stop') {
+                    stopAudio();
+                }
+                return true;
             } catch (error) {
                 console.error('Audio polling error:', error);
+                return false;
+            }
+        };
+        
+        // Keep one long poll open at all times, backing off after errors
+        const audioCommandLoop = async () => {
+            while (true) {
+                if (!await pollAudioCommands()) {
+                    await new Promise(resolve => setTimeout(resolve, 5000));
+                }
             }
         };
         
         const fetchTranscript = async () => {
             try {
-                const response = await fetch(`${backendUrl}/api/bot/${botId}/transcript`);
+                const response = await fetch(apiUrl(`/api/bot/${botId}/transcript?since=${lastSeq}`));
+                const receivedAt = performance.now();
                 if (!response.ok) {
                     statusEl.textContent = `Error: ${response.status}`;
                     return;
@@ -389,7 +438,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 
                 const data = await response.json();
                 if (data && Array.isArray(data)) {
-                    processTranscript(data);
+                    processTranscript(data, receivedAt);
                 } else {
                     statusEl.textContent = 'Connected - No transcript data';
                 }
@@ -399,7 +448,7 @@ document.addEventListener('DOMContentLoaded', () => {
             }
         };
         
-        const processTranscript = (transcriptLines) => {
+        const processTranscript = (transcriptLines, receivedAt = performance.now()) => {
             if (!Array.isArray(transcriptLines) || transcriptLines.length === 0) {
                 statusEl.textContent = 'Connected - No transcript data';
                 return;
@@ -411,26 +460,71 @@ document.addEventListener('DOMContentLoaded', () => {
             
             if (newLines.length > 0) {
                 newLines.forEach(line => {
-                    addMessage(line.speaker, line.text);
+                    // A merged line replaces the fragment it grew from
+                    const replaced = line.replaces && transcriptEl.querySelector(`[data-seq="${line.replaces}"]`);
+                    if (replaced) {
+                        replaced.dataset.seq = line.seq;
+                        replaced.lastElementChild.textContent = line.text;
+                    } else {
+                        addMessage(line.speaker, line.text, line.seq);
+                    }
                 });
+                traceRendered(newLines, receivedAt);
                 lastTimestamp = newLines[newLines.length - 1].timestamp;
+                lastSeq = newLines[newLines.length - 1].seq || lastSeq;
                 statusEl.textContent = 'Connected - Transcript updated';
             }
         };
         
+        // Push-based transcript updates - the server sends each line as it arrives
+        const startTranscriptStream = () => {
+            if (!window.EventSource) {
+                return false;
+            }
+            
+            // EventSource reconnects by itself and resumes via Last-Event-ID
+            transcriptStream = new EventSource(apiUrl(`/api/bot/${botId}/transcript/stream`));
+            
+            transcriptStream.addEventListener('transcript', (event) => {
+                try {
+                    processTranscript([JSON.parse(event.data)], performance.now());
+                } catch (error) {
+                    console.error('Transcript stream parse error:', error);
+                }
+            });
+            
+            transcriptStream.onopen = () => {
+                console.log('📡 Transcript stream connected');
+                statusEl.textContent = 'Connected - Streaming transcript';
+            };
+            
+            transcriptStream.onerror = () => {
+                if (transcriptStream.readyState === EventSource.CLOSED) {
+                    // The browser gave up reconnecting - fall back to polling
+                    console.warn('📡 Transcript stream closed, falling back to polling');
+                    transcriptStream = null;
+                    startPolling();
+                } else {
+                    statusEl.textContent = 'Reconnecting transcript stream...';
+                }
+            };
+            
+            return true;
+        };
+        
         // Optimized polling - much less aggressive during audio to prevent choppiness
         const startPolling = () => {
             clearInterval(transcriptPollingInterval);
-            clearInterval(audioPollingInterval);
             
             // Much more conservative polling during audio playback
             const transcriptInterval = isAudioPlaying ? 15000 : 3000;   // 15s during audio, 3s normally
-            const audioInterval = isAudioPlaying ? 20000 : 5000;        // 20s during audio, 5s normally
             
-            console.log(`Polling intervals - Transcript: ${transcriptInterval}ms, Audio: ${audioInterval}ms (Audio playing: ${isAudioPlaying})`);
+            console.log(`Polling intervals - Transcript: ${transcriptStream ? 'streaming' : transcriptInterval + 'ms'}, Audio: long poll (Audio playing: ${isAudioPlaying})`);
             
-            transcriptPollingInterval = setInterval(fetchTranscript, transcriptInterval);
-            audioPollingInterval = setInterval(pollAudioCommands, audioInterval);
+            // Only poll the transcript when the stream is unavailable
+            if (!transcriptStream) {
+                transcriptPollingInterval = setInterval(fetchTranscript, transcriptInterval);
+            }
         };
         
         // Initialize
@@ -439,15 +533,17 @@ document.addEventListener('DOMContentLoaded', () => {
         addMessage("AI Assistant", "Hello! Connected to the meeting.");
         addMessage("System", `Bot ID: ${botId.substring(0, 8)}...`);
         
-        // Start polling
-        setTimeout(fetchTranscript, 500);
-        setTimeout(pollAudioCommands, 1000);
+        // Start streaming, falling back to polling when EventSource isn't available
+        if (!startTranscriptStream()) {
+            setTimeout(fetchTranscript, 500);
+        }
+        setTimeout(audioCommandLoop, 1000);
         startPolling();
         
         // Monitor chat messages for audio commands
         const checkForAudioCommands = async () => {
             try {
-                const response = await fetch(`${backendUrl}/api/bot/${botId}/chat-messages`);
+                const response = await fetch(apiUrl(`/api/bot/${botId}/chat-messages`));
                 if (!response.ok) return;
                 
                 const data = await response.json();
@@ -22,6 +22,14 @@ document.addEventListener('DOMContentLoaded', () => {
     const urlParams = new URLSearchParams(window.location.search);
     const botId = urlParams.get('bot_id');
     const backendUrl = urlParams.get('backend_url');
+    const agentToken = urlParams.get('agent_token'); // Identifies our bot even if {BOT_ID} wasn't substituted
+    
+    // Build a backend API URL that carries our agent token
+    const apiUrl = (path) => {
+        if (!agentToken) return `${backendUrl}${path}`;
+        const separator = path.includes('?') ? '&' : '?';
+        return `${backendUrl}${path}${separator}agent_token=${encodeURIComponent(agentToken)}`;
+    };
     
     if (!backendUrl || !botId) {
         statusEl.textContent = 'Error: Missing parameters';
@@ -44,8 +52,11 @@ document.addEventListener('DOMContentLoaded', () => {
     let audioStatus = 'idle';
     let isAudioPlaying = false;
     let transcriptPollingInterval = null;
-    let audioPollingInterval = null;
     let lastTimestamp = 0;
+    let lastSeq = 0; // Highest transcript sequence number seen, sent as ?since= when polling
+    let transcriptStream = null; // EventSource pushing transcript lines as they arrive
+    let lastAudioCommandId = 0; // Last audio command handled - acknowledged on the next long poll
+    let audioCommandEpoch = ''; // Server queue the IDs belong to - they restart with a new one
     
     console.log(`Bot ID: ${botId}, Backend: ${backendUrl}`);
     
@@ -74,9 +85,33 @@ document.addEventListener('DOMContentLoaded', () => {
     updateDebugInfo();
     setInterval(updateDebugInfo, 3000);
     
+    // Caption latency tracing - how long each line took from arriving here to being painted,
+    // reported back in batches so the server can put together the whole pipeline's latency
+    let renderReports = [];
+    const traceRendered = (lines, receivedAt) => {
+        // The next frame is when the new lines are actually on screen
+        requestAnimationFrame(() => {
+            const renderMs = Math.round(performance.now() - receivedAt);
+            lines.forEach(line => {
+                if (line.seq) renderReports.push({ seq: line.seq, render_ms: renderMs });
+            });
+        });
+    };
+    const flushRenderReports = () => {
+        if (renderReports.length === 0) return;
+        fetch(apiUrl(`/api/bot/${botId}/caption-trace`), {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ rendered: renderReports.splice(0, 100) }),
+            keepalive: true
+        }).catch(error => console.error('Caption trace report error:', error));
+    };
+    setInterval(flushRenderReports, 2000);
+    
     // Message display
-    const addMessage = (sender, message) => {
+    const addMessage = (sender, message, seq) => {
         const messageEl = document.createElement('div');
+        if (seq) messageEl.dataset.seq = seq; // Lets a merged line find the fragment it replaces
         messageEl.style.cssText = `
             margin-bottom: 10px; padding: 10px; border-radius: 8px;
             background: rgba(96, 165, 250, 0.2); 
@@ -95,6 +130,7 @@ document.addEventListener('DOMContentLoaded', () => {
         while (transcriptEl.children.length > 20) {
             transcriptEl.removeChild(transcriptEl.firstChild);
         }
+        return messageEl;
     };
     
     // Audio functions
@@ -165,14 +201,20 @@ document.addEventListener('DOMContentLoaded', () => {
         startPolling();
     };
     
-    // Polling functions
+    // Long-poll for the next audio command; the server holds the request until one arrives
     const pollAudioCommands = async () => {
         try {
-            const response = await fetch(`${backendUrl}/api/bot/${botId}/audio-command`);
-            if (!response.ok) return;
+            const response = await fetch(apiUrl(`/api/bot/${botId}/audio-command?wait=25&ack=${lastAudioCommandId}&epoch=${encodeURIComponent(audioCommandEpoch)}`));
+            if (!response.ok) return false;
             
             const data = await response.json();
-            if (data.command) {
+            // The server's queue started over (restart, or the bot's queue was removed) - so do the IDs
+            if (data.id && data.epoch !== audioCommandEpoch) {
+                audioCommandEpoch = data.epoch;
+                lastAudioCommandId = 0;
+            }
+            if (data.id && data.id > lastAudioCommandId) {
+                lastAudioCommandId = data.id;
                 console.log('Audio command:', data);
                 if (data.command === 'play' && data.audio_file) {
                     await playAudioFile(data.audio_file);
@@ -180,14 +222,26 @@ document.addEventListener('DOMContentLoaded', () => {
                     stopAudio();
                 }
             }
+            return true;
         } catch (error) {
             console.error('Audio polling error:', error);
+            return false;
+        }
+    };
+    
+    // Keep one long poll open at all times, backing off after errors
+    const audioCommandLoop = async () => {
+        while (true) {
+            if (!await pollAudioCommands()) {
+                await new Promise(resolve => setTimeout(resolve, 5000));
+            }
         }
     };
     
     const fetchTranscript = async () => {
         try {
-            const response = await fetch(`${backendUrl}/api/bot/${botId}/transcript`);
+            const response = await fetch(apiUrl(`/api/bot/${botId}/transcript?since=${lastSeq}`));
+            const receivedAt = performance.now();
             if (!response.ok) {
                 statusEl.textContent = `Error: ${response.status}`;
                 return;
@@ -195,7 +249,7 @@ document.addEventListener('DOMContentLoaded', () => {
             
             const data = await response.json();
             if (data.transcript && Array.isArray(data.transcript)) {
-                processTranscript(data.transcript);
+                processTranscript(data.transcript, receivedAt);
             } else {
                 statusEl.textContent = 'Connected - No transcript data';
             }
@@ -205,7 +259,7 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
     
-    const processTranscript = (transcriptLines) => {
+    const processTranscript = (transcriptLines, receivedAt = performance.now()) => {
         if (!Array.isArray(transcriptLines) || transcriptLines.length === 0) {
             statusEl.textContent = 'Connected - No transcript data';
             return;
@@ -217,26 +271,63 @@ document.addEventListener('DOMContentLoaded', () => {
         
         if (newLines.length > 0) {
             newLines.forEach(line => {
-                addMessage(line.speaker, line.text);
+                // A merged line replaces the fragment it grew from
+                const replaced = line.replaces && transcriptEl.querySelector(`[data-seq="${line.replaces}"]`);
+                if (replaced) {
+                    replaced.dataset.seq = line.seq;
+                    replaced.lastElementChild.textContent = line.text;
+                } else {
+                    addMessage(line.speaker, line.text, line.seq);
+                }
             });
+            traceRendered(newLines, receivedAt);
             lastTimestamp = newLines[newLines.length - 1].timestamp;
+            lastSeq = newLines[newLines.length - 1].seq || lastSeq;
             statusEl.textContent = 'Connected - Transcript updated';
         }
     };
     
+    // Push-based transcript updates - the server sends each line as it arrives
+    const startTranscriptStream = () => {
+        if (!window.EventSource) {
+            return false;
+        }
+        
+        // EventSource reconnects by itself and resumes via Last-Event-ID
+        transcriptStream = new EventSource(apiUrl(`/api/bot/${botId}/transcript/stream`));
+        
+        transcriptStream.addEventListener('transcript', (event) => {
+            try {
+                processTranscript([JSON.parse(event.data)], performance.now());
+            } catch (error) {
+                console.error('Transcript stream parse error:', error);
+            }
+        });
+        
+        transcriptStream.onerror = () => {
+            if (transcriptStream.readyState === EventSource.CLOSED) {
+                // The browser gave up reconnecting - fall back to polling
+                transcriptStream = null;
+                startPolling();
+            }
+        };
+        
+        return true;
+    };
+    
     // Smart polling with reduced frequency during audio
     const startPolling = () => {
         clearInterval(transcriptPollingInterval);
-        clearInterval(audioPollingInterval);
         
         // Reduce polling when audio is playing to minimize choppiness
         const transcriptInterval = isAudioPlaying ? 6000 : 2000;  // 6s during audio, 2s normally
-        const audioInterval = isAudioPlaying ? 10000 : 5000;      // 10s during audio, 5s normally
         
-        console.log(`Polling intervals - Transcript: ${transcriptInterval}ms, Audio: ${audioInterval}ms`);
+        console.log(`Polling intervals - Transcript: ${transcriptStream ? 'streaming' : transcriptInterval + 'ms'}, Audio: long poll`);
         
-        transcriptPollingInterval = setInterval(fetchTranscript, transcriptInterval);
-        audioPollingInterval = setInterval(pollAudioCommands, audioInterval);
+        // Only poll the transcript when the stream is unavailable
+        if (!transcriptStream) {
+            transcriptPollingInterval = setInterval(fetchTranscript, transcriptInterval);
+        }
     };
     
     // Initialize
@@ -245,9 +336,11 @@ document.addEventListener('DOMContentLoaded', () => {
     addMessage("AI Assistant", "Hello! Connected to the meeting.");
     addMessage("System", `Bot ID: ${botId.substring(0, 8)}...`);
     
-    // Start polling
-    setTimeout(fetchTranscript, 500);
-    setTimeout(pollAudioCommands, 1000);
+    // Start streaming, falling back to polling when EventSource isn't available
+    if (!startTranscriptStream()) {
+        setTimeout(fetchTranscript, 500);
+    }
+    setTimeout(audioCommandLoop, 1000);
     startPolling();
     
     console.log('🤖 Agent v1.0.9 initialized with optimized audio support');
@@ -1,15 +1,35 @@
 # app.py - Flask backend
 import os
 import requests
-from flask import Flask, request, jsonify, render_template, send_from_directory, Response
+from flask import Flask, request, jsonify, render_template, send_from_directory, send_file, Response, g
 from flask_cors import CORS
 from dotenv import load_dotenv
 import threading
 import time
 import json
-from datetime import datetime
-import re
-import base64
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+from werkzeug.http import http_date, is_resource_modified
+from werkzeug.utils import send_file as send_file_from_environ
+import mimetypes
+import mmap
+import uuid
+import atexit
+from transcript_buffer import lines_since, snapshot_body_since, word_timings
+from transcript_log import TranscriptLog
+from transcript_search import TranscriptIndex
+from recall_client import RecallClient, LATENCY_BUCKETS_MS
+from bulk_ops import BulkJobs
+from ingest_queue import IngestQueue
+from dedup import DedupWindow
+from json_stream import iter_json_values
+from transcript_export import EXPORT_FORMATS, iter_log_lines, render, gzip_stream, encode_stream
+from ttl_cache import TTLCache
+from audio_cache import AudioPayloadCache
+from bot_registry import new_agent_token
+from state_backend import create_backend
+from caption_trace import CaptionTracer, STAGES, STAGE_RECALL
+from metrics import MetricsRegistry, render_histogram
 
 # Load environment variables from .env file
 load_dotenv()
@@ -18,6 +38,34 @@ app = Flask(__name__)
 # Configure CORS to allow requests from any origin - needed for recall.ai/Zoom integration
 CORS(app, resources={r"/*": {"origins": "*", "allow_headers": "*", "expose_headers": "*"}})
 
+# Prometheus metrics, scraped from /metrics
+metrics = MetricsRegistry()
+http_requests = metrics.counter('http_requests_total', 'HTTP requests by route, method and status',
+                                ('route', 'method', 'status'))
+http_request_seconds = metrics.histogram('http_request_duration_seconds', 'HTTP request latency by route',
+                                         ('route', 'method'))
+webhook_events = metrics.counter('transcript_webhook_events_total',
+                                 'transcript.data events received, by outcome', ('outcome',))
+transcript_lines_applied = metrics.counter('transcript_lines_applied_total',
+                                           'Transcript lines applied by the ingest workers')
+audio_commands_served = metrics.counter('audio_commands_served_total', 'Audio commands delivered to agent pages')
+# Per-event console logging (every transcript line, audio command and ping) - off by default
+VERBOSE_LOGGING = os.environ.get('VERBOSE_LOGGING', '').lower() in ('1', 'true', 'yes')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # The route pattern, not the path, so bot IDs don't each become a series
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        http_request_seconds.observe(time.perf_counter() - started, route, request.method)
+        http_requests.inc(route, request.method, str(response.status_code))
+    return response
+
 RECALL_API_KEY = os.environ.get('RECALL_API_KEY')
 RECALL_REGION = os.environ.get('RECALL_REGION', 'us-west-2')
 AGENT_URL = os.environ.get('AGENT_URL', 'https://joehardy3030.github.io/zoom-ai/agent.html')
@@ -32,8 +80,18 @@ def load_version():
 
 VERSION_INFO = load_version()
 
-# Global variable to store the most recently deployed bot ID
-most_recent_bot_id = None
+# Where sessions, transcript buffers, audio commands and job progress live: 'memory' for a
+# single process, 'sqlite' when several worker processes must see each other's writes
+state_backend = create_backend(os.environ.get('STATE_BACKEND', 'memory'),
+                               path=os.environ.get('STATE_DB_PATH', 'state.db'))
+print(f"Debug: State backend: {state_backend.name}")
+
+# Every deployed bot, its agent page token and lifecycle state
+bot_registry = state_backend.bot_registry()
+# Sessions with no activity for this long are cleaned up (seconds)
+SESSION_IDLE_TIMEOUT_SECONDS = float(os.environ.get('SESSION_IDLE_TIMEOUT_SECONDS', str(6 * 3600)))
+# Ended sessions keep their data this long before cleanup (seconds)
+SESSION_ENDED_GRACE_SECONDS = float(os.environ.get('SESSION_ENDED_GRACE_SECONDS', '600'))
 
 def get_current_backend_url():
     """Get the current backend URL from the tunnel URL file or environment"""
@@ -63,15 +121,104 @@ print(f"Debug: Region: {RECALL_REGION}")
 print(f"Debug: Agent URL: {AGENT_URL}")
 print(f"Debug: Backend URL: {get_current_backend_url()}")
 
+# Durable full-meeting transcript log - set TRANSCRIPT_LOG_PATH to an empty string to disable
+TRANSCRIPT_LOG_PATH = os.environ.get('TRANSCRIPT_LOG_PATH', 'transcripts.db')
+transcript_log = TranscriptLog(TRANSCRIPT_LOG_PATH).start() if TRANSCRIPT_LOG_PATH else None
+if transcript_log:
+    atexit.register(transcript_log.flush)  # Commit whatever is still queued on shutdown
+
+# Full-text index over every transcript line, fed from the webhook as lines arrive
+transcript_index = TranscriptIndex(max_docs=int(os.environ.get('SEARCH_INDEX_MAX_DOCS', '1000000')))
+if transcript_log:
+    # Lines from earlier runs are indexed in the background so startup isn't delayed
+    threading.Thread(target=transcript_index.backfill, args=(transcript_log,),
+                     name='search-index-backfill', daemon=True).start()
+
 # Global variables for storing transcript and audio data
-transcript_data_store = {}  # bot_id -> list of transcript lines
-audio_commands_store = {}   # bot_id -> list of audio commands
-transcript_lock = threading.Lock()
-audio_lock = threading.Lock()
+TRANSCRIPT_LOCK_SHARDS = int(os.environ.get('TRANSCRIPT_LOCK_SHARDS', '32'))
+# Per-bot transcript ring buffers - line and byte caps per bot plus a global memory budget
+transcripts = state_backend.transcript_store(
+    max_lines=int(os.environ.get('TRANSCRIPT_MAX_LINES', '20')),
+    max_bytes_per_bot=int(os.environ.get('TRANSCRIPT_MAX_BYTES_PER_BOT', str(64 * 1024))),
+    max_total_bytes=int(os.environ.get('TRANSCRIPT_MEMORY_BUDGET_BYTES', str(64 * 1024 * 1024))),
+    # Continue numbering from the log so sequence cursors stay valid across restarts
+    seq_seed=transcript_log.last_seq if transcript_log else None,
+    # Bots are hashed across this many independent locks
+    shards=TRANSCRIPT_LOCK_SHARDS,
+    # Same-speaker fragments this close together are merged into one line (0 disables)
+    merge_gap=float(os.environ.get('TRANSCRIPT_MERGE_GAP_SECONDS', '1.5')),
+    merge_max_chars=int(os.environ.get('TRANSCRIPT_MERGE_MAX_CHARS', '500'))
+)
+# Per-line caption latency by stage, from the word being spoken to the agent page rendering it
+caption_traces = CaptionTracer(
+    samples=int(os.environ.get('CAPTION_TRACE_SAMPLES', '1000')),
+    samples_per_bot=int(os.environ.get('CAPTION_TRACE_SAMPLES_PER_BOT', '200'))
+)
+# Ordered per-bot audio commands; agent pages long-poll and acknowledge them
+audio_commands = state_backend.audio_command_queue(
+    lease_seconds=float(os.environ.get('AUDIO_COMMAND_LEASE_SECONDS', '30')),
+    max_pending=int(os.environ.get('AUDIO_COMMAND_MAX_PENDING', '100'))
+)
+# Upper bound on ?wait= for audio command long polls
+AUDIO_LONG_POLL_MAX_SECONDS = float(os.environ.get('AUDIO_LONG_POLL_MAX_SECONDS', '30'))
+# Part of every transcript ETag; per process for the memory backend, shared by every worker with SQLite
+TRANSCRIPT_EPOCH = state_backend.epoch
+
+# How often an idle transcript stream sends a keep-alive comment (seconds)
+SSE_HEARTBEAT_SECONDS = float(os.environ.get('SSE_HEARTBEAT_SECONDS', '15'))
+# How long EventSource clients wait before reconnecting (milliseconds)
+SSE_RETRY_MS = int(os.environ.get('SSE_RETRY_MS', '3000'))
+
+# Bot lifecycle events Recall.ai pushes to /api/webhook/status (comma-separated; empty disables)
+RECALL_STATUS_EVENTS = [event.strip() for event in os.environ.get(
+    'RECALL_STATUS_EVENTS',
+    'bot.joining_call,bot.in_waiting_room,bot.in_call_not_recording,bot.in_call_recording,'
+    'bot.call_ended,bot.done,bot.fatal,recording.done,transcript.done'
+).split(',') if event.strip()]
+# Events that mean the bot's recording/transcript media is ready to fetch
+MEDIA_READY_EVENTS = frozenset(('recording.done', 'transcript.done'))
 
-# Construct API URL based on region
+# Construct API URL based on region (RECALL_API_BASE overrides it, e.g. for a local fake server)
 def get_recall_api_base():
-    return f'https://{RECALL_REGION}.recall.ai/api/v1'
+    return os.environ.get('RECALL_API_BASE') or f'https://{RECALL_REGION}.recall.ai/api/v1'
+
+# Shared keep-alive connection pool for every Recall.ai call
+recall = RecallClient(
+    RECALL_API_KEY,
+    get_recall_api_base(),
+    connect_timeout=float(os.environ.get('RECALL_CONNECT_TIMEOUT', '3.05')),
+    read_timeout=float(os.environ.get('RECALL_READ_TIMEOUT', '15')),
+    max_retries=int(os.environ.get('RECALL_MAX_RETRIES', '3')),
+    pool_size=int(os.environ.get('RECALL_POOL_SIZE', '20'))
+)
+
+# Clips in audio/ pre-encoded as output_audio bodies, so repeat playback skips the disk and base64
+audio_cache = AudioPayloadCache('audio', max_bytes=int(os.environ.get('AUDIO_CACHE_MAX_BYTES', str(64 * 1024 * 1024))))
+
+def warm_audio_cache():
+    started = time.perf_counter()
+    loaded = audio_cache.warm()
+    print(f"🔊 Audio cache warmed: {loaded} clips, {audio_cache.bytes} bytes in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+threading.Thread(target=warm_audio_cache, name='audio-cache-warmup', daemon=True).start()
+
+# Short-lived cache of Recall.ai bot listings and details, shared by every dashboard and agent page
+recall_cache = TTLCache(ttl=float(os.environ.get('RECALL_CACHE_TTL_SECONDS', '5')))
+
+def cached_recall_get(key, call):
+    """(status_code, body) of a Recall.ai read, served from recall_cache while fresh"""
+    def load():
+        response = call()
+        return response.status_code, (response.json() if response.status_code == 200 else response.text)
+    # Only successes are cached; concurrent misses for a key share one upstream request
+    return recall_cache.get(key, load, cache_if=lambda result: result[0] == 200)
+
+# Background fan-out for operations over many bots (bulk delete, delete-all-media)
+bulk_jobs = BulkJobs(
+    max_workers=int(os.environ.get('BULK_MAX_WORKERS', '8')),
+    rate_per_second=float(os.environ.get('BULK_RATE_PER_SECOND', '10')),
+    on_update=state_backend.save_job   # Lets any worker answer /api/jobs/<job_id>
+)
 
 # Note: We use get_current_backend_url() to dynamically read the tunnel URL
 
@@ -79,37 +226,25 @@ def get_recall_api_base():
 def home():
     return render_template('dashboard.html')
 
-@app.route('/deploy-agent', methods=['POST'])
-def deploy_agent():
-    global most_recent_bot_id
-    data = request.get_json()
-    meeting_url = data.get('meeting_url')
-    agent_name = data.get('agent_name', 'AI Assistant')
-    
-    if not meeting_url:
-        return jsonify({'error': 'Meeting URL is required'}), 400
-    
-    # Clean up old bot data before deploying new bot
-    print("🧹 Cleaning up old bot data before deploying new bot...")
-    cleanup_old_bots()
-    
+# Deploys run as background jobs on their own pool, so bulk deletes never delay a bot joining
+deploy_jobs = BulkJobs(
+    max_workers=int(os.environ.get('DEPLOY_MAX_PARALLEL', '8')),
+    rate_per_second=float(os.environ.get('DEPLOY_RATE_PER_SECOND', '5')),
+    on_update=state_backend.save_job
+)
+# Upper bound on meetings in one bulk deploy request
+MAX_BULK_DEPLOY_MEETINGS = int(os.environ.get('MAX_BULK_DEPLOY_MEETINGS', '200'))
+
+def build_bot_payload(meeting_url, agent_name, current_backend_url, agent_token):
+    """Recall.ai create-bot request for one agent: transcript and status webhooks plus the agent page"""
     # The webhook URL for Recall.ai to send transcript data to.
     # In production, this must be a publicly accessible URL.
     # For local development, you would use a tool like ngrok.
-    # Get our backend URL for the agent to use
-    current_backend_url = get_current_backend_url()
-    
-    if not current_backend_url:
-        return jsonify({"success": False, "error": "No backend URL available. Please ensure the tunnel is running."}), 500
-    
     webhook_url = current_backend_url + "/api/webhook/transcript"
+    status_webhook_url = current_backend_url + "/api/webhook/status"
     
-    # DEBUG: Print what backend URL we're actually using
-    print(f"🔍 DEBUG: Current backend URL: {current_backend_url}")
-    print(f"🔍 DEBUG: webhook_url: {webhook_url}")
-
     # Create bot with Real-time Transcription enabled
-    bot_payload = {
+    return {
         "meeting_url": meeting_url,
         "bot_name": agent_name,
         "recording_config": {
@@ -124,14 +259,20 @@ def deploy_agent():
                     "url": webhook_url,
                     "events": ["transcript.data"] # We want the final transcript data
                 }
-            ]
+            ] + ([
+                {
+                    "type": "webhook",
+                    "url": status_webhook_url,
+                    "events": RECALL_STATUS_EVENTS # Lifecycle changes keep the local status table current
+                }
+            ] if RECALL_STATUS_EVENTS else [])
         },
         "output_media": {
             "camera": {
                 "kind": "webpage",
                 "config": {
                     # Use our optimized agent - IMPORTANT: Use single curly braces for BOT_ID placeholder
-                    "url": f"{AGENT_URL}?bot_id={{BOT_ID}}&backend_url={requests.utils.quote(current_backend_url)}&v={VERSION_INFO['version']}",
+                    "url": f"{AGENT_URL}?bot_id={{BOT_ID}}&agent_token={agent_token}&backend_url={requests.utils.quote(current_backend_url)}&v={VERSION_INFO['version']}",
                     "width": 1280,
                     "height": 720
                 }
@@ -147,76 +288,154 @@ def deploy_agent():
             }
         }
     }
+
+def _deploy_action(current_backend_url):
+    """Bulk job action deploying an agent to one (meeting_url, agent_name) item"""
+    def action(meeting):
+        meeting_url, agent_name = meeting
+        # Identifies this bot's agent page even if Recall doesn't substitute {BOT_ID}
+        agent_token = new_agent_token()
+        response = recall.create_bot(build_bot_payload(meeting_url, agent_name, current_backend_url, agent_token))
+        if response.status_code == 429:
+            # Still throttled after the client's own retries - slow the remaining deploys down
+            deploy_jobs.limiter.penalize(float(response.headers.get('Retry-After', '1')))
+        if response.status_code != 201:
+            print(f"❌ DEPLOY FAILED: {meeting_url}: {response.status_code} {response.text[:200]}")
+            return f'{response.status_code} {response.text[:200].strip()}'
+        
+        new_bot_id = response.json()['id']
+        recall_cache.invalidate('bots')
+        
+        # Track the new session alongside any other live bots
+        bot_registry.register(new_bot_id, agent_token=agent_token,
+                              meeting_url=meeting_url, agent_name=agent_name)
+        print(f"🎯 DEPLOYED: New bot registered: {new_bot_id} ({len(bot_registry)} sessions)")
+        return {'bot_id': new_bot_id, 'meeting_url': meeting_url, 'agent_name': agent_name}
+    return action
+
+def _deploy_items(meetings):
+    """Job items for a deploy; cleanup runs on the job's thread, off the request path"""
+    # Clean up data for ended/idle bots - other live meetings keep theirs
+    cleanup_old_bots()
+    yield from meetings
+
+def _start_deploy_job(kind, meetings):
+    current_backend_url = get_current_backend_url()
+    if not current_backend_url:
+        return jsonify({"success": False, "error": "No backend URL available. Please ensure the tunnel is running."}), 500
     
-    # DEBUG: Print the actual agent URL being sent to Recall.ai
-    agent_full_url = f"{AGENT_URL}?bot_id={{BOT_ID}}&backend_url={requests.utils.quote(current_backend_url)}"
-    print(f"🔍 DEBUG: Full agent URL being sent to Recall.ai: {agent_full_url}")
+    print(f"🔍 DEBUG: Current backend URL: {current_backend_url}")
+    job = deploy_jobs.submit(kind, _deploy_items(meetings), _deploy_action(current_backend_url),
+                             describe=lambda meeting: meeting[0], keep_results=True)
+    print(f"🚀 Started {kind} job {job.id} for {len(meetings)} meeting(s)")
+    return _job_response(job)
+
+@app.route('/deploy-agent', methods=['POST'])
+def deploy_agent():
+    """
+    Deploy an agent to a meeting as a background job.
+    Answers 202 with a job ID straight away; poll /api/jobs/<job_id> - the new bot_id
+    is in the job's results once Recall.ai has created the bot.
+    """
+    data = request.get_json(silent=True)
+    data = data if isinstance(data, dict) else {}
+    meeting_url = data.get('meeting_url')
+    agent_name = data.get('agent_name') or 'AI Assistant'
     
-    headers = {
-        'Authorization': f'Token {RECALL_API_KEY}',
-        'Content-Type': 'application/json'
-    }
+    if not isinstance(meeting_url, str) or not meeting_url.strip():
+        return jsonify({'error': 'Meeting URL is required'}), 400
+    if not isinstance(agent_name, str):
+        return jsonify({'error': 'agent_name must be a string'}), 400
     
-    try:
-        api_base = get_recall_api_base()
-        response = requests.post(
-            f'{api_base}/bot',  # No trailing slash
-            json=bot_payload,
-            headers=headers
-        )
-        
-        if response.status_code == 201:
-            bot_data = response.json()
-            new_bot_id = bot_data['id']
-            
-            # Store the most recent bot ID globally
-            most_recent_bot_id = new_bot_id
-            print(f"🎯 DEPLOYED: New bot ID stored globally: {most_recent_bot_id}")
-            
-            # Clean up again after deployment to ensure only the new bot remains
-            print(f"🧹 Final cleanup - ensuring only new bot {new_bot_id} data is kept...")
-            cleanup_old_bots()
-            
-            return jsonify({
-                'success': True,
-                'bot_id': new_bot_id,
-                'bot_data': bot_data,  # Return full bot data
-                'message': f'AI agent deployed to meeting successfully!',
-                'region': RECALL_REGION
-            })
+    return _start_deploy_job('deploy', [(meeting_url, agent_name)])
+
+@app.route('/api/deploy-agents', methods=['POST'])
+def bulk_deploy_agents():
+    """
+    Deploy agents to many meetings at once as one background job, with bounded parallelism.
+    Body: {"meetings": ["<url>" or {"meeting_url", "agent_name"}, ...], "agent_name": default name}.
+    The job's results hold each meeting's bot_id or error.
+    """
+    data = request.get_json(silent=True)
+    data = data if isinstance(data, dict) else {}
+    default_name = data.get('agent_name') or 'AI Assistant'
+    entries = data.get('meetings')
+    if not isinstance(entries, list) or not entries or not isinstance(default_name, str):
+        return jsonify({'error': 'meetings must list at least one meeting URL'}), 400
+    
+    # Every entry must be a meeting - one bad entry rejects the request rather than deploying the rest
+    meetings = []
+    for meeting in entries:
+        if isinstance(meeting, dict):
+            meeting_url, agent_name = meeting.get('meeting_url'), meeting.get('agent_name') or default_name
         else:
-            return jsonify({
-                'error': f'Failed to deploy agent: {response.text}',
-                'region': RECALL_REGION,
-                'api_endpoint': f'{api_base}/bot',
-                'status_code': response.status_code
-            }), 400
-            
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+            meeting_url, agent_name = meeting, default_name
+        if not isinstance(meeting_url, str) or not meeting_url.strip() or not isinstance(agent_name, str):
+            return jsonify({'error': 'Each meeting must be a URL or {"meeting_url": ..., "agent_name": ...}'}), 400
+        meetings.append((meeting_url.strip(), agent_name))
+    
+    if len(meetings) > MAX_BULK_DEPLOY_MEETINGS:
+        return jsonify({'error': f'At most {MAX_BULK_DEPLOY_MEETINGS} meetings per request'}), 400
+    
+    return _start_deploy_job('bulk_deploy', meetings)
 
 @app.route('/bot-status/<bot_id>')
 def bot_status(bot_id):
-    headers = {
-        'Authorization': f'Token {RECALL_API_KEY}',
-        'Content-Type': 'application/json'
-    }
+    """Bot status from the webhook-fed status table, falling back to Recall.ai before the first event"""
+    session = bot_registry.get(bot_id)
+    if session is not None and session.status_changes:
+        status = session.to_dict()
+        status.update({'id': bot_id, 'status_changes': session.status_changes, 'source': 'webhook'})
+        return jsonify(status)
     
     try:
-        api_base = get_recall_api_base()
-        response = requests.get(
-            f'{api_base}/bot/{bot_id}',  # No trailing slash
-            headers=headers
-        )
+        status_code, bot_data = cached_recall_get(f'bot:{bot_id}', lambda: recall.get_bot(bot_id))
         
-        if response.status_code == 200:
-            return jsonify(response.json())
+        if status_code == 200:
+            return jsonify(bot_data)
         else:
             return jsonify({'error': 'Bot not found'}), 404
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/webhook/status', methods=['POST'])
+def status_webhook():
+    """
+    Receives bot lifecycle events from Recall.ai (status changes, call ended, media ready)
+    and records them in the local status table
+    """
+    payload = request.get_json(silent=True) or {}
+    event_type = payload.get('event', '')
+    data = payload.get('data') or {}
+    
+    if event_type == 'endpoint.connected':
+        print("✅ Recall.ai status webhook connected successfully.")
+        return jsonify({'status': 'connected'}), 200
+    
+    bot_id = (data.get('bot') or {}).get('id') or data.get('bot_id')
+    if not bot_id:
+        return jsonify({'status': 'ignoring, missing bot'}), 200
+    
+    # Both the realtime-endpoint shape (data.data) and the legacy bot.status_change shape (data.status)
+    status = data.get('status') or data.get('data') or {}
+    code = status.get('code')
+    if not code and event_type.startswith('bot.') and event_type != 'bot.status_change':
+        code = event_type[len('bot.'):]
+    
+    session = bot_registry.record_status(
+        bot_id,
+        code,
+        sub_code=status.get('sub_code'),
+        created_at=status.get('updated_at') or status.get('created_at'),
+        media_ready=event_type in MEDIA_READY_EVENTS
+    )
+    recall_cache.invalidate('bots', f'bot:{bot_id}')
+    if VERBOSE_LOGGING:
+        print(f"📶 Bot {bot_id} status: {code or event_type} ({session.state})")
+    
+    return jsonify({'status': 'received'}), 200
+
 @app.route('/api/webhook/transcript', methods=['POST'])
 def transcript_webhook():
     """
@@ -224,102 +443,529 @@ def transcript_webhook():
     """
     payload = request.get_json()
     event_type = payload.get('event')
-
+    
     # For verification of the webhook endpoint with Recall
     if event_type == 'endpoint.connected':
         print("✅ Recall.ai webhook connected successfully.")
         return jsonify({'status': 'connected'}), 200
-
+    
     if event_type == 'transcript.data':
-        bot_id = payload.get('data', {}).get('bot', {}).get('id')
-        participant = payload.get('data', {}).get('data', {}).get('participant', {})
-        words = payload.get('data', {}).get('data', {}).get('words', [])
-
-        if not bot_id or not words:
+        event = parse_transcript_event(payload)
+        if event is None:
             return jsonify({'status': 'ignoring, missing data'}), 200
-
-        speaker_name = participant.get('name', 'Unknown Speaker')
-        transcript_text = " ".join([word['text'] for word in words])
+        bot_id, participant, speaker_name, transcript_text, words = event
+        
+        # Recall retries deliveries - drop any we've already accepted for this bot
+        delivery_id = request.headers.get('webhook-id') or request.headers.get('svix-id')
+        identity = webhook_event_identity(participant, words, transcript_text, delivery_id)
+        if identity and transcript_dedup.check(bot_id, identity):
+            webhook_events.inc('duplicate')
+            return jsonify({'status': 'duplicate'}), 200
         
-        print(f"Transcript Received for Bot {bot_id}: [{speaker_name}] {transcript_text}")
+        # Acknowledge straight away - a worker applies the line, in order for this bot
+        batch = (bot_id, [(speaker_name, transcript_text, time.time(), words)], True)
+        if not ingest_queue.submit(bot_id, batch):
+            if identity:
+                transcript_dedup.discard(bot_id, identity)   # The retry must not look like a duplicate
+            webhook_events.inc('rejected')
+            return jsonify({'status': 'busy, retry later'}), 503, {'Retry-After': '1'}
+        webhook_events.inc('accepted')
+    
+    return jsonify({'status': 'received'}), 200
 
-        with transcript_lock:
-            if bot_id not in transcript_data_store:
-                transcript_data_store[bot_id] = []
-            
-            # Add new transcript line with a timestamp
-            transcript_data_store[bot_id].append({
-                "speaker": speaker_name,
-                "text": transcript_text,
-                "timestamp": time.time()
-            })
+# Events per ingest batch - one lock acquisition, log enqueue and index pass each
+INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', '500'))
+
+@app.route('/api/webhook/transcript/batch', methods=['POST'])
+def transcript_batch_webhook():
+    """
+    Replay or backfill many Recall transcript.data events in one request.
+    The body is a JSON array or NDJSON (one event per line) and is parsed as it streams in;
+    events are grouped per bot and applied in batches, in order. Duplicates of lines
+    already received (same speaker, word timings and text) are skipped.
+    """
+    counts = {'events': 0, 'accepted': 0, 'duplicates': 0, 'ignored': 0, 'batches': 0}
+    pending = {}   # bot_id -> [(event, dedup identity)], flushed every INGEST_BATCH_SIZE events
+    
+    def submit(bot_id):
+        events = [event for event, _ in pending[bot_id]]
+        if not ingest_queue.submit(bot_id, (bot_id, events, False)):
+            return False
+        del pending[bot_id]
+        webhook_events.inc('accepted', amount=len(events))
+        counts['accepted'] += len(events)
+        counts['batches'] += 1
+        return True
+    
+    def busy():
+        # Nothing still pending was queued, so a retry of this request must not look like duplicates
+        for bot_id, items in pending.items():
+            for _, identity in items:
+                if identity:
+                    transcript_dedup.discard(bot_id, identity)
+            webhook_events.inc('rejected', amount=len(items))
+        return jsonify({'status': 'busy, retry later', **counts}), 503, {'Retry-After': '1'}
+    
+    try:
+        for payload in iter_json_values(request.stream):
+            counts['events'] += 1
+            # Malformed events are counted as ignored - failing here would make the sender
+            # retry the whole body and ingest the events before this one twice
+            event = parse_transcript_event(payload)
+            if event is None:
+                counts['ignored'] += 1
+                continue
+            bot_id, participant, speaker_name, transcript_text, words = event
+            identity = webhook_event_identity(participant, words, transcript_text)
+            if identity and transcript_dedup.check(bot_id, identity):
+                webhook_events.inc('duplicate')
+                counts['duplicates'] += 1
+                continue
             
-            # Keep only the last 20 entries
-            transcript_data_store[bot_id] = transcript_data_store[bot_id][-20:]
+            # Replayed lines keep the time they were spoken, when Recall sent it
+            spoken_at = _parse_timestamp((words[-1].get('end_timestamp') or {}).get('absolute'))
+            pending.setdefault(bot_id, []).append(
+                ((speaker_name, transcript_text, spoken_at or time.time(), words), identity))
+            if len(pending[bot_id]) >= INGEST_BATCH_SIZE and not submit(bot_id):
+                return busy()
+    except ValueError as e:
+        # Events before the malformed one were already queued; counts says how many
+        for bot_id in list(pending):
+            if not submit(bot_id):
+                return busy()
+        return jsonify({'status': 'error', 'message': f'Malformed JSON: {e}', **counts}), 400
+    
+    for bot_id in list(pending):
+        if not submit(bot_id):
+            return busy()
+    
+    print(f"📥 Transcript batch: {counts['accepted']} lines queued in {counts['batches']} batches "
+          f"({counts['duplicates']} duplicates, {counts['ignored']} ignored)")
+    return jsonify({'status': 'received', **counts}), 200
 
-    return jsonify({'status': 'received'}), 200
+def parse_transcript_event(payload):
+    """
+    (bot_id, participant, speaker name, text, words) from a transcript.data event, or None
+    for other events and malformed ones (wrong types, words without text or bad timestamps)
+    """
+    if not isinstance(payload, dict) or payload.get('event') != 'transcript.data':
+        return None
+    data = payload.get('data')
+    if not isinstance(data, dict):
+        return None
+    bot, inner = data.get('bot') or {}, data.get('data') or {}
+    if not isinstance(bot, dict) or not isinstance(inner, dict):
+        return None
+    bot_id = bot.get('id')
+    participant = inner.get('participant') or {}
+    words = inner.get('words')
+    if not isinstance(bot_id, str) or not bot_id or not isinstance(participant, dict):
+        return None
+    if not isinstance(words, list) or not words or not all(map(_valid_word, words)):
+        return None
+    speaker_name = participant.get('name')
+    if not isinstance(speaker_name, str) or not speaker_name:
+        speaker_name = 'Unknown Speaker'
+    transcript_text = " ".join([word['text'] for word in words])
+    return bot_id, participant, speaker_name, transcript_text, words
+
+def _valid_word(word):
+    """A Recall word: a dict with text and, when present, well-formed timestamps"""
+    if not isinstance(word, dict) or not isinstance(word.get('text'), str):
+        return False
+    for key in ('start_timestamp', 'end_timestamp'):
+        timestamp = word.get(key)
+        if timestamp is None:
+            continue
+        if not isinstance(timestamp, dict):
+            return False
+        relative, absolute = timestamp.get('relative'), timestamp.get('absolute')
+        if relative is not None and (isinstance(relative, bool) or not isinstance(relative, (int, float))):
+            return False
+        if absolute is not None and not isinstance(absolute, str):
+            return False
+    return True
+
+def webhook_event_identity(participant, words, transcript_text, delivery_id=None):
+    """
+    What makes a transcript delivery unique: the delivery ID Recall's webhook sender puts in
+    the headers (the same on every retry), else the utterance's speaker, word timings and text.
+    None when neither exists - identical untimed lines (e.g. "Yes.") aren't necessarily retries.
+    """
+    if delivery_id:
+        return ('delivery', delivery_id)
+    start = (words[0].get('start_timestamp') or {})
+    end = (words[-1].get('end_timestamp') or {})
+    if not start and not end:
+        return None
+    return ('utterance', participant.get('id'), participant.get('name'),
+            start.get('absolute') or start.get('relative'), end.get('absolute') or end.get('relative'),
+            transcript_text)
+
+def apply_transcript_lines(batch):
+    """Ingest worker stage: store, persist and index a batch of transcript lines for one bot"""
+    bot_id, events, live = batch
+    if live:
+        if VERBOSE_LOGGING:
+            for speaker_name, transcript_text, _, _ in events:
+                print(f"Transcript Received for Bot {bot_id}: [{speaker_name}] {transcript_text}")
+        
+        # Adopt bots we didn't deploy in this process (e.g. after a restart)
+        if bot_id not in bot_registry:
+            bot_registry.register(bot_id)
+        bot_registry.touch(bot_id, activate=True)
+
+    # O(1) ring buffer appends under one lock; the store wakes transcript streams waiting on this bot.
+    # A fragment continuing the speaker's last line comes back as a merged line replacing it.
+    entries = []
+    for speaker_name, transcript_text, timestamp, words in events:
+        starts, ends = word_timings(words)
+        entries.append((speaker_name, transcript_text, timestamp, starts, ends))
+    lines, evicted = transcripts.append_many(bot_id, entries)
+    transcript_lines_applied.inc(amount=len(lines))
+    if live:
+        # Replayed lines aren't live captions, so only live ones are traced
+        applied_at = time.time()
+        for line, (_, _, received_at, words) in zip(lines, events):
+            spoken_at = _parse_timestamp((words[-1].get('end_timestamp') or {}).get('absolute'))
+            caption_traces.applied(bot_id, line.seq, spoken_at, received_at, line.replaces, applied_at)
+    if evicted:
+        print(f"🧹 Transcript memory budget exceeded, evicted bots: {evicted}")
+    
+    # Queued for the background flusher - never waits on the disk
+    if transcript_log:
+        transcript_log.append_many((bot_id, line) for line in lines)
+    for line in lines:
+        if line.replaces is not None:
+            transcript_index.remove(bot_id, line.replaces)
+        transcript_index.add(bot_id, line.seq, line.speaker, line.text, line.timestamp)
+
+def _parse_timestamp(value):
+    """Epoch seconds from an ISO 8601 timestamp, or None"""
+    try:
+        return datetime.fromisoformat(value).timestamp() if value else None
+    except (TypeError, ValueError):
+        return None
+
+# Recently accepted deliveries per bot, so Recall's retries don't become duplicate lines
+transcript_dedup = DedupWindow(
+    max_keys=int(os.environ.get('WEBHOOK_DEDUP_KEYS_PER_BOT', '512')),
+    ttl=float(os.environ.get('WEBHOOK_DEDUP_TTL_SECONDS', '600'))
+)
+
+# Webhooks only validate and enqueue; these workers apply events per bot in arrival order
+ingest_queue = IngestQueue(
+    apply_transcript_lines,
+    workers=int(os.environ.get('INGEST_WORKERS', '4')),
+    max_size=int(os.environ.get('INGEST_QUEUE_SIZE', '10000')),
+    policy=os.environ.get('INGEST_FULL_POLICY', 'block'),
+    block_timeout=float(os.environ.get('INGEST_BLOCK_TIMEOUT_SECONDS', '0.5'))
+).start()
+# Registered after the log's flush, so it runs first at exit and the log gets every line
+atexit.register(ingest_queue.flush)
+
+@app.route('/api/ingest/stats', methods=['GET'])
+def ingest_stats():
+    """Webhook ingestion backpressure (queue depth, oldest queued event, drops, rejections) and dedup counters"""
+    stats = ingest_queue.stats()
+    stats['dedup'] = transcript_dedup.stats()
+    stats['state'] = state_backend.stats()
+    # Word spoken -> webhook received; /api/caption-latency has every stage
+    stats['caption_latency_ms'] = caption_traces.summary(STAGE_RECALL)
+    return jsonify(stats)
+
+# Render reports accepted per request
+MAX_CAPTION_REPORTS = 100
+
+@app.route('/api/caption-latency', methods=['GET'])
+def caption_latency():
+    """Caption latency percentiles per stage (recall, ingest, delivery, render, total), overall and per bot (?bot_id=)"""
+    return jsonify(caption_traces.stats(request.args.get('bot_id')))
+
+@app.route('/api/bot/<bot_id>/caption-trace', methods=['POST'])
+def report_caption_render(bot_id):
+    """
+    Agent pages report rendered lines here as {"rendered": [{"seq": n, "render_ms": ms}]},
+    render_ms being the time from the line reaching the page to it being on screen.
+    """
+    bot_id = resolve_bot_id(bot_id)
+    # force=True: navigator.sendBeacon posts text/plain
+    payload = request.get_json(force=True, silent=True) or {}
+    rendered = payload.get('rendered')
+    if not isinstance(rendered, list):
+        return jsonify({'error': 'Expected {"rendered": [{"seq": ..., "render_ms": ...}]}'}), 400
+    
+    matched = 0
+    for report in rendered[:MAX_CAPTION_REPORTS]:
+        try:
+            matched += caption_traces.rendered(bot_id, int(report['seq']), float(report.get('render_ms') or 0))
+        except (TypeError, ValueError, KeyError):
+            continue
+    return jsonify({'matched': matched})
+
+
+def is_placeholder_bot_id(bot_id):
+    """True when Recall didn't substitute the {BOT_ID} placeholder in the agent URL"""
+    return bot_id in ('{BOT_ID}', '{{BOT_ID}}', '%7BBOT_ID%7D')
+
+def resolve_bot_id(bot_id):
+    """
+    Map a request's bot ID to a real one and record the activity.
+    Agent pages pass ?agent_token=, which names their bot even when the URL still has the placeholder.
+    """
+    agent_token = request.args.get('agent_token')
+    session = bot_registry.by_token(agent_token) if agent_token else None
+    if session is not None:
+        bot_id = session.bot_id
+    elif is_placeholder_bot_id(bot_id):
+        # No token - fall back to the newest session, then the most recently active transcript
+        bot_id = bot_registry.most_recent() or next(iter(transcripts.bot_ids()), bot_id)
+    bot_registry.touch(bot_id)
+    return bot_id
 
+def _parse_seq(value):
+    """Parse a sequence cursor from a query string or header, defaulting to 0"""
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return 0
 
 @app.route('/api/bot/<bot_id>/transcript', methods=['GET'])
 def get_transcript(bot_id):
     """
-    Returns the transcript for a specific bot
+    Returns the transcript for a specific bot.
+    Pass ?since=<seq> to receive only lines newer than that sequence number;
+    unchanged re-polls get 304 Not Modified via ETag/If-None-Match.
     """
-    print(f"Transcript requested for Bot ID: '{bot_id}'")
     # Check if JSONP format is requested
     callback = request.args.get('callback')
+    since = _parse_seq(request.args.get('since'))
+    
+    bot_id = resolve_bot_id(bot_id)
+
+    # Snapshots are immutable, so the lock is only held long enough to grab the current one
+    snapshot = transcripts.snapshot(bot_id)
+
+    # Sequence numbers restart with the server - treat a cursor from the future as a fresh start
+    if since > snapshot.seq:
+        since = 0
     
-    # Debug: Show all available bot IDs in transcript store
-    available_bots = list(transcript_data_store.keys())
-    print(f"Available bot IDs: {available_bots}")
-    
-    # Special handling for the placeholder case
-    if bot_id == '{BOT_ID}' or bot_id == '%7BBOT_ID%7D':
-        # If we only have one bot, use that (most common case)
-        if len(available_bots) == 1:
-            real_bot_id = available_bots[0]
-            print(f"Using the only active bot ID: {real_bot_id} for placeholder request")
-            bot_id = real_bot_id
-        elif len(available_bots) > 1:
-            # Sort by most recently active if we have multiple bots
-            latest_bot_id = available_bots[0]  # Default to first
-            print(f"Multiple bots active, using: {latest_bot_id}")
-            bot_id = latest_bot_id
-    
-    # Safely access transcript data with lock
-    with transcript_lock:
-        if bot_id in transcript_data_store:
-            response_data = list(transcript_data_store[bot_id])  # Make a copy to avoid race conditions
+    # The buffer only changes when the sequence advances, so (bot, seq) identifies the content
+    tag = f'{TRANSCRIPT_EPOCH}-{bot_id}-{snapshot.seq}'
+    etag = f'"{tag}"'
+    # Whole-tag comparison, weak tags and "*" included - a substring test lets "v12" match "v1"
+    if request.if_none_match.contains_weak(tag):
+        response = Response(status=304)
+    elif callback:
+        # If this is a JSONP request, prepend the callback to the pre-wrapped body
+        if since < snapshot.first_seq:
+            body = callback.encode('utf-8') + snapshot.jsonp_body
         else:
-            # Try any available bot if we have one 
-            if available_bots:
-                print(f"Bot ID {bot_id} not found, using available bot: {available_bots[0]}")
-                response_data = list(transcript_data_store[available_bots[0]])
-            else:
-                print(f"No matching bot ID found and no active bots")
-                response_data = []
-    
-    # Debug: print what we're returning
-    print(f"Serving transcript for Bot '{bot_id}': {len(response_data)} lines")
-    
-    # If this is a JSONP request, wrap the response in the callback function
-    if callback:
-        json_data = json.dumps(response_data)
-        print(f"Returning JSONP response with callback: {callback}")
-        return f"{callback}({json_data});", 200, {'Content-Type': 'application/javascript'}
+            body = callback.encode('utf-8') + b'(' + snapshot_body_since(snapshot, since) + b');'
+        response = Response(body, content_type='application/javascript')
     else:
-        # Add debugging headers to see in browser console
-        response = jsonify(response_data)
-        response.headers['X-Debug-Lines'] = str(len(response_data))
-        return response
+        response = Response(snapshot_body_since(snapshot, since), content_type='application/json')
+    
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'  # Always revalidate with the ETag
+    response.headers['X-Transcript-Seq'] = str(snapshot.seq)
+    new_lines = len(lines_since(snapshot, since))
+    if new_lines and response.status_code == 200:
+        caption_traces.delivered(bot_id, since)
+    response.headers['X-Debug-Lines'] = str(new_lines)
+    return response
+
+@app.route('/api/bot/<bot_id>/transcript/stream', methods=['GET'])
+def stream_transcript(bot_id):
+    """
+    Streams new transcript lines for a bot as Server-Sent Events.
+    Reconnecting clients send Last-Event-ID (or ?last_event_id=) to resume.
+    """
+    last_seq = _parse_seq(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    
+    # Resolve the placeholder the same way the polling endpoint does
+    bot_id = resolve_bot_id(bot_id)
+    
+    if VERBOSE_LOGGING:
+        print(f"📡 Transcript stream opened for Bot '{bot_id}' (resuming after seq {last_seq})")
+    
+    def generate():
+        cursor = last_seq
+        yield f"retry: {SSE_RETRY_MS}\n\n".encode('utf-8')
+        
+        while True:
+            # Sequence numbers restart with the server - don't let a stale cursor stall the stream
+            if cursor > transcripts.latest_seq(bot_id):
+                cursor = 0
+            # Only appends for bots on this shard wake the stream
+            transcripts.wait_for_line(bot_id, cursor, SSE_HEARTBEAT_SECONDS)
+            snapshot = transcripts.snapshot(bot_id)
+
+            if snapshot.seq <= cursor:
+                yield b": heartbeat\n\n"
+                continue
+            
+            # Reuse the line bytes the webhook already encoded
+            for line in lines_since(snapshot, cursor):
+                yield b"id: %d\nevent: transcript\ndata: %s\n\n" % (line.seq, line.encoded)
+            caption_traces.delivered(bot_id, cursor)
+            cursor = snapshot.seq
+    
+    return Response(generate(), headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop proxies from buffering the stream
+    })
+
+@app.route('/api/bots/status/stream', methods=['GET'])
+def stream_bot_status():
+    """
+    Streams bot status changes to dashboards as Server-Sent Events.
+    New connections first get a snapshot event with every session.
+    """
+    last_seq = _parse_seq(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    
+    def generate():
+        cursor = last_seq
+        yield f"retry: {SSE_RETRY_MS}\n\n".encode('utf-8')
+        
+        # Sequence numbers restart with the server - resend everything after a restart
+        if not cursor or cursor > bot_registry.status_seq():
+            cursor = bot_registry.status_seq()
+            sessions = [session.to_dict() for session in bot_registry.sessions()]
+            yield f"id: {cursor}\nevent: snapshot\ndata: {json.dumps(sessions)}\n\n".encode('utf-8')
+        
+        while True:
+            changes = bot_registry.wait_for_status(cursor, SSE_HEARTBEAT_SECONDS)
+            if not changes:
+                yield b": heartbeat\n\n"
+                continue
+            for seq, session in changes:
+                yield f"id: {seq}\nevent: status\ndata: {json.dumps(session)}\n\n".encode('utf-8')
+            cursor = changes[-1][0]
+    
+    return Response(generate(), headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop proxies from buffering the stream
+    })
+
+def _parse_float(value):
+    """Parse an optional float query parameter (e.g. an epoch timestamp)"""
+    try:
+        return float(value) if value not in (None, '') else None
+    except ValueError:
+        return None
+
+@app.route('/api/bot/<bot_id>/transcript/history', methods=['GET'])
+def get_transcript_history(bot_id):
+    """
+    Returns a page of a bot's full stored transcript, oldest first.
+    Filter with ?after_seq=&until_seq= and/or ?start=&end= (epoch seconds);
+    pass next_cursor back as after_seq to fetch the following page.
+    """
+    if not transcript_log:
+        return jsonify({'error': 'Transcript persistence is disabled'}), 404
+    
+    until_seq = request.args.get('until_seq')
+    lines, next_cursor = transcript_log.query(
+        bot_id,
+        after_seq=_parse_seq(request.args.get('after_seq')),
+        until_seq=_parse_seq(until_seq) if until_seq else None,
+        start=_parse_float(request.args.get('start')),
+        end=_parse_float(request.args.get('end')),
+        limit=_parse_seq(request.args.get('limit')) or 100
+    )
+    
+    return jsonify({
+        'bot_id': bot_id,
+        'lines': lines,
+        'count': len(lines),
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    })
+
+@app.route('/api/bot/<bot_id>/transcript/export', methods=['GET'])
+def export_transcript(bot_id):
+    """
+    Streams a bot's full stored transcript as ?format=ndjson (default), txt, srt or vtt.
+    Page with ?after_seq= and ?limit= (lines); X-Next-Cursor and the Link header name the next page.
+    Lines are read from the log a page at a time and gzip-compressed on the fly when accepted.
+    """
+    if not transcript_log:
+        return jsonify({'error': 'Transcript persistence is disabled'}), 404
+    
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unknown format, expected one of: {", ".join(EXPORT_FORMATS)}'}), 400
+    
+    after_seq = _parse_seq(request.args.get('after_seq'))
+    limit = _parse_seq(request.args.get('limit'))
+    until_seq, next_cursor = transcript_log.page_end(bot_id, after_seq, limit) if limit else (None, None)
+    # Subtitle times and cue numbers count from the start of the meeting, not of this page
+    origin, first_cue = None, 1
+    if fmt in ('srt', 'vtt'):
+        origin = transcript_log.first_timestamp(bot_id)
+        if after_seq:
+            first_cue = transcript_log.count(bot_id, until_seq=after_seq) + 1
+    chunks = render(iter_log_lines(transcript_log, bot_id, after_seq, until_seq), fmt, origin, first_cue)
+    
+    content_type, extension = EXPORT_FORMATS[fmt]
+    headers = {
+        'Content-Disposition': f'attachment; filename="transcript-{bot_id}.{extension}"',
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding',
+        'X-Accel-Buffering': 'no'
+    }
+    if next_cursor is not None:
+        query = urlencode({**request.args.to_dict(), 'after_seq': next_cursor})
+        headers['X-Next-Cursor'] = str(next_cursor)
+        headers['Link'] = f'<{request.base_url}?{query}>; rel="next"'
+    
+    if request.accept_encodings['gzip']:
+        headers['Content-Encoding'] = 'gzip'
+        body = gzip_stream(chunks)
+    else:
+        body = encode_stream(chunks)
+    if VERBOSE_LOGGING:
+        print(f"📤 Exporting transcript for Bot {bot_id} as {fmt} (after seq {after_seq}, limit {limit or 'none'})")
+    return Response(body, content_type=content_type, headers=headers)
+
+@app.route('/api/search', methods=['GET'])
+def search_transcripts():
+    """
+    Full-text search across meeting transcripts, best matches first.
+    ?q= is required (all terms must match, "quoted phrases" match exactly); narrow with
+    ?bot_id=, ?speaker=, ?start=/&end= (epoch seconds) and page with ?limit=&offset=.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+    
+    limit = min(_parse_seq(request.args.get('limit')) or 20, 100)
+    offset = _parse_seq(request.args.get('offset'))
+    total, results = transcript_index.search(
+        query,
+        bot_id=request.args.get('bot_id') or None,
+        speaker=request.args.get('speaker') or None,
+        start=_parse_float(request.args.get('start')),
+        end=_parse_float(request.args.get('end')),
+        limit=limit,
+        offset=offset
+    )
+    
+    return jsonify({
+        'query': query,
+        'total': total,
+        'limit': limit,
+        'offset': offset,
+        'results': results
+    })
 
 @app.route('/api/bots', methods=['GET'])
 def list_bots():
     """List all bot IDs with transcript data"""
-    with transcript_lock:
-        bots = {}
-        for bot_id, lines in transcript_data_store.items():
-            bots[bot_id] = len(lines)
+    bots = transcripts.line_counts()
     
     return jsonify({
         "active_bots": bots,
@@ -329,7 +975,8 @@ def list_bots():
 @app.route('/api/ping', methods=['GET'])
 def ping():
     """Simple ping endpoint that can work with image tags"""
-    print("Ping received!")
+    if VERBOSE_LOGGING:
+        print("Ping received!")
     response = app.make_response('OK')
     response.headers['Content-Type'] = 'image/gif'
     response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
@@ -338,100 +985,115 @@ def ping():
     return response
 
 # Audio functionality
-@app.route('/audio/<filename>')
+AUDIO_CACHE_SECONDS = 3600
+AUDIO_CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, HEAD, OPTIONS',
+    'Access-Control-Allow-Headers': 'Range, If-Range, If-None-Match, If-Modified-Since',
+    'Access-Control-Expose-Headers': 'Content-Range, Content-Length, Accept-Ranges, ETag'
+}
+# Requests with more ranges than this are answered with the whole file
+MAX_AUDIO_RANGES = 16
+
+@app.route('/audio/<filename>', methods=['GET', 'HEAD'])
 def serve_audio(filename):
-    """Serve audio files from the audio directory with optimized streaming support"""
+    """
+    Serve audio files from the audio directory.
+    Revalidation (ETag/If-None-Match, Last-Modified/If-Modified-Since) answers 304; whole
+    files and single ranges (including bytes=-N suffixes) go through send_file, so the
+    server can use sendfile, and multi-range requests get multipart/byteranges from an mmap.
+    """
+    file_path = audio_cache.path(filename)
     try:
-        # Get the full file path
-        file_path = os.path.join('audio', filename)
-        
-        if not os.path.exists(file_path):
-            return jsonify({"error": "Audio file not found"}), 404
-        
-        # Get file size for range requests
-        file_size = os.path.getsize(file_path)
-        
-        # Handle range requests for better streaming
-        range_header = request.headers.get('Range', None)
-        if range_header:
-            # Parse range header (e.g., "bytes=0-1023")
-            byte_start = 0
-            byte_end = file_size - 1
-            
-            if range_header:
-                match = re.search(r'bytes=(\d+)-(\d*)', range_header)
-                if match:
-                    byte_start = int(match.group(1))
-                    if match.group(2):
-                        byte_end = int(match.group(2))
-            
-            # Read the requested chunk
-            with open(file_path, 'rb') as f:
-                f.seek(byte_start)
-                chunk_size = byte_end - byte_start + 1
-                data = f.read(chunk_size)
-            
-            # Create partial content response
-            response = Response(
-                data,
-                206,  # Partial Content
-                headers={
-                    'Content-Range': f'bytes {byte_start}-{byte_end}/{file_size}',
-                    'Accept-Ranges': 'bytes',
-                    'Content-Length': str(chunk_size),
-                    'Content-Type': 'audio/mpeg',
-                    'Cache-Control': 'public, max-age=3600',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'GET, HEAD, OPTIONS',
-                    'Access-Control-Allow-Headers': 'Range'
-                }
-            )
-            return response
-        else:
-            # Regular full file response with streaming
-            def generate():
-                with open(file_path, 'rb') as f:
-                    while True:
-                        chunk = f.read(8192)  # 8KB chunks for smooth streaming
-                        if not chunk:
-                            break
-                        yield chunk
-            
-            response = Response(
-                generate(),
-                headers={
-                    'Content-Type': 'audio/mpeg',
-                    'Content-Length': str(file_size),
-                    'Accept-Ranges': 'bytes',
-                    'Cache-Control': 'public, max-age=3600',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'GET, HEAD, OPTIONS',
-                    'Access-Control-Allow-Headers': 'Range'
-                }
-            )
-            return response
-            
-    except Exception as e:
-        print(f"Error serving audio file {filename}: {e}")
+        stat = os.stat(file_path) if file_path else None
+    except OSError:
+        stat = None
+    if stat is None or not os.path.isfile(file_path):
         return jsonify({"error": "Audio file not found"}), 404
+    
+    mimetype = mimetypes.guess_type(filename)[0] or 'audio/mpeg'
+    # Changes whenever the file is replaced or rewritten; shared by every response for this version
+    etag = f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+    
+    modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+    byte_range = request.range
+    if (byte_range is not None and 1 < len(byte_range.ranges) <= MAX_AUDIO_RANGES
+            and byte_range.units == 'bytes' and _if_range_matches(etag, modified)):
+        response = _multipart_audio_response(file_path, stat.st_size, etag, modified, mimetype, byte_range.ranges)
+    elif 'Range' in request.headers and (byte_range is None or len(byte_range.ranges) > MAX_AUDIO_RANGES):
+        # Werkzeug can't normalise unsorted or overlapping ranges, or a suffix range that isn't
+        # last, and send_file would refuse those and overlong lists with 416 - send the whole file
+        environ = {key: value for key, value in request.environ.items() if key != 'HTTP_RANGE'}
+        response = send_file_from_environ(os.path.join(app.root_path, file_path), environ, mimetype=mimetype,
+                                          conditional=True, etag=etag, last_modified=stat.st_mtime,
+                                          max_age=AUDIO_CACHE_SECONDS, response_class=app.response_class)
+    else:
+        response = send_file(file_path, mimetype=mimetype, conditional=True, etag=etag,
+                             last_modified=stat.st_mtime, max_age=AUDIO_CACHE_SECONDS)
+    response.headers.update(AUDIO_CORS_HEADERS)
+    return response
 
-@app.route('/api/recall-bots', methods=['GET'])
-def list_recall_bots():
-    """List all bots from Recall.ai API"""
+def _if_range_matches(etag, modified):
+    """False when If-Range names another version of the file, so the whole file must be sent"""
+    if_range = request.if_range
+    if if_range.etag is not None:
+        return if_range.etag == etag
+    if if_range.date is not None:
+        return modified <= if_range.date
+    return True
+
+def _multipart_audio_response(file_path, size, etag, modified, mimetype, ranges):
+    """206 multipart/byteranges response for several ranges, or 304/416 as appropriate"""
     headers = {
-        'Authorization': f'Token {RECALL_API_KEY}',
-        'Content-Type': 'application/json'
+        'ETag': f'"{etag}"',
+        'Last-Modified': http_date(modified),
+        'Cache-Control': f'public, max-age={AUDIO_CACHE_SECONDS}',
+        'Accept-Ranges': 'bytes'
     }
+    if not is_resource_modified(request.environ, etag=etag, last_modified=modified):
+        return Response(status=304, headers=headers)
+    
+    # Resolve suffix (bytes=-N) and open-ended (bytes=N-) ranges against the file size
+    spans = []
+    for start, stop in ranges:
+        if start < 0:
+            start, stop = max(size + start, 0), size
+        else:
+            stop = size if stop is None else min(stop, size)
+        if start < stop:
+            spans.append((start, stop))
+    if not spans:
+        headers['Content-Range'] = f'bytes */{size}'
+        return Response(status=416, headers=headers)
     
+    boundary = uuid.uuid4().hex
+    part_headers = [
+        (f'\r\n--{boundary}\r\nContent-Type: {mimetype}\r\n'
+         f'Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n').encode('ascii')
+        for start, stop in spans
+    ]
+    closing = f'\r\n--{boundary}--\r\n'.encode('ascii')
+    headers['Content-Length'] = str(sum(map(len, part_headers)) + sum(stop - start for start, stop in spans)
+                                    + len(closing))
+    
+    def generate():
+        # Parts are sliced from the page cache mapping - no buffered read() per part
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for part_header, (start, stop) in zip(part_headers, spans):
+                yield part_header
+                yield mapped[start:stop]
+        yield closing
+    
+    body = generate() if request.method != 'HEAD' else []
+    return Response(body, 206, headers=headers, content_type=f'multipart/byteranges; boundary={boundary}')
+
+@app.route('/api/recall-bots', methods=['GET'])
+def list_recall_bots():
+    """List all bots from Recall.ai API"""
     try:
-        api_base = get_recall_api_base()
-        response = requests.get(
-            f'{api_base}/bot',
-            headers=headers
-        )
+        status_code, bots = cached_recall_get('bots', recall.list_bots)
         
-        if response.status_code == 200:
-            bots = response.json()
+        if status_code == 200:
             return jsonify({
                 'success': True,
                 'bots': bots,
@@ -439,37 +1101,22 @@ def list_recall_bots():
             })
         else:
             return jsonify({
-                'error': f'Failed to list bots: {response.text}',
-                'status_code': response.status_code
+                'error': f'Failed to list bots: {bots}',
+                'status_code': status_code
             }), 400
-            
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/recall-bots/<bot_id>', methods=['DELETE'])
 def delete_recall_bot(bot_id):
     """Delete a specific bot from Recall.ai"""
-    headers = {
-        'Authorization': f'Token {RECALL_API_KEY}',
-        'Content-Type': 'application/json'
-    }
-    
     try:
-        api_base = get_recall_api_base()
-        response = requests.delete(
-            f'{api_base}/bot/{bot_id}',
-            headers=headers
-        )
+        response = recall.delete_bot(bot_id)
         
         if response.status_code == 204:
             # Also clean up local data
-            with transcript_lock:
-                if bot_id in transcript_data_store:
-                    del transcript_data_store[bot_id]
-            
-            with audio_lock:
-                if bot_id in audio_commands_store:
-                    del audio_commands_store[bot_id]
+            forget_bot(bot_id)
             
             return jsonify({
                 'success': True,
@@ -486,111 +1133,67 @@ def delete_recall_bot(bot_id):
 
 @app.route('/api/bot/<bot_id>/play-audio', methods=['POST'])
 def play_audio(bot_id):
-    """Store a play audio command for a specific bot - only one command at a time"""
+    """Queue a play audio command for a specific bot"""
     data = request.get_json()
     audio_file = data.get('audio_file', 'ElevenLabs_2025-06-06T23_00_36_karma_20250606-VO_pvc_sp100_s63_sb67_se0_b_m2.mp3')
     
-    print(f"Play audio command received for Bot {bot_id}: {audio_file}")
+    if VERBOSE_LOGGING:
+        print(f"Play audio command received for Bot {bot_id}: {audio_file}")
     
-    with audio_lock:
-        current_time = time.time()
-        
-        # Check if there's a recent command (within 5 seconds) to prevent spam
-        if bot_id in audio_commands_store:
-            existing_command = audio_commands_store[bot_id]
-            time_since_last = current_time - existing_command.get('timestamp', 0)
-            
-            if time_since_last < 5.0 and existing_command.get('command') == 'play':
-                print(f"Ignoring rapid play command for Bot {bot_id} (last command was {time_since_last:.1f}s ago)")
-                return jsonify({"status": "ignored - too soon after last command", "audio_file": audio_file})
-        
-        # Only store ONE command per bot - replace any existing command
-        audio_commands_store[bot_id] = {
-            "command": "play",
-            "audio_file": audio_file,
-            "timestamp": current_time,
-            "served": False  # Track if this command has been served
-        }
+    # Commands are delivered in order - nothing is dropped or overwritten
+    command = audio_commands.push(bot_id, "play", audio_file=audio_file)
+    if command is None:
+        return jsonify({"error": "Too many pending audio commands for this bot"}), 429
     
-    return jsonify({"status": "play command sent", "audio_file": audio_file})
+    return jsonify({"status": "play command sent", "audio_file": audio_file, "command_id": command["id"]})
 
 @app.route('/api/bot/<bot_id>/stop-audio', methods=['POST'])
 def stop_audio(bot_id):
-    """Store a stop audio command for a specific bot - only one command at a time"""
-    print(f"Stop audio command received for Bot {bot_id}")
-    
-    with audio_lock:
-        # Only store ONE command per bot - replace any existing command
-        audio_commands_store[bot_id] = {
-            "command": "stop",
-            "timestamp": time.time(),
-            "served": False  # Track if this command has been served
-        }
+    """Queue a stop audio command for a specific bot"""
+    if VERBOSE_LOGGING:
+        print(f"Stop audio command received for Bot {bot_id}")
+    
+    command = audio_commands.push(bot_id, "stop")
+    if command is None:
+        return jsonify({"error": "Too many pending audio commands for this bot"}), 429
     
-    return jsonify({"status": "stop command sent"})
+    return jsonify({"status": "stop command sent", "command_id": command["id"]})
 
 @app.route('/api/bot/<bot_id>/audio-command', methods=['GET'])
 def get_audio_command(bot_id):
-    """Get pending audio command for a specific bot - single command only"""
-    print(f"Audio command requested for Bot ID: '{bot_id}'")
-    
-    # Handle placeholder bot ID like we do for transcripts
-    available_bots = list(audio_commands_store.keys())
-    
-    if bot_id == '{BOT_ID}' or bot_id == '%7BBOT_ID%7D':
-        if len(available_bots) == 1:
-            real_bot_id = available_bots[0]
-            print(f"Using the only active bot ID: {real_bot_id} for audio command request")
-            bot_id = real_bot_id
-        elif len(available_bots) > 1:
-            latest_bot_id = available_bots[0]
-            print(f"Multiple bots active, using: {latest_bot_id}")
-            bot_id = latest_bot_id
-    
-    with audio_lock:
-        if bot_id in audio_commands_store:
-            command_data = audio_commands_store[bot_id]
-            
-            # Check if command has already been served
-            if command_data.get('served', False):
-                print(f"Command already served for Bot '{bot_id}', returning none")
-                return jsonify({"command": "none"})
-            
-            # Mark as served and return the command
-            audio_commands_store[bot_id]['served'] = True
-            
-            # Return the command without the 'served' flag
-            response_command = {
-                "command": command_data["command"],
-                "timestamp": command_data["timestamp"]
-            }
-            
-            # Add audio_file if it's a play command
-            if command_data["command"] == "play" and "audio_file" in command_data:
-                response_command["audio_file"] = command_data["audio_file"]
-            
-            print(f"Serving audio command for Bot '{bot_id}': {response_command}")
-            return jsonify(response_command)
-        else:
-            # No commands pending
-            return jsonify({"command": "none"})
+    """
+    Next audio command for a specific bot, oldest first.
+    ?wait=<seconds> long-polls until a command arrives; ?ack=<id>&epoch=<epoch> acknowledges
+    the previously delivered command. Unacknowledged commands are delivered again.
+    IDs only increase within one epoch - a page seeing a new epoch starts its cursor over.
+    """
+    bot_id = resolve_bot_id(bot_id)
+    wait = min(max(_parse_float(request.args.get('wait')) or 0, 0), AUDIO_LONG_POLL_MAX_SECONDS)
+    ack = _parse_seq(request.args.get('ack'))
+    
+    command = audio_commands.poll(bot_id, wait=wait, ack=ack, epoch=request.args.get('epoch') or None)
+    if command is None:
+        return jsonify({"command": "none"})
+    
+    audio_commands_served.inc()
+    if VERBOSE_LOGGING:
+        print(f"Serving audio command for Bot '{bot_id}': {command}")
+    return jsonify(command)
+
+@app.route('/api/bot/<bot_id>/audio-command/<int:command_id>/ack', methods=['POST'])
+def ack_audio_command(bot_id, command_id):
+    """Acknowledge a delivered audio command so it isn't delivered again"""
+    bot_id = resolve_bot_id(bot_id)
+    return jsonify({"acked": audio_commands.ack(bot_id, command_id)})
 
 @app.route('/api/recall-bots/<bot_id>/delete-media', methods=['POST'])
 def delete_bot_media(bot_id):
     """Delete media (recordings, transcripts, etc.) for a specific bot"""
-    headers = {
-        'Authorization': f'Token {RECALL_API_KEY}',
-        'Content-Type': 'application/json'
-    }
-    
     try:
-        api_base = get_recall_api_base()
-        response = requests.post(
-            f'{api_base}/bot/{bot_id}/delete_media',
-            headers=headers
-        )
+        response = recall.delete_media(bot_id)
         
         if response.status_code == 200:
+            recall_cache.invalidate('bots', f'bot:{bot_id}')
             return jsonify({
                 'success': True,
                 'message': f'Media for bot {bot_id} deleted successfully'
@@ -604,71 +1207,169 @@ def delete_bot_media(bot_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def forget_bot(bot_id):
+    """Drop everything held in memory for a bot deleted from Recall.ai"""
+    recall_cache.invalidate('bots', f'bot:{bot_id}')
+    transcripts.remove(bot_id)
+    bot_registry.remove(bot_id)
+    audio_commands.remove(bot_id)
+    transcript_dedup.remove(bot_id)
+    caption_traces.remove(bot_id)
+
+def _recall_bulk_action(call, on_success=None):
+    """Wrap a per-bot Recall.ai call as a bulk job action"""
+    def action(bot_id):
+        response = call(bot_id)
+        if response.status_code == 429:
+            # Still throttled after the client's own retries - slow every job down
+            bulk_jobs.limiter.penalize(float(response.headers.get('Retry-After', '1')))
+        if response.status_code >= 300:
+            return f'{response.status_code} {response.text[:200].strip()}'
+        if on_success:
+            on_success(bot_id)
+        return None
+    return action
+
+def _all_recall_bot_ids():
+    """Every bot ID in the Recall.ai account, following pagination"""
+    for bot in recall.iter_bots():
+        if bot.get('id'):
+            yield bot['id']
+
+def _job_response(job):
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status_url': f'/api/jobs/{job.id}',
+        'message': f'Started {job.kind} job'
+    }), 202
+
 @app.route('/api/recall-bots/delete-all-media', methods=['POST'])
 def delete_all_bot_media():
-    """Delete media for all bots"""
-    headers = {
-        'Authorization': f'Token {RECALL_API_KEY}',
-        'Content-Type': 'application/json'
-    }
-    
-    try:
-        # First get all bots
-        api_base = get_recall_api_base()
-        response = requests.get(
-            f'{api_base}/bot',
-            headers=headers
-        )
-        
-        if response.status_code != 200:
-            return jsonify({
-                'error': f'Failed to list bots: {response.text}',
-                'status_code': response.status_code
-            }), 400
-        
-        bots_data = response.json()
-        bots = bots_data.get('results', []) if 'results' in bots_data else bots_data
-        
-        if not bots:
-            return jsonify({
-                'success': True,
-                'message': 'No bots found to delete media from',
-                'deleted_count': 0
-            })
-        
-        # Delete media for each bot
-        deleted_count = 0
-        errors = []
-        
-        for bot in bots:
-            bot_id = bot.get('id')
-            if not bot_id:
-                continue
-                
-            try:
-                media_response = requests.post(
-                    f'{api_base}/bot/{bot_id}/delete_media',
-                    headers=headers
-                )
-                
-                if media_response.status_code == 200:
-                    deleted_count += 1
-                else:
-                    errors.append(f"Bot {bot_id}: {media_response.text}")
-                    
-            except Exception as e:
-                errors.append(f"Bot {bot_id}: {str(e)}")
-        
+    """Delete media for every bot in the account, as a background job"""
+    job = bulk_jobs.submit('delete_media', _all_recall_bot_ids(), _recall_bulk_action(
+        recall.delete_media,
+        on_success=lambda bot_id: recall_cache.invalidate('bots', f'bot:{bot_id}')
+    ))
+    print(f"🗂️ Started delete-all-media job {job.id}")
+    return _job_response(job)
+
+@app.route('/api/recall-bots/bulk-delete', methods=['POST'])
+def bulk_delete_recall_bots():
+    """Delete {"bot_ids": [...]} or, with {"all": true}, every bot in the account, as a background job"""
+    data = request.get_json(silent=True)
+    data = data if isinstance(data, dict) else {}
+    bot_ids = data.get('bot_ids')
+    if data.get('all') is True and bot_ids is None:
+        items = _all_recall_bot_ids()
+    elif isinstance(bot_ids, list) and bot_ids and all(isinstance(bot_id, str) and bot_id for bot_id in bot_ids):
+        items = list(dict.fromkeys(bot_ids))
+    else:
         return jsonify({
-            'success': True,
-            'message': f'Deleted media for {deleted_count} out of {len(bots)} bots',
-            'deleted_count': deleted_count,
-            'total_bots': len(bots),
-            'errors': errors if errors else None
-        })
-            
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+            'success': False,
+            'error': 'Expected {"bot_ids": ["..."]} or {"all": true}'
+        }), 400
+    job = bulk_jobs.submit('delete_bots', items, _recall_bulk_action(recall.delete_bot, on_success=forget_bot))
+    print(f"🗑️ Started bulk delete job {job.id}")
+    return _job_response(job)
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Progress of a background job"""
+    job = bulk_jobs.get(job_id) or deploy_jobs.get(job_id)
+    if job is not None:
+        return jsonify(job.to_dict())
+    # Started by another worker process - use the progress it last published
+    published = state_backend.load_job(job_id)
+    if published is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(published)
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """Recent background jobs (from every worker process with a shared backend), newest first"""
+    jobs = {job.id: job.to_dict() for job in bulk_jobs.jobs() + deploy_jobs.jobs()}
+    for published in state_backend.recent_jobs():
+        jobs.setdefault(published['job_id'], published)
+    return jsonify({'jobs': sorted(jobs.values(), key=lambda job: job['created_at'], reverse=True)})
+
+@app.route('/api/recall/stats', methods=['GET'])
+def recall_stats():
+    """Recall.ai client health: per-endpoint latency histograms, retries, circuit breaker and caches"""
+    stats = recall.stats()
+    stats['cache'] = recall_cache.stats()
+    stats['audio_cache'] = audio_cache.stats()
+    return jsonify(stats)
+
+@metrics.collector
+def collect_ingest_metrics():
+    stats = ingest_queue.stats()
+    yield ('ingest_queue_depth', 'gauge', 'Transcript events queued but not yet applied', [({}, stats['depth'])])
+    yield ('ingest_queue_oldest_event_age_seconds', 'gauge', 'Age of the oldest queued transcript event',
+           [({}, stats['oldest_event_age_ms'] / 1000)])
+    yield ('ingest_events_total', 'counter', 'Ingest queue events by outcome',
+           [({'outcome': outcome}, stats[outcome]) for outcome in ('enqueued', 'processed', 'dropped', 'rejected', 'errors')])
+    yield ('webhook_duplicates_dropped_total', 'counter', 'Webhook deliveries dropped as retries of accepted ones',
+           [({}, transcript_dedup.duplicates)])
+
+@metrics.collector
+def collect_state_metrics():
+    counts = transcripts.line_counts()
+    yield ('transcript_buffer_lines', 'gauge', 'Buffered transcript lines per bot',
+           [({'bot_id': bot_id}, count) for bot_id, count in counts.items()])
+    yield ('transcript_buffer_bytes', 'gauge', 'Bytes held by the transcript buffers (memory backend only)',
+           [({}, transcripts.stats().get('total_bytes'))])
+    audio = audio_commands.stats()
+    yield ('audio_command_queue_depth', 'gauge', 'Audio commands waiting for delivery or acknowledgement',
+           [({'state': 'pending'}, audio['pending']), ({'state': 'leased'}, audio['leased'])])
+    yield ('bot_sessions', 'gauge', 'Registered bot sessions', [({}, len(bot_registry))])
+    if transcript_log:
+        log = transcript_log.stats()
+        yield ('transcript_log_lines_written_total', 'counter', 'Transcript lines committed to the durable log',
+               [({}, log['written'])])
+        yield ('transcript_log_backlog', 'gauge', 'Transcript lines queued for the durable log but not yet committed',
+               [({}, log['backlog'])])
+
+@metrics.collector
+def collect_caption_metrics():
+    samples = []
+    for stage in STAGES:
+        summary = caption_traces.summary(stage)
+        for key, quantile in (('p50', '0.5'), ('p95', '0.95'), ('p99', '0.99')):
+            if summary[key] is not None:
+                samples.append(({'stage': stage, 'quantile': quantile}, summary[key] / 1000))
+    yield ('caption_latency_seconds', 'gauge', 'Recent caption latency percentiles by pipeline stage', samples)
+    yield ('caption_render_reports_total', 'counter', 'Render reports received from agent pages',
+           [({}, caption_traces.reports)])
+
+@metrics.collector
+def collect_recall_metrics():
+    stats = recall.stats()
+    histograms = recall.histograms()
+    bounds = [bound / 1000 for bound in LATENCY_BUCKETS_MS]
+    lines = []
+    for endpoint, (counts, _, total_ms, _) in histograms.items():
+        lines.extend(render_histogram('recall_request_duration_seconds', ('endpoint',), (endpoint,),
+                                      bounds, counts, total_ms / 1000))
+    yield ('recall_request_duration_seconds', 'histogram', 'Recall.ai API latency by endpoint', lines)
+    yield ('recall_request_errors_total', 'counter', 'Failed Recall.ai API calls by endpoint',
+           [({'endpoint': endpoint}, errors) for endpoint, (_, _, _, errors) in histograms.items()])
+    yield ('recall_retries_total', 'counter', 'Recall.ai API calls retried', [({}, stats['retries'])])
+    yield ('recall_circuit_open', 'gauge', '1 while the Recall.ai circuit breaker is not closed',
+           [({}, int(stats['circuit']['state'] != 'closed'))])
+    yield ('recall_circuit_trips_total', 'counter', 'Times the Recall.ai circuit breaker opened',
+           [({}, stats['circuit']['trips'])])
+    yield ('cache_requests_total', 'counter', 'Cache lookups by cache and result', [
+        ({'cache': 'recall', 'result': 'hit'}, recall_cache.hits),
+        ({'cache': 'recall', 'result': 'miss'}, recall_cache.misses),
+        ({'cache': 'audio', 'result': 'hit'}, audio_cache.hits),
+        ({'cache': 'audio', 'result': 'miss'}, audio_cache.misses)
+    ])
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Request, ingest, buffer, audio queue and Recall.ai metrics in the Prometheus text format"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/api/version', methods=['GET'])
 def get_version():
@@ -678,100 +1379,47 @@ def get_version():
 @app.route('/api/cleanup-old-bots', methods=['POST'])
 def cleanup_old_bots_endpoint():
     """Manually trigger cleanup of old bot data"""
-    most_recent_bot_id = cleanup_old_bots()
-    if most_recent_bot_id:
-        return jsonify({
-            'success': True,
-            'most_recent_bot_id': most_recent_bot_id,
-            'message': 'Old bot data cleaned up successfully'
-        })
-    else:
-        return jsonify({
-            'success': False,
-            'message': 'Failed to cleanup old bot data'
-        }), 500
+    removed = cleanup_old_bots()
+    return jsonify({
+        'success': True,
+        'most_recent_bot_id': bot_registry.most_recent(),
+        'removed_bots': removed,
+        'message': f'Cleaned up data for {len(removed)} old bots'
+    })
 
 def cleanup_old_bots():
-    """Remove data for old/expired bots, keeping only the most recent active bot"""
-    global most_recent_bot_id
+    """Remove data for bots whose sessions ended or went idle; returns the removed bot IDs"""
+    removed = bot_registry.prune(SESSION_IDLE_TIMEOUT_SECONDS, SESSION_ENDED_GRACE_SECONDS)
     
-    try:
-        # If we have a specific bot ID stored, use that
-        if most_recent_bot_id:
-            print(f"🧹 Cleanup: Using stored most recent bot ID: {most_recent_bot_id}")
-            
-            # Clean up transcript data - keep only the most recent bot
-            with transcript_lock:
-                old_bot_ids = [bot_id for bot_id in transcript_data_store.keys() if bot_id != most_recent_bot_id]
-                for old_bot_id in old_bot_ids:
-                    print(f"🧹 Removing old transcript data for bot: {old_bot_id}")
-                    del transcript_data_store[old_bot_id]
-            
-            # Clean up audio commands - keep only the most recent bot
-            with audio_lock:
-                old_bot_ids = [bot_id for bot_id in audio_commands_store.keys() if bot_id != most_recent_bot_id]
-                for old_bot_id in old_bot_ids:
-                    print(f"🧹 Removing old audio data for bot: {old_bot_id}")
-                    del audio_commands_store[old_bot_id]
-                    
-            return most_recent_bot_id
-        
-        # Fallback: Get all bots from Recall API and find the most recent one
-        print("🧹 No stored bot ID, checking Recall API...")
-        headers = {
-            'Authorization': f'Token {RECALL_API_KEY}',
-            'Content-Type': 'application/json'
-        }
-        api_base = get_recall_api_base()
-        response = requests.get(f'{api_base}/bot', headers=headers)
-        
-        if response.status_code == 200:
-            bots_data = response.json()
-            all_bots = bots_data.get('results', []) if 'results' in bots_data else bots_data
-            
-            if all_bots:
-                # Filter out expired bots first
-                active_bots = [bot for bot in all_bots if bot.get('status') != 'media_expired']
-                bots_to_use = active_bots if active_bots else all_bots
-                
-                # Just use the first bot (should be most recent) since dates aren't working
-                selected_bot = bots_to_use[0]
-                selected_bot_id = selected_bot['id']
-                
-                print(f"🧹 Cleanup: Selected bot ID from API: {selected_bot_id}")
-                print(f"🧹 Cleanup: Bot status: {selected_bot.get('status', 'unknown')}")
-                print(f"🧹 Cleanup: Total bots found: {len(all_bots)}")
-                print(f"🧹 Cleanup: Active bots: {len(active_bots)}")
-                
-                # Clean up transcript data - keep only the selected bot
-                with transcript_lock:
-                    old_bot_ids = [bot_id for bot_id in transcript_data_store.keys() if bot_id != selected_bot_id]
-                    for old_bot_id in old_bot_ids:
-                        print(f"🧹 Removing old transcript data for bot: {old_bot_id}")
-                        del transcript_data_store[old_bot_id]
-                
-                # Clean up audio commands - keep only the selected bot
-                with audio_lock:
-                    old_bot_ids = [bot_id for bot_id in audio_commands_store.keys() if bot_id != selected_bot_id]
-                    for old_bot_id in old_bot_ids:
-                        print(f"🧹 Removing old audio data for bot: {old_bot_id}")
-                        del audio_commands_store[old_bot_id]
-                        
-                return selected_bot_id
-                
-    except Exception as e:
-        print(f"Error during cleanup: {e}")
+    for old_bot_id in removed:
+        transcripts.remove(old_bot_id)
+        audio_commands.remove(old_bot_id)
+        transcript_dedup.remove(old_bot_id)
+        caption_traces.remove(old_bot_id)
     
-    return None
+    if removed:
+        print(f"🧹 Cleanup: Removed data for {len(removed)} ended/idle bots: {removed}")
+    return removed
+
+@app.route('/api/sessions', methods=['GET'])
+def list_sessions():
+    """List every tracked bot session, most recently deployed first"""
+    sessions = [session.to_dict() for session in bot_registry.sessions()]
+    return jsonify({
+        'sessions': sessions,
+        'count': len(sessions)
+    })
 
 @app.route('/api/latest-bot-id', methods=['GET'])
 def get_latest_bot_id():
-    """Get the most recently deployed bot ID"""
-    global most_recent_bot_id
-    if most_recent_bot_id:
+    """Get the bot ID for the calling agent page (via ?agent_token=) or the most recently deployed bot"""
+    agent_token = request.args.get('agent_token')
+    session = bot_registry.by_token(agent_token) if agent_token else None
+    bot_id = session.bot_id if session else bot_registry.most_recent()
+    if bot_id:
         return jsonify({
             'success': True,
-            'bot_id': most_recent_bot_id
+            'bot_id': bot_id
         })
     else:
         return jsonify({
@@ -785,43 +1433,26 @@ def speak_audio(bot_id):
     data = request.get_json()
     audio_file = data.get('audio_file', 'ElevenLabs_2025-06-06T23_00_36_karma_20250606-VO_pvc_sp100_s63_sb67_se0_b_m2.mp3')
     
-    print(f"🤖 BOT NATIVE AUDIO: Making bot {bot_id} play native audio: {audio_file}")
+    if VERBOSE_LOGGING:
+        print(f"🤖 BOT NATIVE AUDIO: Making bot {bot_id} play native audio: {audio_file}")
     
     try:
-        # Read and encode the audio file as base64
-        import base64
-        audio_file_path = os.path.join('audio', audio_file)
+        # The pre-encoded {"kind": "mp3", "b64_data": ...} body, cached until the file changes
+        payload = audio_cache.payload(audio_file)
         
-        if not os.path.exists(audio_file_path):
-            print(f"❌ BOT NATIVE AUDIO: Audio file not found: {audio_file_path}")
+        if payload is None:
+            print(f"❌ BOT NATIVE AUDIO: Audio file not found: {audio_file}")
             return jsonify({
                 "status": "error", 
                 "message": f"Audio file not found: {audio_file}"
             }), 404
         
-        # Read audio file and encode as base64
-        with open(audio_file_path, 'rb') as f:
-            audio_data = f.read()
-            b64_audio = base64.b64encode(audio_data).decode('utf-8')
-        
-        # Use Recall.ai's Output Audio API with correct format
-        headers = {
-            'Authorization': f'Token {RECALL_API_KEY}',
-            'Content-Type': 'application/json'
-        }
-        
-        # Payload with correct format from documentation
-        payload = {
-            "kind": "mp3",
-            "b64_data": b64_audio
-        }
-        
         # Call Recall.ai's Output Audio API
-        recall_url = f"{get_recall_api_base()}/bot/{bot_id}/output_audio/"
-        response = requests.post(recall_url, json=payload, headers=headers)
+        response = recall.output_audio(bot_id, payload)
         
         if response.status_code == 200:
-            print(f"✅ BOT NATIVE AUDIO: Successfully triggered native audio output")
+            if VERBOSE_LOGGING:
+                print(f"✅ BOT NATIVE AUDIO: Successfully triggered native audio output")
             return jsonify({
                 "status": "success", 
                 "message": "Native audio playing through Zoom",
@@ -847,20 +1478,16 @@ def speak_audio(bot_id):
 @app.route('/api/bot/<bot_id>/stop-speaking', methods=['POST'])
 def stop_speaking(bot_id):
     """Stop the Recall.ai bot from speaking"""
-    print(f"🤖 BOT STOP: Stopping bot {bot_id} from speaking")
+    if VERBOSE_LOGGING:
+        print(f"🤖 BOT STOP: Stopping bot {bot_id} from speaking")
     
     try:
-        headers = {
-            'Authorization': f'Token {RECALL_API_KEY}',
-            'Content-Type': 'application/json'
-        }
-        
         # Call Recall.ai's Delete Output Audio API
-        recall_url = f"{get_recall_api_base()}/bot/{bot_id}/output_audio/"
-        response = requests.delete(recall_url, headers=headers)
+        response = recall.stop_output_audio(bot_id)
         
         if response.status_code in [200, 204]:
-            print(f"✅ BOT STOP: Successfully stopped bot audio output")
+            if VERBOSE_LOGGING:
+                print(f"✅ BOT STOP: Successfully stopped bot audio output")
             return jsonify({
                 "status": "success", 
                 "message": "Bot stopped speaking"
@@ -884,17 +1511,10 @@ def stop_speaking(bot_id):
 def get_chat_messages(bot_id):
     """Get recent chat messages for audio command detection"""
     try:
-        headers = {
-            'Authorization': f'Token {RECALL_API_KEY}',
-            'Content-Type': 'application/json'
-        }
-        
         # Get bot details which may include chat messages
-        recall_url = f"{get_recall_api_base()}/bot/{bot_id}/"
-        response = requests.get(recall_url, headers=headers)
+        status_code, bot_data = cached_recall_get(f'bot:{bot_id}', lambda: recall.get_bot(bot_id))
         
-        if response.status_code == 200:
-            bot_data = response.json()
+        if status_code == 200:
             # Return mock chat messages for now - this would need proper chat API integration
             return jsonify({
                 "messages": [
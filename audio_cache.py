@@ -0,0 +1,127 @@
+# audio_cache.py - LRU cache of audio clips pre-encoded as Recall.ai output_audio payloads
+import base64
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# File extension -> the "kind" Recall.ai's output_audio expects
+AUDIO_KINDS = {'.mp3': 'mp3'}
+
+
+class _Clip:
+    __slots__ = ('mtime_ns', 'size', 'body')
+
+    def __init__(self, mtime_ns, size, body):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.body = body   # Complete JSON request body, ready to send
+
+
+class AudioPayloadCache:
+    """
+    Holds the output_audio JSON body ({"kind", "b64_data"}) for recently played clips, so
+    repeat playback skips the read and base64 encoding. An entry is reused only while the
+    file's mtime and size are unchanged; least recently used clips go first once the
+    encoded bodies exceed max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._clips = OrderedDict()   # filename -> _Clip, least recently used first
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def path(self, filename):
+        """Path of a clip in the audio directory, or None for names that would escape it"""
+        if not filename or os.path.basename(filename) != filename or filename.startswith('.'):
+            return None
+        return os.path.join(self.directory, filename)
+
+    def payload(self, filename):
+        """
+        The output_audio request body for filename as bytes, or None if there is no such clip.
+        Costs one stat() on a hit.
+        """
+        return self._payload(filename, record=True)
+
+    def _payload(self, filename, record):
+        """payload(); record=False leaves the hit/miss counts alone (warm-up loads aren't lookups)"""
+        path = self.path(filename)
+        kind = AUDIO_KINDS.get(os.path.splitext(filename or '')[1].lower())
+        if path is None or kind is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._discard(filename)
+            return None
+
+        with self.lock:
+            clip = self._clips.get(filename)
+            if clip is not None:
+                if clip.mtime_ns == stat.st_mtime_ns and clip.size == stat.st_size:
+                    self._clips.move_to_end(filename)
+                    self.hits += record
+                    return clip.body
+                # The file changed on disk since it was cached
+                self._remove_locked(filename)
+                self.invalidations += 1
+            self.misses += record
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        body = json.dumps({"kind": kind, "b64_data": base64.b64encode(data).decode('ascii')}).encode('utf-8')
+
+        with self.lock:
+            if len(body) <= self.max_bytes:
+                self._remove_locked(filename)
+                self._clips[filename] = _Clip(stat.st_mtime_ns, stat.st_size, body)
+                self.bytes += len(body)
+                while self.bytes > self.max_bytes:
+                    oldest = next(iter(self._clips))
+                    self._remove_locked(oldest)
+                    self.evictions += 1
+        return body
+
+    def _remove_locked(self, filename):
+        clip = self._clips.pop(filename, None)
+        if clip is not None:
+            self.bytes -= len(clip.body)
+
+    def _discard(self, filename):
+        with self.lock:
+            self._remove_locked(filename)
+
+    def warm(self):
+        """Preload every playable clip in the directory (until the cap is reached); returns the count"""
+        try:
+            names = sorted(os.listdir(self.directory))
+        except OSError:
+            return 0
+        loaded = 0
+        for name in names:
+            if os.path.splitext(name)[1].lower() in AUDIO_KINDS and self._payload(name, record=False) is not None:
+                loaded += 1
+                if self.bytes >= self.max_bytes:
+                    break
+        return loaded
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "clips": len(self._clips),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions
+            }
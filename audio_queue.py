@@ -0,0 +1,151 @@
+# audio_queue.py - Per-bot FIFO of audio commands with long-poll delivery and acks
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class _BotQueue:
+    """Commands for one bot. Each bot has its own condition, so a push only wakes that bot's pollers."""
+    __slots__ = ('cond', 'pending', 'leased', 'next_id', 'epoch', 'closed')
+
+    def __init__(self):
+        self.cond = threading.Condition(threading.Lock())
+        self.pending = deque()        # commands not yet delivered, oldest first
+        self.leased = OrderedDict()   # id -> [command, lease expiry, deliveries], oldest first
+        self.next_id = 1
+        # IDs restart with every queue (new process, or the bot's queue removed) - the epoch tells pages so
+        self.epoch = format(time.time_ns(), 'x')
+        self.closed = False
+
+
+class AudioCommandQueue:
+    """
+    Ordered audio commands per bot.
+    A poll leases the oldest command; the agent acknowledges it by ID (on the next poll
+    or explicitly). Every command carries its queue's epoch: IDs only increase within one. Commands that aren't acknowledged before the lease runs out are
+    delivered again, up to max_deliveries times, so a dropped response loses nothing.
+    """
+
+    def __init__(self, lease_seconds=30, max_deliveries=3, max_pending=100):
+        self.lease_seconds = lease_seconds
+        self.max_deliveries = max_deliveries
+        self.max_pending = max_pending
+        self.lock = threading.Lock()   # Only guards the bot_id -> queue map
+        self._queues = {}
+        self.pushed = 0
+        self.delivered = 0
+        self.redelivered = 0
+        self.acked = 0
+        self.expired = 0
+
+    def _queue(self, bot_id):
+        queue = self._queues.get(bot_id)
+        if queue is None:
+            with self.lock:
+                queue = self._queues.setdefault(bot_id, _BotQueue())
+        return queue
+
+    def push(self, bot_id, command, **fields):
+        """Queue a command for bot_id; returns it with its ID, or None if the queue is full"""
+        queue = self._queue(bot_id)
+        with queue.cond:
+            if len(queue.pending) + len(queue.leased) >= self.max_pending:
+                return None
+            entry = {"id": queue.next_id, "epoch": queue.epoch, "command": command, "timestamp": time.time()}
+            entry.update(fields)
+            queue.next_id += 1
+            queue.pending.append(entry)
+            self.pushed += 1
+            queue.cond.notify_all()
+        return entry
+
+    def ack(self, bot_id, command_id):
+        """Acknowledge a delivered command; returns True if it was outstanding"""
+        queue = self._queues.get(bot_id)
+        if queue is None:
+            return False
+        with queue.cond:
+            return self._ack_locked(queue, command_id)
+
+    def _ack_locked(self, queue, command_id):
+        if queue.leased.pop(command_id, None) is None:
+            return False
+        self.acked += 1
+        return True
+
+    def _next_locked(self, queue, now):
+        """Lease the next command to deliver, or return (None, seconds until a lease expires)"""
+        next_expiry = None
+        for command_id, lease in list(queue.leased.items()):
+            command, expires, deliveries = lease
+            if expires > now:
+                next_expiry = expires if next_expiry is None else min(next_expiry, expires)
+                continue
+            if deliveries >= self.max_deliveries:
+                # Never acknowledged - the agent page is gone or keeps failing on it
+                del queue.leased[command_id]
+                self.expired += 1
+                continue
+            lease[1] = now + self.lease_seconds
+            lease[2] += 1
+            self.redelivered += 1
+            return command, None
+
+        if queue.pending:
+            command = queue.pending.popleft()
+            queue.leased[command["id"]] = [command, now + self.lease_seconds, 1]
+            self.delivered += 1
+            return command, None
+        return None, (next_expiry - now if next_expiry is not None else None)
+
+    def poll(self, bot_id, wait=0, ack=None, epoch=None):
+        """
+        Next command for bot_id, blocking up to wait seconds for one to arrive.
+        ack acknowledges the previously delivered command in the same round trip; it is
+        ignored when epoch names an earlier queue, whose IDs may be reused by this one.
+        Returns None when nothing arrived in time.
+        """
+        queue = self._queue(bot_id)
+        deadline = time.monotonic() + wait
+        with queue.cond:
+            if ack and (epoch is None or epoch == queue.epoch):
+                self._ack_locked(queue, ack)
+            while not queue.closed:
+                command, expires_in = self._next_locked(queue, time.time())
+                if command is not None:
+                    return command
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                # Wake for a push, or in time to redeliver a lapsed lease
+                queue.cond.wait(remaining if expires_in is None else min(remaining, expires_in))
+        return None
+
+    def remove(self, bot_id):
+        """Drop a bot's queue and release anyone long-polling it"""
+        with self.lock:
+            queue = self._queues.pop(bot_id, None)
+        if queue is not None:
+            with queue.cond:
+                queue.closed = True
+                queue.cond.notify_all()
+        return queue is not None
+
+    def depth(self, bot_id):
+        """Commands waiting for delivery or acknowledgement"""
+        queue = self._queues.get(bot_id)
+        return len(queue.pending) + len(queue.leased) if queue is not None else 0
+
+    def stats(self):
+        with self.lock:
+            queues = list(self._queues.values())
+        return {
+            "bots": len(queues),
+            "pending": sum(len(queue.pending) for queue in queues),
+            "leased": sum(len(queue.leased) for queue in queues),
+            "pushed": self.pushed,
+            "delivered": self.delivered,
+            "redelivered": self.redelivered,
+            "acked": self.acked,
+            "expired": self.expired
+        }
@@ -0,0 +1,143 @@
+# bench/fake_recall.py - Local stand-in for the parts of the Recall.ai API the dashboard calls
+#
+# Bots live in memory. Every response can be delayed (--latency-ms) and a share of calls can
+# fail with 503 (--error-rate) to exercise the client's retries and circuit breaker.
+#
+#   python bench/fake_recall.py --port 5088
+#   RECALL_API_BASE=http://127.0.0.1:5088/api/v1 python app.py
+import argparse
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+PAGE_SIZE = 50
+
+
+class FakeRecall:
+    """Bot create/list/retrieve/delete, output_audio and delete_media, with call counts per endpoint"""
+
+    def __init__(self, latency_ms=0.0, error_rate=0.0):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.bots = {}    # bot_id -> bot dict, in creation order
+        self.calls = {}   # endpoint name -> count
+        self.app = self._build_app()
+
+    def _call(self, endpoint):
+        with self.lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            return jsonify({'detail': 'Injected failure'}), 503
+        return None
+
+    def _build_app(self):
+        app = Flask('fake_recall')
+        app.url_map.strict_slashes = False
+
+        @app.route('/api/v1/bot', methods=['POST'])
+        def create_bot():
+            failed = self._call('bot.create')
+            if failed:
+                return failed
+            payload = request.get_json(silent=True) or {}
+            bot_id = str(uuid.uuid4())
+            bot = {
+                'id': bot_id,
+                'meeting_url': payload.get('meeting_url'),
+                'bot_name': payload.get('bot_name'),
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'status_changes': [{'code': 'joining_call', 'created_at': datetime.now(timezone.utc).isoformat()}],
+                'media_deleted': False
+            }
+            with self.lock:
+                self.bots[bot_id] = bot
+            return jsonify(bot), 201
+
+        @app.route('/api/v1/bot', methods=['GET'])
+        def list_bots():
+            failed = self._call('bot.list')
+            if failed:
+                return failed
+            page = max(1, request.args.get('page', 1, type=int))
+            with self.lock:
+                bots = list(self.bots.values())
+            results = bots[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+            has_next = page * PAGE_SIZE < len(bots)
+            return jsonify({
+                'count': len(bots),
+                'next': f'{request.base_url}?page={page + 1}' if has_next else None,
+                'results': results
+            })
+
+        @app.route('/api/v1/bot/<bot_id>', methods=['GET'])
+        def retrieve_bot(bot_id):
+            failed = self._call('bot.retrieve')
+            if failed:
+                return failed
+            bot = self.bots.get(bot_id)
+            return (jsonify(bot), 200) if bot else (jsonify({'detail': 'Not found.'}), 404)
+
+        @app.route('/api/v1/bot/<bot_id>', methods=['DELETE'])
+        def delete_bot(bot_id):
+            failed = self._call('bot.delete')
+            if failed:
+                return failed
+            with self.lock:
+                bot = self.bots.pop(bot_id, None)
+            return ('', 204) if bot else (jsonify({'detail': 'Not found.'}), 404)
+
+        @app.route('/api/v1/bot/<bot_id>/output_audio', methods=['POST', 'DELETE'])
+        def output_audio(bot_id):
+            failed = self._call('bot.output_audio' if request.method == 'POST' else 'bot.stop_output_audio')
+            if failed:
+                return failed
+            if bot_id not in self.bots:
+                return jsonify({'detail': 'Not found.'}), 404
+            if request.method == 'POST':
+                payload = request.get_json(silent=True) or {}
+                if payload.get('kind') != 'mp3' or not payload.get('b64_data'):
+                    return jsonify({'detail': 'kind and b64_data are required'}), 400
+            return jsonify({'status': 'ok'})
+
+        @app.route('/api/v1/bot/<bot_id>/delete_media', methods=['POST'])
+        def delete_media(bot_id):
+            failed = self._call('bot.delete_media')
+            if failed:
+                return failed
+            bot = self.bots.get(bot_id)
+            if bot is None:
+                return jsonify({'detail': 'Not found.'}), 404
+            bot['media_deleted'] = True
+            return jsonify({'status': 'ok'})
+
+        return app
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serve on a background thread; returns the server (call shutdown() to stop it)"""
+        server = make_server(host, port, self.app, threaded=True)
+        threading.Thread(target=server.serve_forever, name='fake-recall', daemon=True).start()
+        return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local fake Recall.ai API')
+    parser.add_argument('--port', type=int, default=5088)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='delay added to every response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of calls answered with 503')
+    args = parser.parse_args()
+
+    fake = FakeRecall(args.latency_ms, args.error_rate)
+    print(f"Fake Recall.ai API on http://127.0.0.1:{args.port}/api/v1")
+    make_server('127.0.0.1', args.port, fake.app, threaded=True).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
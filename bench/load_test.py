@@ -0,0 +1,552 @@
+# bench/load_test.py - End-to-end load test of app.py against a local fake Recall.ai API
+#
+# Starts app.py in its own process (threaded werkzeug server) pointed at bench/fake_recall.py,
+# deploys --bots agents through /api/deploy-agents, then for --seconds:
+#   - replays synthetic transcript.data webhooks at --rate events/s spread over the bots
+#   - runs --pages simulated agent pages, each polling (or streaming) its bot's transcript,
+#     long-polling audio commands and reporting rendered lines for caption tracing
+#   - queues play-audio commands (--audio-rate/s) and plays native audio through Recall's
+#     output_audio (--speak-rate/s)
+# and finally lists the bots and deletes their media and the bots themselves.
+#
+# Reports throughput and p50/p95/p99 latency per operation, the app's memory (RSS, Linux only)
+# and its own ingest/caption/Recall stats. Each run is saved to bench/results/ as JSON and
+# compared with the latest earlier run, so hot-path regressions show up release to release.
+# The load generator runs on the same host, so compare runs from the same machine.
+#
+#   python bench/load_test.py --bots 10 --pages 10 --rate 200 --seconds 30
+#   python bench/load_test.py --compare bench/results/OLD.json bench/results/NEW.json
+import argparse
+import glob
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from fake_recall import FakeRecall
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'bench', 'results')
+
+# Runs the app without per-request access logging, which would dominate at high rates
+SERVE_APP = '''
+import logging, sys
+from werkzeug.serving import make_server
+import app
+logging.getLogger('werkzeug').setLevel(logging.ERROR)
+make_server('127.0.0.1', int(sys.argv[1]), app.app, threaded=True).serve_forever()
+'''
+
+SPEAKERS = ('Alice', 'Bob', 'Carol', 'Dan')
+WORDS = ('so the plan for this quarter is to ship the new onboarding flow first and then '
+         'look at pricing once we have numbers from the pilot customers').split()
+# Every synthetic line ends with a unique marker word so pages can time it end to end
+MARKER = re.compile(r'\bq(\d+)\b')
+
+# Compared between runs, in this order
+COMPARED = ('per_second', 'p50_ms', 'p95_ms', 'p99_ms')
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid):
+    """Resident memory of a process in MB, or None where /proc isn't available"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class Recorder:
+    """Latency samples (ms) and error counts per operation, shared by every load thread"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, op, elapsed_ms, ok=True):
+        with self.lock:
+            self.samples.setdefault(op, []).append(elapsed_ms)
+            if not ok:
+                self.errors[op] = self.errors.get(op, 0) + 1
+
+    def call(self, session, op, method, url, **kwargs):
+        """Issue a request and record it; returns the response, or None on a connection error"""
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=30, **kwargs)
+        except requests.RequestException:
+            self.record(op, (time.perf_counter() - started) * 1000, ok=False)
+            return None
+        self.record(op, (time.perf_counter() - started) * 1000, ok=response.status_code < 400)
+        return response
+
+    def summary(self, seconds):
+        with self.lock:
+            ops = {op: list(samples) for op, samples in self.samples.items()}
+            errors = dict(self.errors)
+        return {
+            op: {
+                'count': len(samples),
+                'errors': errors.get(op, 0),
+                'per_second': round(len(samples) / seconds, 2) if seconds else None,
+                'p50_ms': round(percentile(samples, 50), 2),
+                'p95_ms': round(percentile(samples, 95), 2),
+                'p99_ms': round(percentile(samples, 99), 2),
+                'max_ms': round(max(samples), 2)
+            }
+            for op, samples in sorted(ops.items())
+        }
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.base = None
+        self.bot_ids = []
+        self.stop = threading.Event()
+        self.load = Recorder()        # Operations during the timed load phase
+        self.lifecycle = Recorder()   # Deploy and teardown
+        self.markers = itertools.count(1)
+        self.sent = {}                # marker -> perf_counter when its webhook was sent
+        self.audio_queued = {}        # command_id -> perf_counter when it was queued
+        self.webhooks_late = 0
+        self.memory = []
+
+    # Processes
+
+    def start_app(self, recall_port, workdir):
+        port = free_port()
+        env = dict(os.environ)
+        env.update({
+            'RECALL_API_KEY': 'bench',
+            'RECALL_API_BASE': f'http://127.0.0.1:{recall_port}/api/v1',
+            'BACKEND_URL': f'http://127.0.0.1:{port}',
+            'TRANSCRIPT_LOG_PATH': '' if self.args.no_log else os.path.join(workdir, 'transcripts.db'),
+            'STATE_BACKEND': self.args.state_backend,
+            'STATE_DB_PATH': os.path.join(workdir, 'state.db'),
+            'PYTHONUNBUFFERED': '1'
+        })
+        env.pop('VERBOSE_LOGGING', None)
+        self.app_log = os.path.join(workdir, 'app.log')
+        with open(self.app_log, 'w') as log:
+            self.process = subprocess.Popen([sys.executable, '-c', SERVE_APP, str(port)], cwd=ROOT, env=env,
+                                            stdout=log, stderr=subprocess.STDOUT)
+        self.base = f'http://127.0.0.1:{port}'
+
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                if requests.get(self.base + '/api/version', timeout=1).ok:
+                    return
+            except requests.RequestException:
+                time.sleep(0.1)
+        self.stop_app()
+        with open(self.app_log) as log:
+            sys.exit(f'app.py did not start:\n{log.read()[-2000:]}')
+
+    def stop_app(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+    # Setup and teardown
+
+    def deploy(self):
+        session = requests.Session()
+        meetings = [f'https://zoom.us/j/{9000000000 + i}' for i in range(self.args.bots)]
+        started = time.perf_counter()
+        response = self.lifecycle.call(session, 'deploy_request', 'POST', self.base + '/api/deploy-agents',
+                                       json={'meetings': meetings, 'agent_name': 'Bench Agent'})
+        if response is None or response.status_code != 202:
+            sys.exit(f'Deploy failed: {response.status_code if response is not None else "no response"}')
+        job_id = response.json()['job_id']
+        while True:
+            job = session.get(f'{self.base}/api/jobs/{job_id}', timeout=10).json()
+            if job['state'] != 'running':
+                break
+            time.sleep(0.1)
+        self.lifecycle.record('deploy_job', (time.perf_counter() - started) * 1000, ok=not job['failed'])
+        self.bot_ids = [result['result']['bot_id'] for result in job.get('results', []) if result['success']]
+        if not self.bot_ids:
+            sys.exit(f'No bots deployed: {job.get("errors")}')
+
+    def teardown(self):
+        session = requests.Session()
+        self.lifecycle.call(session, 'recall_bots_list', 'GET', self.base + '/api/recall-bots')
+        for bot_id in self.bot_ids:
+            self.lifecycle.call(session, 'delete_media', 'POST', f'{self.base}/api/recall-bots/{bot_id}/delete-media')
+            self.lifecycle.call(session, 'delete_bot', 'DELETE', f'{self.base}/api/recall-bots/{bot_id}')
+
+    # Load
+
+    def transcript_event(self, bot_id, utterance):
+        """A transcript.data webhook whose words are timed as if spoken just now"""
+        marker = f'q{next(self.markers)}'
+        start = utterance * 4.0   # Far enough apart that consecutive lines are never merged
+        words = [{'text': word,
+                  'start_timestamp': {'relative': start + i * 0.25},
+                  'end_timestamp': {'relative': start + i * 0.25 + 0.2}}
+                 for i, word in enumerate(random.sample(WORDS, 7) + [marker])]
+        words[-1]['end_timestamp']['absolute'] = datetime.now(timezone.utc).isoformat()
+        speaker = utterance % len(SPEAKERS)
+        payload = {
+            'event': 'transcript.data',
+            'data': {'bot': {'id': bot_id},
+                     'data': {'participant': {'id': speaker, 'name': SPEAKERS[speaker]}, 'words': words}}
+        }
+        return marker, payload
+
+    def webhook_sender(self, index, rate):
+        """Open loop: events go out on schedule whether or not earlier ones were answered"""
+        session = requests.Session()
+        interval = 1 / rate
+        utterances = {bot_id: 0 for bot_id in self.bot_ids}
+        bots = itertools.cycle(self.bot_ids[index:] + self.bot_ids[:index])
+        next_at = time.perf_counter()
+        while not self.stop.is_set():
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -interval:
+                with self.load.lock:
+                    self.webhooks_late += 1
+            next_at += interval
+
+            bot_id = next(bots)
+            utterances[bot_id] += 1
+            marker, payload = self.transcript_event(bot_id, utterances[bot_id])
+            self.sent[marker] = time.perf_counter()
+            self.load.call(session, 'webhook', 'POST', self.base + '/api/webhook/transcript', json=payload)
+
+    def lines_received(self, lines, rendered):
+        now = time.perf_counter()
+        for line in lines:
+            for marker in MARKER.findall(line.get('text', '')):
+                sent = self.sent.get(f'q{marker}')
+                if sent is not None:
+                    self.load.record('caption_end_to_end', (now - sent) * 1000)
+            if line.get('seq'):
+                rendered.append({'seq': line['seq'], 'render_ms': 0})
+
+    def report_rendered(self, session, bot_id, rendered):
+        if rendered:
+            self.load.call(session, 'caption_trace', 'POST', f'{self.base}/api/bot/{bot_id}/caption-trace',
+                           json={'rendered': rendered[:100]})
+            del rendered[:100]
+
+    def transcript_poller(self, bot_id):
+        session = requests.Session()
+        since, etag, rendered = 0, None, []
+        last_report = time.perf_counter()
+        while not self.stop.is_set():
+            headers = {'If-None-Match': etag} if etag else {}
+            response = self.load.call(session, 'transcript_poll', 'GET', f'{self.base}/api/bot/{bot_id}/transcript',
+                                      params={'since': since}, headers=headers)
+            if response is not None and response.status_code == 200:
+                lines = response.json()
+                self.lines_received(lines, rendered)
+                if lines:
+                    since = lines[-1]['seq']
+                etag = response.headers.get('ETag')
+            if time.perf_counter() - last_report >= 2:
+                self.report_rendered(session, bot_id, rendered)
+                last_report = time.perf_counter()
+            self.stop.wait(self.args.poll_interval)
+
+    def transcript_streamer(self, bot_id):
+        session = requests.Session()
+        rendered = []
+        last_report = time.perf_counter()
+        while not self.stop.is_set():
+            try:
+                with session.get(f'{self.base}/api/bot/{bot_id}/transcript/stream', stream=True, timeout=30) as response:
+                    for raw in response.iter_lines(decode_unicode=True):
+                        if self.stop.is_set():
+                            return
+                        if raw and raw.startswith('data: '):
+                            self.lines_received([json.loads(raw[6:])], rendered)
+                        if time.perf_counter() - last_report >= 2:
+                            self.report_rendered(session, bot_id, rendered)
+                            last_report = time.perf_counter()
+            except requests.RequestException:
+                self.load.record('transcript_stream', 0, ok=False)
+
+    def audio_poller(self, bot_id):
+        session = requests.Session()
+        ack = 0
+        while not self.stop.is_set():
+            response = self.load.call(session, 'audio_command_poll', 'GET',
+                                      f'{self.base}/api/bot/{bot_id}/audio-command',
+                                      params={'wait': self.args.audio_wait, 'ack': ack})
+            if response is None or response.status_code != 200:
+                self.stop.wait(1)
+                continue
+            command = response.json()
+            if command.get('id'):
+                ack = command['id']
+                queued = self.audio_queued.pop(ack, None)
+                if queued is not None:
+                    self.load.record('audio_command_delivery', (time.perf_counter() - queued) * 1000)
+
+    def operator(self, op, rate, action):
+        session = requests.Session()
+        bots = itertools.cycle(self.bot_ids)
+        while not self.stop.wait(1 / rate):
+            action(session, op, next(bots))
+
+    def play_audio(self, session, op, bot_id):
+        queued = time.perf_counter()
+        response = self.load.call(session, op, 'POST', f'{self.base}/api/bot/{bot_id}/play-audio', json={})
+        if response is not None and response.status_code == 200:
+            self.audio_queued[response.json()['command_id']] = queued
+
+    def speak_audio(self, session, op, bot_id):
+        self.load.call(session, op, 'POST', f'{self.base}/api/bot/{bot_id}/speak-audio', json={})
+
+    def scraper(self):
+        session = requests.Session()
+        while not self.stop.wait(5):
+            self.load.call(session, 'metrics_scrape', 'GET', self.base + '/metrics')
+
+    def memory_sampler(self):
+        while not self.stop.wait(0.5):
+            sample = rss_mb(self.process.pid)
+            if sample is not None:
+                self.memory.append(sample)
+
+    def run_load(self):
+        args = self.args
+        threads = [threading.Thread(target=self.memory_sampler), threading.Thread(target=self.scraper)]
+        senders = max(1, min(args.senders, len(self.bot_ids) * 4))
+        threads += [threading.Thread(target=self.webhook_sender, args=(i, args.rate / senders)) for i in range(senders)]
+        reader = self.transcript_streamer if args.transport == 'stream' else self.transcript_poller
+        for page in range(args.pages):
+            bot_id = self.bot_ids[page % len(self.bot_ids)]
+            threads += [threading.Thread(target=reader, args=(bot_id,)), threading.Thread(target=self.audio_poller, args=(bot_id,))]
+        if args.audio_rate:
+            threads.append(threading.Thread(target=self.operator, args=('play_audio', args.audio_rate, self.play_audio)))
+        if args.speak_rate:
+            threads.append(threading.Thread(target=self.operator, args=('speak_audio', args.speak_rate, self.speak_audio)))
+
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        started = time.perf_counter()
+        time.sleep(args.seconds)
+        self.stop.set()
+        elapsed = time.perf_counter() - started
+        # Long polls and streams end within their wait; anything slower is abandoned
+        for thread in threads:
+            thread.join(timeout=args.audio_wait + 2)
+        return elapsed
+
+    def server_stats(self):
+        session = requests.Session()
+        stats = {}
+        for name, path in (('ingest', '/api/ingest/stats'), ('caption_latency', '/api/caption-latency'),
+                           ('recall', '/api/recall/stats')):
+            try:
+                stats[name] = session.get(self.base + path, timeout=10).json()
+            except (requests.RequestException, ValueError):
+                stats[name] = None
+        if stats.get('caption_latency'):
+            stats['caption_latency'].pop('bots', None)   # Per-bot detail is too big to keep per run
+        return stats
+
+    def run(self):
+        args = self.args
+        fake = FakeRecall(latency_ms=args.recall_latency_ms, error_rate=args.recall_error_rate)
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)   # The fake's access log
+        recall_port = free_port()
+        recall_server = fake.serve(recall_port)
+        with tempfile.TemporaryDirectory(prefix='bench-') as workdir:
+            self.start_app(recall_port, workdir)
+            try:
+                rss_start = rss_mb(self.process.pid)
+                deploy_started = time.perf_counter()
+                self.deploy()
+                deploy_seconds = time.perf_counter() - deploy_started
+                elapsed = self.run_load()
+                server = self.server_stats()
+                rss_end = rss_mb(self.process.pid)
+                teardown_started = time.perf_counter()
+                self.teardown()
+                lifecycle_seconds = deploy_seconds + time.perf_counter() - teardown_started
+            finally:
+                self.stop_app()
+                recall_server.shutdown()
+
+        return {
+            'version': read_version(),
+            'git_commit': git_commit(),
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': {key: value for key, value in vars(args).items() if key not in ('compare', 'baseline', 'no_save')},
+            'duration_seconds': round(elapsed, 2),
+            'webhooks': {
+                'target_per_second': args.rate,
+                'sent': len(self.sent),
+                'achieved_per_second': round(len(self.sent) / elapsed, 2),
+                'late': self.webhooks_late
+            },
+            'operations': self.load.summary(elapsed),
+            'lifecycle': self.lifecycle.summary(lifecycle_seconds),
+            'memory_mb': {
+                'rss_start': round(rss_start, 1) if rss_start is not None else None,
+                'rss_peak': round(max(self.memory), 1) if self.memory else None,
+                'rss_end': round(rss_end, 1) if rss_end is not None else None
+            },
+            'recall_calls': fake.calls,
+            'server': server
+        }
+
+
+def read_version():
+    try:
+        with open(os.path.join(ROOT, 'version.json')) as f:
+            return json.load(f).get('version')
+    except (OSError, ValueError):
+        return None
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result):
+    print(f"\nv{result['version']} ({result['git_commit']}), {result['duration_seconds']} s, "
+          f"webhooks {result['webhooks']['achieved_per_second']}/s of {result['webhooks']['target_per_second']}/s target")
+    for title, ops in (('Load', result['operations']), ('Deploy and teardown', result['lifecycle'])):
+        print(f"\n{title}")
+        print(f"  {'operation':<24} {'count':>7} {'errors':>6} {'per s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for op, stats in ops.items():
+            print(f"  {op:<24} {stats['count']:>7} {stats['errors']:>6} {stats['per_second']:>8} {stats['p50_ms']:>8} "
+                  f"{stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['max_ms']:>8}")
+    memory = result['memory_mb']
+    print(f"\nMemory (RSS MB): start {memory['rss_start']}, peak {memory['rss_peak']}, end {memory['rss_end']}")
+    stages = ((result['server'].get('caption_latency') or {}).get('stages_ms') or {})
+    if stages:
+        print('Caption latency (server, ms): ' + ', '.join(
+            f"{stage} p50 {summary['p50']} / p99 {summary['p99']}" for stage, summary in stages.items() if summary['samples']))
+
+
+def print_comparison(old, new):
+    """Per-operation change from old to new; latency up or throughput down by >10% is flagged"""
+    print(f"\nCompared with v{old['version']} ({old['git_commit']}, {old['started_at']})")
+    if old['config'] != new['config']:
+        changed = sorted(key for key in set(old['config']) | set(new['config'])
+                         if old['config'].get(key) != new['config'].get(key))
+        print(f"  ! Configuration differs ({', '.join(changed)}) - numbers aren't directly comparable")
+    print(f"  {'operation':<24} " + ' '.join(f'{column:>26}' for column in COMPARED))
+    for op, stats in new['operations'].items():
+        before = old['operations'].get(op)
+        if before is None:
+            continue
+        cells = []
+        for column in COMPARED:
+            was, now = before[column], stats[column]
+            if not was:
+                cells.append(f'{now:>26}')
+                continue
+            change = (now - was) / was * 100
+            worse = change < -10 if column == 'per_second' else change > 10
+            cells.append(f"{f'{was} -> {now} {change:+.0f}%' + (' !' if worse else ''):>26}")
+        print(f"  {op:<24} " + ' '.join(cells))
+    was, now = old['memory_mb']['rss_peak'], new['memory_mb']['rss_peak']
+    if was and now:
+        print(f"  {'peak RSS MB':<24} {was} -> {now} ({(now - was) / was * 100:+.0f}%)")
+
+
+def load_result(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def latest_result(exclude=None):
+    paths = sorted(path for path in glob.glob(os.path.join(RESULTS_DIR, '*.json')) if path != exclude)
+    return paths[-1] if paths else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test app.py against a local fake Recall.ai API')
+    parser.add_argument('--bots', type=int, default=10, help='agents deployed (one fake meeting each)')
+    parser.add_argument('--pages', type=int, default=10, help='simulated agent pages, spread over the bots')
+    parser.add_argument('--rate', type=float, default=200, help='transcript webhooks per second, all bots together')
+    parser.add_argument('--seconds', type=float, default=30, help='length of the load phase')
+    parser.add_argument('--senders', type=int, default=8, help='threads sending webhooks')
+    parser.add_argument('--transport', choices=('poll', 'stream'), default='poll',
+                        help='how pages read the transcript: ?since= polling or the SSE stream')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='seconds between transcript polls')
+    parser.add_argument('--audio-wait', type=float, default=5, help='audio command long-poll wait (seconds)')
+    parser.add_argument('--audio-rate', type=float, default=2, help='play-audio commands queued per second')
+    parser.add_argument('--speak-rate', type=float, default=1, help='speak-audio (Recall output_audio) calls per second')
+    parser.add_argument('--state-backend', choices=('memory', 'sqlite'), default='memory')
+    parser.add_argument('--no-log', action='store_true', help='disable the durable transcript log')
+    parser.add_argument('--recall-latency-ms', type=float, default=20, help='fake Recall.ai response delay')
+    parser.add_argument('--recall-error-rate', type=float, default=0.0, help='share of fake Recall.ai calls failing with 503')
+    parser.add_argument('--baseline', default='latest', help="result to compare with: a path, 'latest' or 'none'")
+    parser.add_argument('--no-save', action='store_true', help=f'do not save the result to {os.path.relpath(RESULTS_DIR, ROOT)}/')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two saved results and exit')
+    args = parser.parse_args()
+
+    if args.compare:
+        old, new = (load_result(path) for path in args.compare)
+        print_report(new)
+        print_comparison(old, new)
+        return
+
+    baseline = latest_result() if args.baseline == 'latest' else (None if args.baseline == 'none' else args.baseline)
+    result = LoadTest(args).run()
+    print_report(result)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-v{result['version']}-{result['git_commit'] or 'unknown'}.json"
+        path = os.path.join(RESULTS_DIR, name)
+        with open(path, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved {os.path.relpath(path, ROOT)}")
+    if baseline:
+        print_comparison(load_result(baseline), result)
+
+
+if __name__ == '__main__':
+    main()
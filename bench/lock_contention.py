@@ -0,0 +1,207 @@
+# bench/lock_contention.py - Transcript lock contention from 1 to N concurrent bots
+#
+# Every bot count is run twice: with a single transcript lock shard (the old global-lock
+# behaviour) and with the sharded store.
+#
+# --mode store (default) drives TranscriptStore directly from threads, so the numbers are
+# the store's own: per bot, one writer appending lines, one reader taking snapshots (what
+# a transcript poll does) and two transcript streams waiting for new lines.
+#
+# --mode http runs the whole app on a threaded werkzeug server. Each bot has one writer
+# posting transcript webhooks and one agent page polling its transcript and audio command.
+# Webhooks only hand events to the ingest queue; its workers take the store's locks. So
+# writes/s counts accepted events over the time until the ingest queue has drained them
+# into the store, and drain ms is how long that took after the writers stopped.
+#
+# Reading the results: the GIL already runs one thread at a time, and the store's critical
+# sections are a few microseconds. What one lock costs is a convoy - writers queue on it
+# and hand the GIL back and forth. With writers going flat out (--write-interval 0),
+# sharding removes the convoy and appends/s rise sharply with the bot count. But the
+# writers no longer block, so they keep the GIL busy and snapshot latency goes *up*. At
+# webhook-like rates (--write-interval 0.001) snapshot latency is the same for both and
+# the sharded store gets through somewhat more appends and snapshots.
+# Over HTTP, request handling dwarfs either effect, and the shard count moves poll
+# latency less than run-to-run noise.
+#
+#   python bench/lock_contention.py --bots 1,4,16,64 --seconds 5 --shards 32
+#   python bench/lock_contention.py --mode http --bots 1,4,16 --seconds 5
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# No durable log - the benchmark measures the in-memory stores only
+os.environ['TRANSCRIPT_LOG_PATH'] = ''
+
+from audio_queue import AudioCommandQueue
+from transcript_buffer import TranscriptStore
+
+PORT = 5077
+BASE = f'http://127.0.0.1:{PORT}'
+STREAMS_PER_BOT = 2
+LINE_TEXT = 'lorem ipsum dolor sit amet ' * 8
+
+dashboard = None   # The app, imported only for --mode http
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_store(bots, shards, seconds, write_interval):
+    """Writers, snapshot readers and stream waiters on one TranscriptStore, no HTTP"""
+    store = TranscriptStore(shards=shards)
+    stop = threading.Event()
+    latencies, counts = [], {}
+
+    def writer(bot_id):
+        appended = 0
+        while not stop.is_set():
+            store.append(bot_id, 'Speaker', LINE_TEXT, time.time())
+            appended += 1
+            if write_interval:
+                time.sleep(write_interval)
+        counts[bot_id] = appended
+
+    def reader(bot_id):
+        while not stop.is_set():
+            started = time.perf_counter()
+            store.snapshot(bot_id)
+            latencies.append((time.perf_counter() - started) * 1e6)
+            time.sleep(0.0005)   # An agent page polls, it doesn't spin
+
+    def stream(bot_id):
+        seq = 0
+        while not stop.is_set():
+            seq = store.wait_for_line(bot_id, seq, timeout=0.5)
+
+    threads = []
+    for i in range(bots):
+        bot_id = f'bench-bot-{i}'
+        for target in (writer, reader) + (stream,) * STREAMS_PER_BOT:
+            threads.append(threading.Thread(target=target, args=(bot_id,), daemon=True))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'appends_per_s': sum(counts.values()) / seconds,
+        'snapshots_per_s': len(latencies) / seconds,
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99)
+    }
+
+
+def writer(bot_id, stop, counts):
+    """Post untimed lines (never dropped as duplicates), counting the ones the app accepted"""
+    session = requests.Session()
+    payload = {
+        'event': 'transcript.data',
+        'data': {
+            'bot': {'id': bot_id},
+            'data': {'participant': {'name': 'Speaker'}, 'words': [{'text': 'lorem ipsum dolor sit amet'}] * 8}
+        }
+    }
+    while not stop.is_set():
+        response = session.post(BASE + '/api/webhook/transcript', json=payload)
+        if response.status_code == 200:
+            counts[bot_id] = counts.get(bot_id, 0) + 1
+
+
+def poller(bot_id, stop, latencies):
+    session = requests.Session()
+    since = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = session.get(f'{BASE}/api/bot/{bot_id}/transcript', params={'since': since})
+        session.get(f'{BASE}/api/bot/{bot_id}/audio-command')
+        latencies.append((time.perf_counter() - started) * 1000)
+        since = int(response.headers.get('X-Transcript-Seq', since))
+
+
+def run_http(bots, shards, seconds):
+    dashboard.transcripts = TranscriptStore(shards=shards)
+    dashboard.audio_commands = AudioCommandQueue()
+
+    stop = threading.Event()
+    latencies, counts = [], {}
+    threads = []
+    for i in range(bots):
+        bot_id = f'bench-bot-{i}'
+        threads.append(threading.Thread(target=writer, args=(bot_id, stop, counts), daemon=True))
+        threads.append(threading.Thread(target=poller, args=(bot_id, stop, latencies), daemon=True))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    stopped = time.perf_counter()
+    # Accepted isn't applied - stop the clock once the workers have put every line in the store
+    if not dashboard.ingest_queue.flush(timeout=60):
+        raise RuntimeError('Ingest queue did not drain within 60s')
+    drained = time.perf_counter()
+
+    return {
+        'polls_per_s': len(latencies) / (stopped - started),
+        'writes_per_s': sum(counts.values()) / (drained - started),
+        'drain_ms': (drained - stopped) * 1000,
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99)
+    }
+
+
+def main():
+    global dashboard
+    parser = argparse.ArgumentParser(description='Transcript lock contention benchmark')
+    parser.add_argument('--mode', choices=('store', 'http'), default='store',
+                        help='drive TranscriptStore directly, or the whole app over HTTP')
+    parser.add_argument('--bots', default='1,4,16,64', help='comma-separated bot counts')
+    parser.add_argument('--seconds', type=float, default=5.0, help='duration of each run')
+    parser.add_argument('--shards', type=int, default=32, help='shard count for the sharded runs')
+    parser.add_argument('--write-interval', type=float, default=0.0,
+                        help='store mode: seconds each writer sleeps between appends (0 = flat out)')
+    args = parser.parse_args()
+    bot_counts = [int(n) for n in args.bots.split(',')]
+
+    if args.mode == 'store':
+        print(f"{'bots':>5} {'shards':>6} {'appends/s':>10} {'snapshots/s':>12} {'p50 us':>8} {'p99 us':>9}")
+        for bots in bot_counts:
+            for shards in (1, args.shards):
+                result = run_store(bots, shards, args.seconds, args.write_interval)
+                print(f"{bots:>5} {shards:>6} {result['appends_per_s']:>10.0f} {result['snapshots_per_s']:>12.0f} "
+                      f"{result['p50']:>8.1f} {result['p99']:>9.1f}")
+        return
+
+    import app as dashboard
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', PORT, dashboard.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print(f"{'bots':>5} {'shards':>6} {'polls/s':>9} {'writes/s':>9} {'drain ms':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    try:
+        for bots in bot_counts:
+            for shards in (1, args.shards):
+                result = run_http(bots, shards, args.seconds)
+                print(f"{bots:>5} {shards:>6} {result['polls_per_s']:>9.0f} {result['writes_per_s']:>9.0f} "
+                      f"{result['drain_ms']:>9.1f} {result['p50']:>8.2f} {result['p99']:>8.2f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+# bot_registry.py - Tracks every deployed bot and its agent page
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Lifecycle states a session moves through
+STATE_JOINING = 'joining'   # Deployed, no transcript yet
+STATE_ACTIVE = 'active'     # Transcript or agent page traffic seen
+STATE_ENDED = 'ended'       # Call ended or bot deleted
+
+# Recall.ai status codes that mean the bot has left the call for good
+RECALL_ENDED_CODES = frozenset(('call_ended', 'done', 'fatal', 'analysis_done', 'media_expired'))
+RECALL_ACTIVE_CODES = frozenset(('in_call_recording', 'in_call_not_recording', 'recording_permission_allowed'))
+
+# Status changes kept per session, and for clients catching up on the status stream
+MAX_STATUS_CHANGES = 20
+STATUS_FEED_SIZE = 1000
+
+
+def new_agent_token():
+    """Random token that identifies one bot's agent page"""
+    return secrets.token_urlsafe(16)
+
+
+class BotSession:
+    """State for one deployed bot"""
+    __slots__ = ('bot_id', 'agent_token', 'meeting_url', 'agent_name', 'state',
+                 'created_at', 'last_activity', 'status_changes', 'media_ready')
+
+    def __init__(self, bot_id, agent_token=None, meeting_url=None, agent_name=None, state=STATE_JOINING):
+        self.bot_id = bot_id
+        self.agent_token = agent_token
+        self.meeting_url = meeting_url
+        self.agent_name = agent_name
+        self.state = state
+        self.created_at = time.time()
+        self.last_activity = self.created_at
+        self.status_changes = []   # Recall.ai status changes, oldest first, as {code, sub_code, created_at}
+        self.media_ready = False
+
+    @property
+    def status(self):
+        """Latest Recall.ai status change, or None before the first webhook"""
+        return self.status_changes[-1] if self.status_changes else None
+
+    def to_dict(self):
+        return {
+            "bot_id": self.bot_id,
+            "meeting_url": self.meeting_url,
+            "agent_name": self.agent_name,
+            "state": self.state,
+            "status": self.status,
+            "media_ready": self.media_ready,
+            "created_at": self.created_at,
+            "last_activity": self.last_activity
+        }
+
+
+class BotRegistry:
+    """
+    Session registry for many concurrent bots.
+    Lookups by bot ID and by agent page token are single dict reads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._sessions = OrderedDict()  # bot_id -> BotSession, in deploy order
+        self._by_token = {}             # agent_token -> BotSession
+        # Status changes for stream subscribers: (seq, session dict), oldest first
+        self.changed = threading.Condition(self.lock)
+        self._feed = deque(maxlen=STATUS_FEED_SIZE)
+        self._feed_seq = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, bot_id):
+        return bot_id in self._sessions
+
+    def register(self, bot_id, agent_token=None, meeting_url=None, agent_name=None, state=STATE_JOINING):
+        """Add (or refresh) a session; returns the BotSession"""
+        with self.lock:
+            session = self._sessions.get(bot_id)
+            if session is None:
+                session = BotSession(bot_id, agent_token, meeting_url, agent_name, state)
+                self._sessions[bot_id] = session
+            else:
+                session.meeting_url = meeting_url or session.meeting_url
+                session.agent_name = agent_name or session.agent_name
+                if agent_token and agent_token != session.agent_token:
+                    self._by_token.pop(session.agent_token, None)
+                    session.agent_token = agent_token
+            if session.agent_token:
+                self._by_token[session.agent_token] = session
+            return session
+
+    def get(self, bot_id):
+        return self._sessions.get(bot_id)
+
+    def by_token(self, agent_token):
+        return self._by_token.get(agent_token)
+
+    def most_recent(self):
+        """Bot ID of the most recently deployed session that hasn't ended, or None"""
+        with self.lock:
+            for session in reversed(self._sessions.values()):
+                if session.state != STATE_ENDED:
+                    return session.bot_id
+        return None
+
+    def touch(self, bot_id, activate=False):
+        """Record activity for a bot; activate moves a joining bot to active"""
+        session = self._sessions.get(bot_id)
+        if session is None:
+            return None
+        session.last_activity = time.time()
+        if activate and session.state == STATE_JOINING:
+            session.state = STATE_ACTIVE
+        return session
+
+    def set_state(self, bot_id, state):
+        session = self._sessions.get(bot_id)
+        if session is not None:
+            session.state = state
+            session.last_activity = time.time()
+        return session
+
+    def record_status(self, bot_id, code, sub_code=None, created_at=None, media_ready=False):
+        """
+        Apply a lifecycle event from Recall.ai (adopting unknown bots) and notify status streams.
+        Returns the updated session.
+        """
+        with self.lock:
+            session = self._sessions.get(bot_id)
+            if session is None:
+                session = self._sessions[bot_id] = BotSession(bot_id)
+            if code:
+                session.status_changes.append({
+                    "code": code,
+                    "sub_code": sub_code,
+                    "created_at": created_at
+                })
+                del session.status_changes[:-MAX_STATUS_CHANGES]
+                if code in RECALL_ENDED_CODES:
+                    session.state = STATE_ENDED
+                elif code in RECALL_ACTIVE_CODES and session.state == STATE_JOINING:
+                    session.state = STATE_ACTIVE
+            session.media_ready = session.media_ready or media_ready
+            session.last_activity = time.time()
+
+            self._feed_seq += 1
+            self._feed.append((self._feed_seq, session.to_dict()))
+            self.changed.notify_all()
+            return session
+
+    def status_seq(self):
+        return self._feed_seq
+
+    def wait_for_status(self, after_seq, timeout):
+        """Status changes newer than after_seq as (seq, session dict), waiting up to timeout for one"""
+        with self.changed:
+            self.changed.wait_for(lambda: self._feed_seq > after_seq, timeout=timeout)
+            return [change for change in self._feed if change[0] > after_seq]
+
+    def remove(self, bot_id):
+        with self.lock:
+            session = self._sessions.pop(bot_id, None)
+            if session is not None and session.agent_token:
+                self._by_token.pop(session.agent_token, None)
+            return session
+
+    def prune(self, idle_timeout, ended_grace):
+        """Remove sessions idle longer than idle_timeout or ended longer than ended_grace ago"""
+        now = time.time()
+        with self.lock:
+            expired = [
+                bot_id for bot_id, session in self._sessions.items()
+                if now - session.last_activity > (ended_grace if session.state == STATE_ENDED else idle_timeout)
+            ]
+        for bot_id in expired:
+            self.remove(bot_id)
+        return expired
+
+    def sessions(self):
+        """Every session, most recently deployed first"""
+        with self.lock:
+            return list(reversed(self._sessions.values()))
@@ -0,0 +1,193 @@
+# bulk_ops.py - Background bulk operations over many Recall.ai bots
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+# Error messages kept per job - enough to diagnose without growing without bound
+MAX_JOB_ERRORS = 50
+# Per-item outcomes kept for jobs that asked for them (e.g. which bot joined which meeting)
+MAX_JOB_RESULTS = 1000
+# Least time between on_update calls for one job while it runs (seconds)
+JOB_UPDATE_INTERVAL = 0.5
+
+
+class RateLimiter:
+    """Token bucket shared by every bulk job, so fan-out stays under the upstream rate limit"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self, seconds):
+        """Back every job off, e.g. after the upstream still answered 429 following retries"""
+        with self.lock:
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class Job:
+    """Progress of one bulk operation"""
+    __slots__ = ('id', 'kind', 'state', 'total', 'listed', 'succeeded', 'failed', 'errors',
+                 'results', 'created_at', 'finished_at', 'error')
+
+    def __init__(self, kind, keep_results=False):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.state = JOB_RUNNING
+        self.total = None       # Known once every page has been listed
+        self.listed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.errors = []
+        self.results = [] if keep_results else None   # In completion order
+        self.created_at = time.time()
+        self.finished_at = None
+        self.error = None       # Set when the job as a whole failed
+
+    @property
+    def completed(self):
+        return self.succeeded + self.failed
+
+    def to_dict(self):
+        job = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "total": self.total,
+            "listed": self.listed,
+            "completed": self.completed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "errors": self.errors,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+        if self.results is not None:
+            job["results"] = list(self.results)
+        return job
+
+
+class BulkJobs:
+    """
+    Runs an action over every item an iterator yields, on a bounded worker pool.
+    Items are submitted as pages arrive, with at most a few pages' worth in flight,
+    and every action waits for a token from the shared rate limiter.
+    Jobs run in the background; callers poll get(job_id) for progress.
+    """
+
+    def __init__(self, max_workers=8, rate_per_second=10, max_jobs=100, on_update=None):
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        # Called with a Job as it progresses (throttled) and when it finishes, e.g. to share
+        # progress with other worker processes
+        self.on_update = on_update
+        self._updated_at = {}   # job_id -> monotonic time of the last on_update call
+        self.limiter = RateLimiter(rate_per_second)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bulk-op')
+        self.lock = threading.Lock()
+        self._jobs = OrderedDict()   # job_id -> Job, oldest first
+
+    def submit(self, kind, items, action, describe=str, keep_results=False):
+        """
+        Start a job running action(item) for each item from the iterable items.
+        action returns None (or a result dict) on success, or an error message; exceptions
+        count as failures. describe(item) labels an item in errors and results.
+        keep_results records every item's outcome on the job. Returns the Job.
+        """
+        job = Job(kind, keep_results)
+        with self.lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        self._publish(job, force=True)
+        threading.Thread(target=self._run, args=(job, items, action, describe),
+                         name=f'bulk-{kind}', daemon=True).start()
+        return job
+
+    def _publish(self, job, force=False):
+        if self.on_update is None:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self._updated_at.get(job.id, 0) < JOB_UPDATE_INTERVAL:
+                return
+            self._updated_at[job.id] = now
+        try:
+            self.on_update(job)
+        except Exception as e:
+            print(f"⚠️  Could not publish progress of job {job.id}: {e}")
+
+    def _run(self, job, items, action, describe):
+        # Bound the backlog so a huge listing doesn't queue every item at once
+        in_flight = threading.BoundedSemaphore(self.max_workers * 4)
+        pending = []
+        try:
+            for item in items:
+                in_flight.acquire()
+                job.listed += 1
+                pending.append(self.executor.submit(self._run_one, job, item, action, describe, in_flight))
+            job.total = job.listed
+        except Exception as e:
+            job.error = f'Listing failed: {e}'
+        for future in pending:
+            future.result()
+        job.state = JOB_FAILED if job.error else JOB_DONE
+        job.finished_at = time.time()
+        self._publish(job, force=True)
+        with self.lock:
+            self._updated_at.pop(job.id, None)
+
+    def _run_one(self, job, item, action, describe, in_flight):
+        try:
+            self.limiter.acquire()
+            try:
+                outcome = action(item)
+            except Exception as e:
+                outcome = str(e)
+            error = outcome if isinstance(outcome, str) else None
+            with self.lock:
+                if error is None:
+                    job.succeeded += 1
+                else:
+                    job.failed += 1
+                    if len(job.errors) < MAX_JOB_ERRORS:
+                        job.errors.append(f'{describe(item)}: {error}')
+                if job.results is not None and len(job.results) < MAX_JOB_RESULTS:
+                    job.results.append({
+                        "item": describe(item),
+                        "success": error is None,
+                        "error": error,
+                        "result": None if error is not None else outcome
+                    })
+            self._publish(job)
+        finally:
+            in_flight.release()
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        """Every retained job, newest first"""
+        with self.lock:
+            return list(reversed(self._jobs.values()))
@@ -0,0 +1,168 @@
+# caption_trace.py - Per-line caption latency, from the word being spoken to the caption on screen
+import threading
+import time
+from collections import OrderedDict, deque
+
+STAGE_RECALL = 'recall'        # Word spoken -> webhook received (Recall's transcription and delivery)
+STAGE_INGEST = 'ingest'        # Webhook received -> line applied (our ingest queue and store)
+STAGE_DELIVERY = 'delivery'    # Line applied -> first handed to an agent page (stream push or poll)
+STAGE_RENDER = 'render'        # Handed to the page -> rendered, as reported by the page
+STAGE_TOTAL = 'total'          # Word spoken (or webhook received, without word timestamps) -> rendered
+STAGES = (STAGE_RECALL, STAGE_INGEST, STAGE_DELIVERY, STAGE_RENDER, STAGE_TOTAL)
+
+
+class _Trace:
+    __slots__ = ('spoken_at', 'received_at', 'applied_at', 'delivered_at')
+
+    def __init__(self, spoken_at, received_at, applied_at):
+        self.spoken_at = spoken_at
+        self.received_at = received_at
+        self.applied_at = applied_at
+        self.delivered_at = None
+
+
+class _BotTraces:
+    __slots__ = ('lock', 'traces', 'undelivered', 'samples')
+
+    def __init__(self, samples):
+        self.lock = threading.Lock()
+        self.traces = OrderedDict()        # seq -> _Trace, waiting for the page's render report
+        self.undelivered = OrderedDict()   # seq -> _Trace, not yet handed to any page
+        self.samples = {stage: deque(maxlen=samples) for stage in STAGES}
+
+
+def summarize(values):
+    """Sample count, mean and p50/p95/p99 in milliseconds"""
+    values = sorted(values)
+    if not values:
+        return {"samples": 0, "mean": None, "p50": None, "p95": None, "p99": None}
+
+    def pick(pct):
+        return round(values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000, 1)
+
+    return {
+        "samples": len(values),
+        "mean": round(sum(values) / len(values) * 1000, 1),
+        "p50": pick(50),
+        "p95": pick(95),
+        "p99": pick(99)
+    }
+
+
+class CaptionTracer:
+    """
+    Stamps each transcript line as it moves through the pipeline - spoken (Recall's word
+    timestamp), received, applied, first delivered - and closes the trace when the agent page
+    reports how long rendering took. Stage durations are kept as recent samples per bot and
+    overall. The render time is measured on the page's own clock, so skew between the page
+    and the server doesn't leak in; the recall stage compares Recall's clock with ours.
+    """
+
+    def __init__(self, max_pending=200, samples=1000, samples_per_bot=200, max_bots=1000):
+        self.max_pending = max_pending
+        self.samples_per_bot = samples_per_bot
+        self.max_bots = max_bots
+        self.lock = threading.Lock()   # Only guards the bot_id -> traces map and overall samples
+        self._bots = OrderedDict()
+        self._samples = {stage: deque(maxlen=samples) for stage in STAGES}
+        self.reports = 0
+        self.unmatched = 0
+
+    def _traces(self, bot_id, create=True):
+        traces = self._bots.get(bot_id)
+        if traces is None and create:
+            with self.lock:
+                traces = self._bots.get(bot_id)
+                if traces is None:
+                    traces = self._bots[bot_id] = _BotTraces(self.samples_per_bot)
+                    while len(self._bots) > self.max_bots:
+                        self._bots.popitem(last=False)
+        return traces
+
+    def _record(self, traces, stage, seconds):
+        traces.samples[stage].append(seconds)
+        with self.lock:
+            self._samples[stage].append(seconds)
+
+    def applied(self, bot_id, seq, spoken_at, received_at, replaces=None, applied_at=None):
+        """Start tracing line seq; spoken_at is None when Recall sent no word timestamps"""
+        applied_at = applied_at if applied_at is not None else time.time()
+        traces = self._traces(bot_id)
+        trace = _Trace(spoken_at, received_at, applied_at)
+        with traces.lock:
+            if replaces is not None:
+                # The merged fragment is gone from the buffer - only its replacement gets delivered
+                traces.traces.pop(replaces, None)
+                traces.undelivered.pop(replaces, None)
+            traces.traces[seq] = trace
+            traces.undelivered[seq] = trace
+            for pending in (traces.traces, traces.undelivered):
+                while len(pending) > self.max_pending:
+                    pending.popitem(last=False)
+            if spoken_at is not None:
+                self._record(traces, STAGE_RECALL, received_at - spoken_at)
+            self._record(traces, STAGE_INGEST, applied_at - received_at)
+
+    def delivered(self, bot_id, after_seq, now=None):
+        """Lines newer than after_seq were just sent to an agent page"""
+        traces = self._traces(bot_id, create=False)
+        if traces is None or not traces.undelivered:
+            return
+        now = now if now is not None else time.time()
+        with traces.lock:
+            for seq in [seq for seq in traces.undelivered if seq > after_seq]:
+                trace = traces.undelivered.pop(seq)
+                trace.delivered_at = now
+                self._record(traces, STAGE_DELIVERY, now - trace.applied_at)
+
+    def rendered(self, bot_id, seq, render_ms):
+        """The agent page rendered line seq render_ms after receiving it; False if it isn't being traced"""
+        traces = self._traces(bot_id, create=False)
+        trace = None
+        if traces is not None:
+            with traces.lock:
+                trace = traces.traces.get(seq)
+                if trace is not None and trace.delivered_at is not None:
+                    del traces.traces[seq]
+                    render = max(0.0, render_ms / 1000)
+                    self._record(traces, STAGE_RENDER, render)
+                    started = trace.spoken_at if trace.spoken_at is not None else trace.received_at
+                    self._record(traces, STAGE_TOTAL, trace.delivered_at - started + render)
+                else:
+                    trace = None
+        with self.lock:
+            self.reports += 1
+            self.unmatched += trace is None
+        return trace is not None
+
+    def remove(self, bot_id):
+        with self.lock:
+            self._bots.pop(bot_id, None)
+
+    def summary(self, stage):
+        with self.lock:
+            values = list(self._samples[stage])
+        return summarize(values)
+
+    def stats(self, bot_id=None):
+        """Percentiles per stage overall and per bot (or just for bot_id)"""
+        with self.lock:
+            bots = dict(self._bots)
+            reports, unmatched = self.reports, self.unmatched
+        if bot_id is not None:
+            bots = {bot_id: bots[bot_id]} if bot_id in bots else {}
+        per_bot = {}
+        for traced_bot_id, traces in bots.items():
+            with traces.lock:
+                samples = {stage: list(values) for stage, values in traces.samples.items()}
+                pending = len(traces.traces)
+            per_bot[traced_bot_id] = {
+                "pending_traces": pending,
+                "stages_ms": {stage: summarize(values) for stage, values in samples.items()}
+            }
+        return {
+            "stages_ms": {stage: self.summary(stage) for stage in STAGES},
+            "render_reports": reports,
+            "unmatched_reports": unmatched,
+            "bots": per_bot
+        }
@@ -0,0 +1,87 @@
+# dedup.py - Bounded per-bot window of recently seen webhook deliveries
+import threading
+import time
+from collections import OrderedDict
+
+
+class _BotWindow:
+    __slots__ = ('lock', 'seen')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seen = OrderedDict()   # key hash -> first seen (monotonic), oldest first
+
+
+class DedupWindow:
+    """
+    Remembers the last max_keys event identities per bot for up to ttl seconds.
+    Recall retries webhooks, so a delivery whose identity is still in the window is a
+    duplicate. Only a 64-bit hash of each identity is kept.
+    """
+
+    def __init__(self, max_keys=512, ttl=600, max_bots=10000):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self.max_bots = max_bots
+        self.lock = threading.Lock()   # Only guards the bot_id -> window map
+        self._windows = OrderedDict()
+        self.checked = 0
+        self.duplicates = 0
+        self._stats_lock = threading.Lock()   # Counters updated under different bots' locks
+
+    def _window(self, bot_id):
+        window = self._windows.get(bot_id)
+        if window is None:
+            with self.lock:
+                window = self._windows.get(bot_id)
+                if window is None:
+                    window = self._windows[bot_id] = _BotWindow()
+                    while len(self._windows) > self.max_bots:
+                        self._windows.popitem(last=False)
+        return window
+
+    def check(self, bot_id, identity):
+        """Record identity for bot_id; returns True if it was already seen (a duplicate)"""
+        key = hash(identity)
+        now = time.monotonic()
+        window = self._window(bot_id)
+        with window.lock:
+            seen = window.seen
+            # Expire from the old end; the window is in first-seen order
+            while seen:
+                oldest_key, first_seen = next(iter(seen.items()))
+                if now - first_seen <= self.ttl:
+                    break
+                del seen[oldest_key]
+
+            duplicate = key in seen
+            if not duplicate:
+                seen[key] = now
+                if len(seen) > self.max_keys:
+                    seen.popitem(last=False)
+        with self._stats_lock:
+            self.checked += 1
+            self.duplicates += duplicate
+        return duplicate
+
+    def discard(self, bot_id, identity):
+        """Forget identity, e.g. when the delivery was refused and will be retried"""
+        window = self._windows.get(bot_id)
+        if window is not None:
+            with window.lock:
+                window.seen.pop(hash(identity), None)
+
+    def remove(self, bot_id):
+        with self.lock:
+            self._windows.pop(bot_id, None)
+
+    def stats(self):
+        with self._stats_lock:
+            checked, duplicates = self.checked, self.duplicates
+        return {
+            "bots": len(self._windows),
+            "checked": checked,
+            "duplicates_dropped": duplicates,
+            "max_keys_per_bot": self.max_keys,
+            "ttl_seconds": self.ttl
+        }
@@ -0,0 +1,151 @@
+# ingest_queue.py - Bounded two-stage ingestion: acknowledge now, apply in the background
+import threading
+import time
+from collections import deque
+
+# What submit() does when a worker's queue is full
+POLICY_BLOCK = 'block'              # Wait up to block_timeout for room, then reject
+POLICY_DROP_OLDEST = 'drop_oldest'  # Make room by discarding the oldest queued event
+POLICY_REJECT = 'reject'            # Refuse immediately (the webhook answers 503 so Recall retries)
+POLICIES = (POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_REJECT)
+
+
+class _Worker:
+    """One worker thread and its queue. Every event for a key lands on the same worker, so per-key order holds."""
+    __slots__ = ('queue', 'cond', 'busy', 'thread', 'enqueued', 'dropped', 'rejected', 'blocked_seconds',
+                 'high_watermark')
+
+    def __init__(self):
+        self.queue = deque()   # (enqueued_at, item)
+        self.cond = threading.Condition(threading.Lock())
+        self.busy = False
+        self.thread = None
+        # Submit-side counters, guarded by cond like the queue; stats() sums them over workers
+        self.enqueued = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.blocked_seconds = 0.0
+        self.high_watermark = 0
+
+
+class IngestQueue:
+    """
+    Decouples accepting events from applying them.
+    submit() only validates capacity and enqueues; handler(item) runs on a worker thread
+    chosen by hashing the event's key (the bot ID), so events for one bot are applied in
+    arrival order while different bots proceed in parallel.
+    """
+
+    def __init__(self, handler, workers=4, max_size=10000, policy=POLICY_BLOCK, block_timeout=0.5):
+        if policy not in POLICIES:
+            raise ValueError(f'Unknown ingest queue policy {policy!r} (expected one of {", ".join(POLICIES)})')
+        self.handler = handler
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.worker_capacity = max(1, max_size // max(1, workers))
+        self._workers = [_Worker() for _ in range(max(1, workers))]
+        self.processed = 0
+        self.errors = 0
+        self._apply_seconds = 0.0
+        self._stats_lock = threading.Lock()   # Counters updated by several workers
+
+    def start(self):
+        """Start the worker threads (idempotent)"""
+        for index, worker in enumerate(self._workers):
+            if worker.thread is None:
+                worker.thread = threading.Thread(target=self._run, args=(worker,),
+                                                 name=f'ingest-worker-{index}', daemon=True)
+                worker.thread.start()
+        return self
+
+    def submit(self, key, item):
+        """Queue item for the worker that owns key; returns False if the full-queue policy refused it"""
+        worker = self._workers[hash(key) % len(self._workers)]
+        with worker.cond:
+            if len(worker.queue) >= self.worker_capacity:
+                if self.policy == POLICY_DROP_OLDEST:
+                    worker.queue.popleft()
+                    worker.dropped += 1
+                elif self.policy == POLICY_BLOCK:
+                    started = time.monotonic()
+                    worker.cond.wait_for(lambda: len(worker.queue) < self.worker_capacity,
+                                         timeout=self.block_timeout)
+                    worker.blocked_seconds += time.monotonic() - started
+                    if len(worker.queue) >= self.worker_capacity:
+                        worker.rejected += 1
+                        return False
+                else:
+                    worker.rejected += 1
+                    return False
+
+            worker.queue.append((time.monotonic(), item))
+            worker.enqueued += 1
+            worker.high_watermark = max(worker.high_watermark, len(worker.queue))
+            worker.cond.notify_all()
+        return True
+
+    def _run(self, worker):
+        while True:
+            with worker.cond:
+                worker.busy = False
+                worker.cond.notify_all()   # Wakes flush() and blocked submitters
+                worker.cond.wait_for(lambda: worker.queue)
+                _, item = worker.queue.popleft()
+                worker.busy = True
+                worker.cond.notify_all()
+
+            started = time.perf_counter()
+            failed = False
+            try:
+                self.handler(item)
+            except Exception as e:
+                failed = True
+                print(f"❌ Ingest worker failed to apply event: {e}")
+            with self._stats_lock:
+                self._apply_seconds += time.perf_counter() - started
+                self.processed += 1
+                self.errors += failed
+
+    def depth(self):
+        """Events queued but not yet applied"""
+        return sum(len(worker.queue) for worker in self._workers)
+
+    def flush(self, timeout=10):
+        """Wait until every queued event has been applied; returns False on timeout"""
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            with worker.cond:
+                if not worker.cond.wait_for(lambda: not worker.queue and not worker.busy,
+                                            timeout=max(0, deadline - time.monotonic())):
+                    return False
+        return True
+
+    def stats(self):
+        now = time.monotonic()
+        oldest = []
+        totals = {"enqueued": 0, "dropped": 0, "rejected": 0, "blocked_seconds": 0.0}
+        high_watermark = 0
+        for worker in self._workers:
+            with worker.cond:
+                if worker.queue:
+                    oldest.append(worker.queue[0][0])
+                for name in totals:
+                    totals[name] += getattr(worker, name)
+                high_watermark = max(high_watermark, worker.high_watermark)
+        with self._stats_lock:
+            processed, errors, apply_seconds = self.processed, self.errors, self._apply_seconds
+        return {
+            "policy": self.policy,
+            "workers": len(self._workers),
+            "capacity": self.worker_capacity * len(self._workers),
+            "depth": self.depth(),
+            "max_worker_depth": high_watermark,
+            "oldest_event_age_ms": round((now - min(oldest)) * 1000, 2) if oldest else 0,
+            "enqueued": totals["enqueued"],
+            "processed": processed,
+            "dropped": totals["dropped"],
+            "rejected": totals["rejected"],
+            "errors": errors,
+            "blocked_seconds": round(totals["blocked_seconds"], 3),
+            "avg_apply_ms": round(apply_seconds / processed * 1000, 3) if processed else 0
+        }
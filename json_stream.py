@@ -0,0 +1,47 @@
+# json_stream.py - Incremental parsing of JSON arrays and NDJSON request bodies
+import codecs
+import json
+
+
+def iter_json_values(stream, chunk_size=64 * 1024):
+    """
+    Yield each value from a stream holding a top-level JSON array, NDJSON, or
+    concatenated JSON documents, reading chunk_size bytes at a time - the whole
+    body is never held in memory. Raises json.JSONDecodeError on malformed input.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    pos = 0
+    in_array = None   # Decided by the first non-whitespace character
+    eof = False
+
+    while True:
+        # Skip whitespace, plus the commas and closing bracket around top-level array elements
+        while pos < len(buffer) and (buffer[pos].isspace() or (in_array and buffer[pos] in ',]')):
+            pos += 1
+
+        if pos < len(buffer):
+            if in_array is None:
+                in_array = buffer[pos] == '['
+                if in_array:
+                    pos += 1
+                continue
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # A bare number at the end of the buffer may continue in the next chunk
+                if eof or end < len(buffer) or isinstance(value, (dict, list, str)):
+                    yield value
+                    pos = end
+                    continue
+
+        if eof:
+            return
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + utf8.decode(chunk, final=eof)
+        pos = 0
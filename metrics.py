@@ -0,0 +1,145 @@
+# metrics.py - In-process metrics rendered in the Prometheus text exposition format
+import math
+import threading
+
+# Request latency buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+        self._values = {}   # label values tuple -> count
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self.lock:
+            values = list(self._values.items())
+        for label_values, count in values:
+            lines.append(f'{self.name}{_labels(self.label_names, label_values)} {_number(count)}')
+        return lines
+
+
+class Histogram:
+    """Bucketed distribution per label combination (cumulative buckets, sum and count)"""
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.lock = threading.Lock()
+        self._series = {}   # label values tuple -> [per-bucket counts..., sum]
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = [(label_values, list(values)) for label_values, values in self._series.items()]
+        for label_values, values in series:
+            lines.extend(render_histogram(self.name, self.label_names, label_values,
+                                          self.buckets, values[:-1], values[-1]))
+        return lines
+
+
+def render_histogram(name, label_names, label_values, bounds, counts, total):
+    """Sample lines for one histogram series from per-bucket (non-cumulative) counts"""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(bounds, counts):
+        cumulative += count
+        le = 'le="' + _number(bound) + '"'
+        lines.append(f'{name}_bucket{_labels(label_names, label_values, le)} {cumulative}')
+    lines.append(f'{name}_sum{_labels(label_names, label_values)} {_number(float(total))}')
+    lines.append(f'{name}_count{_labels(label_names, label_values)} {cumulative}')
+    return lines
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms updated as events happen, plus collectors that read
+    other components' stats only when /metrics is scraped - nothing on the hot
+    path beyond a dict update under a per-metric lock.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, collect):
+        """
+        Register collect(), called at scrape time. It yields families as
+        (name, type, help, samples) with samples a list of (labels dict, value),
+        or (name, 'histogram', help, lines) with pre-rendered sample lines.
+        """
+        self._collectors.append(collect)
+        return collect
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                families = list(collect())
+            except Exception as e:
+                lines.append(f'# collector {getattr(collect, "__name__", collect)} failed: {_escape(e)}')
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {kind}')
+                if kind == 'histogram':
+                    lines.extend(samples)
+                    continue
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    names = tuple(labels)
+                    lines.append(f'{name}{_labels(names, [labels[n] for n in names])} {_number(value)}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,267 @@
+# recall_client.py - Pooled, instrumented client for the Recall.ai API
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+
+# Responses worth retrying - throttling and upstream failures
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of calling Recall.ai while the circuit breaker is open"""
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; percentiles are reported as bucket upper bounds"""
+    __slots__ = ('counts', 'count', 'total_ms', 'errors')
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS_MS)
+        self.count = 0
+        self.total_ms = 0.0
+        self.errors = 0
+
+    def observe(self, elapsed_ms, error=False):
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if error:
+            self.errors += 1
+
+    def percentile(self, pct):
+        if not self.count:
+            return None
+        target = self.count * pct / 100
+        seen = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return bound
+        return LATENCY_BUCKETS_MS[-1]
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "buckets": {
+                ('+Inf' if bound == float('inf') else str(bound)): count
+                for bound, count in zip(LATENCY_BUCKETS_MS, self.counts)
+            }
+        }
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive upstream failures and fails fast for
+    reset_timeout seconds, then lets a single trial request through (half-open).
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+
+    def allow(self):
+        with self.lock:
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            if self.state == CIRCUIT_OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # One trial request decides whether the upstream is back
+                self.state = CIRCUIT_HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = CIRCUIT_CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != CIRCUIT_OPEN:
+                    self.trips += 1
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.monotonic()
+
+    def to_dict(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips
+        }
+
+
+class RecallClient:
+    """
+    One keep-alive connection pool for every Recall.ai call.
+    Auth headers are built once; every call gets a timeout, idempotent calls are retried
+    with jittered exponential backoff on 429/5xx, and a circuit breaker fails fast while
+    the upstream is down. Latency is recorded per endpoint.
+    """
+
+    def __init__(self, api_key, base_url, connect_timeout=3.05, read_timeout=15, max_retries=3,
+                 backoff=0.5, max_backoff=8, pool_size=20, failure_threshold=5, reset_timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.retries = 0
+        self.lock = threading.Lock()
+        self._histograms = {}   # endpoint name -> LatencyHistogram
+
+        self.session = requests.Session()
+        # Retries are handled here so they can honour Retry-After and the breaker
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Token {api_key}',
+            'Content-Type': 'application/json'
+        })
+
+    def _observe(self, endpoint, elapsed_ms, error):
+        with self.lock:
+            histogram = self._histograms.get(endpoint)
+            if histogram is None:
+                histogram = self._histograms[endpoint] = LatencyHistogram()
+            histogram.observe(elapsed_ms, error)
+
+    def _retry_delay(self, attempt, response):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        # Full jitter keeps many workers from retrying in lockstep
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, method, path, endpoint, idempotent=True, timeout=None, **kwargs):
+        """
+        Call the API and return the Response (any status).
+        Non-idempotent calls are only retried on 429, which Recall never processed.
+        Raises CircuitOpenError while the breaker is open, or the last connection error.
+        """
+        # Pagination links from the API are already absolute
+        url = path if path.startswith(('http://', 'https://')) else f'{self.base_url}{path}'
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError(f'Recall.ai circuit open after repeated failures ({endpoint})')
+
+            response = None
+            error = None
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except requests.RequestException as e:
+                error = e
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            upstream_failed = error is not None or response.status_code >= 500
+            self._observe(endpoint, elapsed_ms, upstream_failed)
+            if upstream_failed:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+
+            retryable = (
+                (response is not None and response.status_code == 429)
+                or (idempotent and (error is not None or response.status_code in RETRY_STATUSES))
+            )
+            if not retryable or attempt >= self.max_retries:
+                if error is not None:
+                    raise error
+                return response
+
+            with self.lock:
+                self.retries += 1
+            time.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+
+    # Recall.ai endpoints used by the dashboard
+
+    def create_bot(self, payload):
+        # Retrying a timed-out create could deploy the same bot twice
+        return self.request('POST', '/bot', 'bot.create', idempotent=False, json=payload,
+                            timeout=(self.timeout[0], 30))
+
+    def get_bot(self, bot_id):
+        return self.request('GET', f'/bot/{bot_id}', 'bot.retrieve')
+
+    def list_bots(self, params=None):
+        return self.request('GET', '/bot', 'bot.list', params=params)
+
+    def iter_bots(self, params=None):
+        """Yield every bot, following the paginated list's next links"""
+        response = self.list_bots(params)
+        while True:
+            response.raise_for_status()
+            page = response.json()
+            if isinstance(page, list):
+                yield from page
+                return
+            yield from page.get('results', [])
+            if not page.get('next'):
+                return
+            response = self.request('GET', page['next'], 'bot.list')
+
+    def delete_bot(self, bot_id):
+        return self.request('DELETE', f'/bot/{bot_id}', 'bot.delete')
+
+    def delete_media(self, bot_id):
+        return self.request('POST', f'/bot/{bot_id}/delete_media', 'bot.delete_media')
+
+    def output_audio(self, bot_id, payload):
+        """payload is a dict, or an already encoded JSON body (bytes) such as a cached clip"""
+        body = {'data': payload} if isinstance(payload, bytes) else {'json': payload}
+        # Playing the same clip twice is worse than reporting the failure
+        return self.request('POST', f'/bot/{bot_id}/output_audio/', 'bot.output_audio', idempotent=False,
+                            timeout=(self.timeout[0], 30), **body)
+
+    def stop_output_audio(self, bot_id):
+        return self.request('DELETE', f'/bot/{bot_id}/output_audio/', 'bot.stop_output_audio')
+
+    def histograms(self):
+        """endpoint -> (per-bucket counts, count, total_ms, errors), copied for exporters"""
+        with self.lock:
+            return {
+                name: (list(histogram.counts), histogram.count, histogram.total_ms, histogram.errors)
+                for name, histogram in self._histograms.items()
+            }
+
+    def stats(self):
+        with self.lock:
+            endpoints = {name: histogram.to_dict() for name, histogram in self._histograms.items()}
+            retries = self.retries
+        return {
+            "base_url": self.base_url,
+            "retries": retries,
+            "circuit": self.breaker.to_dict(),
+            "endpoints": endpoints
+        }
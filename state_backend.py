@@ -0,0 +1,617 @@
+# state_backend.py - Where shared state lives: in this process, or in SQLite shared by worker processes
+import json
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from audio_queue import AudioCommandQueue
+from bot_registry import (BotRegistry, BotSession, STATE_ACTIVE, STATE_ENDED, STATE_JOINING,
+                          RECALL_ACTIVE_CODES, RECALL_ENDED_CODES, MAX_STATUS_CHANGES, STATUS_FEED_SIZE)
+from transcript_buffer import (TranscriptStore, TranscriptLine, EMPTY_TRANSCRIPT_SNAPSHOT,
+                               RETIRED_SEQ_LIMIT, build_snapshot)
+
+BACKEND_MEMORY = 'memory'
+BACKEND_SQLITE = 'sqlite'
+BACKENDS = (BACKEND_MEMORY, BACKEND_SQLITE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS transcript_bots (
+    bot_id     TEXT    PRIMARY KEY,
+    seq        INTEGER NOT NULL,
+    updated_at REAL    NOT NULL,
+    live       INTEGER NOT NULL   -- 0 once removed; the row keeps the seq so numbering never repeats
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS transcript_lines (
+    bot_id    TEXT    NOT NULL,
+    seq       INTEGER NOT NULL,
+    speaker   TEXT    NOT NULL,
+    text      TEXT    NOT NULL,
+    timestamp REAL    NOT NULL,
+    starts    BLOB,
+    ends      BLOB,
+    replaces  INTEGER,
+    PRIMARY KEY (bot_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS audio_commands (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    bot_id       TEXT    NOT NULL,
+    command      TEXT    NOT NULL,
+    leased_until REAL,
+    deliveries   INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_audio_commands_bot ON audio_commands (bot_id, id);
+CREATE TABLE IF NOT EXISTS bot_sessions (
+    bot_id         TEXT PRIMARY KEY,
+    agent_token    TEXT,
+    meeting_url    TEXT,
+    agent_name     TEXT,
+    state          TEXT NOT NULL,
+    created_at     REAL NOT NULL,
+    last_activity  REAL NOT NULL,
+    status_changes TEXT NOT NULL,
+    media_ready    INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_bot_sessions_token ON bot_sessions (agent_token);
+CREATE TABLE IF NOT EXISTS status_feed (
+    seq     INTEGER PRIMARY KEY AUTOINCREMENT,
+    session TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id     TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    job        TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# How often a waiter checks the database for changes made by another process (seconds)
+POLL_INTERVAL = 0.1
+# Agent pages hit touch() on every poll; other processes only need last_activity this fresh (seconds)
+TOUCH_INTERVAL = 5
+# Finished jobs kept for status lookups
+MAX_STORED_JOBS = 100
+
+
+class MemoryBackend:
+    """
+    Everything in this process's memory - the fastest option, for a single worker process
+    (python app.py, or a WSGI server running one process with many threads).
+    """
+    name = BACKEND_MEMORY
+
+    def __init__(self):
+        # Changes on every restart so ETags from a previous process never match
+        self.epoch = format(int(time.time()), 'x')
+
+    def transcript_store(self, **options):
+        return TranscriptStore(**options)
+
+    def audio_command_queue(self, **options):
+        return AudioCommandQueue(**options)
+
+    def bot_registry(self):
+        return BotRegistry()
+
+    def save_job(self, job):
+        """Jobs only live in the process that runs them"""
+
+    def load_job(self, job_id):
+        return None
+
+    def recent_jobs(self):
+        return []
+
+    def stats(self):
+        return {"backend": self.name}
+
+
+class SQLiteBackend:
+    """
+    State in one SQLite database (WAL mode) shared by every worker process on the host.
+    Writes are short IMMEDIATE transactions; waits (transcript streams, audio long polls,
+    status streams) wake at once for writes from their own process and within
+    POLL_INTERVAL for writes from another.
+    """
+    name = BACKEND_SQLITE
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self.connection()
+        conn.executescript(SCHEMA)
+        # Stable across processes and restarts - sequence numbers live in the database too
+        conn.execute("INSERT OR IGNORE INTO state_meta (key, value) VALUES ('epoch', ?)",
+                     (format(int(time.time()), 'x'),))
+        self.epoch = conn.execute("SELECT value FROM state_meta WHERE key = 'epoch'").fetchone()[0]
+
+    def connection(self):
+        """Per-thread connection - sqlite3 connections can't be shared across threads"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit; writes open their own transactions with write()
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def write(self):
+        """Transaction holding the write lock from the start, so read-modify-write is atomic across processes"""
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    @contextmanager
+    def read(self):
+        """Consistent read of several statements (one WAL snapshot)"""
+        conn = self.connection()
+        conn.execute('BEGIN')
+        try:
+            yield conn
+        finally:
+            conn.execute('COMMIT')
+
+    def transcript_store(self, **options):
+        return SQLiteTranscriptStore(self, **options)
+
+    def audio_command_queue(self, **options):
+        return SQLiteAudioCommandQueue(self, **options)
+
+    def bot_registry(self):
+        return SQLiteBotRegistry(self)
+
+    def save_job(self, job):
+        with self.write() as conn:
+            conn.execute('INSERT OR REPLACE INTO jobs (job_id, created_at, job) VALUES (?, ?, ?)',
+                         (job.id, job.created_at, json.dumps(job.to_dict())))
+            conn.execute('DELETE FROM jobs WHERE job_id NOT IN '
+                         '(SELECT job_id FROM jobs ORDER BY created_at DESC LIMIT ?)', (MAX_STORED_JOBS,))
+
+    def load_job(self, job_id):
+        """Latest published progress of a job run by any worker, as a dict"""
+        row = self.connection().execute('SELECT job FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def recent_jobs(self):
+        rows = self.connection().execute('SELECT job FROM jobs ORDER BY created_at DESC').fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def stats(self):
+        return {"backend": self.name, "path": self.path}
+
+
+def create_backend(name, path='state.db'):
+    """The state backend called name ('memory' or 'sqlite')"""
+    if name == BACKEND_MEMORY:
+        return MemoryBackend()
+    if name == BACKEND_SQLITE:
+        return SQLiteBackend(path)
+    raise ValueError(f'Unknown state backend {name!r} (expected one of {", ".join(BACKENDS)})')
+
+
+def _timings_blob(values):
+    return values.tobytes() if values is not None else None
+
+
+def _timings(blob):
+    if blob is None:
+        return None
+    values = array('d')
+    values.frombytes(blob)
+    return values
+
+
+def _line_from_row(row):
+    seq, speaker, text, timestamp, starts, ends, replaces = row
+    return TranscriptLine(seq, speaker, text, timestamp, _timings(starts), _timings(ends), replaces)
+
+
+class SQLiteTranscriptStore:
+    """
+    TranscriptStore kept in SQLite: the newest max_lines lines per bot, with the same
+    sequence numbering, merging and snapshots. Snapshots are cached per process and
+    reused until the bot's sequence number moves, so an unchanged poll is one lookup.
+    The database is on disk, so there is no memory budget to enforce.
+    """
+    LINE_COLUMNS = 'seq, speaker, text, timestamp, starts, ends, replaces'
+
+    def __init__(self, backend, max_lines=20, seq_seed=None, merge_gap=0, merge_max_chars=500,
+                 snapshot_cache_size=1000, **_memory_only):
+        self.backend = backend
+        self.max_lines = max_lines
+        self.seq_seed = seq_seed
+        self.merge_gap = merge_gap
+        self.merge_max_chars = merge_max_chars
+        self.snapshot_cache_size = snapshot_cache_size
+        self.lock = threading.Lock()
+        self.appended = threading.Condition(self.lock)   # Wakes waiters in this process at once
+        self._snapshots = OrderedDict()   # bot_id -> TranscriptSnapshot, least recently used first
+
+    def append(self, bot_id, speaker, text, timestamp, starts=None, ends=None):
+        lines, evicted = self.append_many(bot_id, ((speaker, text, timestamp, starts, ends),))
+        return lines[0], evicted
+
+    def append_many(self, bot_id, entries):
+        """Append (speaker, text, timestamp, starts, ends) entries in one transaction; returns (lines, [])"""
+        lines = []
+        with self.backend.write() as conn:
+            row = conn.execute('SELECT seq FROM transcript_bots WHERE bot_id = ?', (bot_id,)).fetchone()
+            if row is not None:
+                seq = row[0]
+            else:
+                seq = self.seq_seed(bot_id) if self.seq_seed else 0
+            row = conn.execute(f'SELECT {self.LINE_COLUMNS} FROM transcript_lines WHERE bot_id = ? '
+                               'ORDER BY seq DESC LIMIT 1', (bot_id,)).fetchone()
+            last = _line_from_row(row) if row else None
+
+            for speaker, text, timestamp, starts, ends in entries:
+                seq += 1
+                if last is not None and self.merge_gap and last.can_merge(speaker, text, timestamp, starts,
+                                                                          self.merge_gap, self.merge_max_chars):
+                    line = last.merged(seq, text, timestamp, starts, ends)
+                    conn.execute('DELETE FROM transcript_lines WHERE bot_id = ? AND seq = ?', (bot_id, last.seq))
+                else:
+                    line = TranscriptLine(seq, speaker, text, timestamp, starts, ends)
+                conn.execute('INSERT INTO transcript_lines VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                             (bot_id, line.seq, line.speaker, line.text, line.timestamp,
+                              _timings_blob(line.starts), _timings_blob(line.ends), line.replaces))
+                lines.append(line)
+                last = line
+
+            # Keep only the newest max_lines, like the in-memory ring
+            conn.execute('DELETE FROM transcript_lines WHERE bot_id = ? AND seq <= (SELECT seq FROM transcript_lines '
+                         'WHERE bot_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)', (bot_id, bot_id, self.max_lines))
+            conn.execute('INSERT INTO transcript_bots (bot_id, seq, updated_at, live) VALUES (?, ?, ?, 1) '
+                         'ON CONFLICT (bot_id) DO UPDATE SET seq = excluded.seq, updated_at = excluded.updated_at, '
+                         'live = 1', (bot_id, seq, time.time()))
+
+        with self.appended:
+            self.appended.notify_all()
+        return lines, []
+
+    def remove(self, bot_id):
+        """Drop a bot's lines (its sequence number is kept); returns True if it had any"""
+        with self.backend.write() as conn:
+            removed = conn.execute('UPDATE transcript_bots SET live = 0, updated_at = ? WHERE bot_id = ? AND live = 1',
+                                   (time.time(), bot_id)).rowcount
+            conn.execute('DELETE FROM transcript_lines WHERE bot_id = ?', (bot_id,))
+            conn.execute('DELETE FROM transcript_bots WHERE live = 0 AND bot_id NOT IN (SELECT bot_id FROM '
+                         'transcript_bots WHERE live = 0 ORDER BY updated_at DESC LIMIT ?)', (RETIRED_SEQ_LIMIT,))
+        with self.lock:
+            self._snapshots.pop(bot_id, None)
+        return removed > 0
+
+    def keep_only(self, bot_ids):
+        removed = [bot_id for bot_id in self.bot_ids() if bot_id not in bot_ids]
+        for bot_id in removed:
+            self.remove(bot_id)
+        return removed
+
+    def snapshot(self, bot_id):
+        """Current TranscriptSnapshot for bot_id (empty if unknown)"""
+        seq = self.latest_seq(bot_id)
+        if not seq:
+            return EMPTY_TRANSCRIPT_SNAPSHOT
+        with self.lock:
+            cached = self._snapshots.get(bot_id)
+            if cached is not None and cached.seq == seq:
+                self._snapshots.move_to_end(bot_id)
+                return cached
+
+        with self.backend.read() as conn:
+            row = conn.execute('SELECT seq FROM transcript_bots WHERE bot_id = ? AND live = 1', (bot_id,)).fetchone()
+            if row is None:
+                return EMPTY_TRANSCRIPT_SNAPSHOT
+            rows = conn.execute(f'SELECT {self.LINE_COLUMNS} FROM transcript_lines WHERE bot_id = ? ORDER BY seq',
+                                (bot_id,)).fetchall()
+        snapshot = build_snapshot(row[0], tuple(_line_from_row(line) for line in rows))
+
+        with self.lock:
+            self._snapshots[bot_id] = snapshot
+            self._snapshots.move_to_end(bot_id)
+            while len(self._snapshots) > self.snapshot_cache_size:
+                self._snapshots.popitem(last=False)
+        return snapshot
+
+    def latest_seq(self, bot_id):
+        row = self.backend.connection().execute(
+            'SELECT seq FROM transcript_bots WHERE bot_id = ? AND live = 1', (bot_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def wait_for_line(self, bot_id, after_seq, timeout):
+        """Block until bot_id has a line newer than after_seq or timeout passes; returns the latest seq"""
+        deadline = time.monotonic() + timeout
+        while True:
+            seq = self.latest_seq(bot_id)
+            remaining = deadline - time.monotonic()
+            if seq > after_seq or remaining <= 0:
+                return seq
+            with self.appended:
+                self.appended.wait(min(POLL_INTERVAL, remaining))
+
+    def __contains__(self, bot_id):
+        return self.latest_seq(bot_id) > 0
+
+    def bot_ids(self):
+        """Bot IDs with transcript data, most recently updated first"""
+        rows = self.backend.connection().execute(
+            'SELECT bot_id FROM transcript_bots WHERE live = 1 ORDER BY updated_at DESC'
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def line_counts(self):
+        rows = self.backend.connection().execute(
+            'SELECT bot_id, COUNT(*) FROM transcript_lines GROUP BY bot_id'
+        ).fetchall()
+        return dict(rows)
+
+    def stats(self):
+        conn = self.backend.connection()
+        return {
+            "bots": conn.execute('SELECT COUNT(*) FROM transcript_bots WHERE live = 1').fetchone()[0],
+            "lines": conn.execute('SELECT COUNT(*) FROM transcript_lines').fetchone()[0],
+            "cached_snapshots": len(self._snapshots)
+        }
+
+
+class SQLiteAudioCommandQueue:
+    """
+    AudioCommandQueue kept in SQLite, with the same lease/ack/redelivery rules.
+    Command IDs are unique across bots (and still increase per bot); the epoch is the
+    database's, as IDs never repeat within one database.
+    """
+
+    def __init__(self, backend, lease_seconds=30, max_deliveries=3, max_pending=100):
+        self.backend = backend
+        self.lease_seconds = lease_seconds
+        self.max_deliveries = max_deliveries
+        self.max_pending = max_pending
+        self.pushed = threading.Condition()   # Wakes long polls in this process at once
+        self.epoch = backend.epoch
+
+    def push(self, bot_id, command, **fields):
+        """Queue a command for bot_id; returns it with its ID, or None if the queue is full"""
+        entry = {"epoch": self.epoch, "command": command, "timestamp": time.time()}
+        entry.update(fields)
+        with self.backend.write() as conn:
+            depth = conn.execute('SELECT COUNT(*) FROM audio_commands WHERE bot_id = ?', (bot_id,)).fetchone()[0]
+            if depth >= self.max_pending:
+                return None
+            cursor = conn.execute('INSERT INTO audio_commands (bot_id, command) VALUES (?, ?)',
+                                  (bot_id, json.dumps(entry)))
+        with self.pushed:
+            self.pushed.notify_all()
+        return {"id": cursor.lastrowid, **entry}
+
+    def ack(self, bot_id, command_id):
+        """Acknowledge a delivered command; returns True if it was outstanding"""
+        with self.backend.write() as conn:
+            return conn.execute('DELETE FROM audio_commands WHERE id = ? AND bot_id = ? AND deliveries > 0',
+                                (command_id, bot_id)).rowcount > 0
+
+    def _lease(self, bot_id):
+        """Lease the oldest deliverable command, or None"""
+        now = time.time()
+        conn = self.backend.connection()
+        # Most polls find nothing - check without taking the write lock
+        if conn.execute('SELECT 1 FROM audio_commands WHERE bot_id = ? AND (leased_until IS NULL OR leased_until <= ?) '
+                        'LIMIT 1', (bot_id, now)).fetchone() is None:
+            return None
+        with self.backend.write() as conn:
+            # Never acknowledged - the agent page is gone or keeps failing on it
+            conn.execute('DELETE FROM audio_commands WHERE bot_id = ? AND leased_until <= ? AND deliveries >= ?',
+                         (bot_id, now, self.max_deliveries))
+            row = conn.execute('SELECT id, command FROM audio_commands WHERE bot_id = ? AND '
+                               '(leased_until IS NULL OR leased_until <= ?) ORDER BY id LIMIT 1', (bot_id, now)).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE audio_commands SET leased_until = ?, deliveries = deliveries + 1 WHERE id = ?',
+                         (now + self.lease_seconds, row[0]))
+        return {"id": row[0], **json.loads(row[1])}
+
+    def poll(self, bot_id, wait=0, ack=None, epoch=None):
+        """
+        Next command for bot_id, blocking up to wait seconds; ack acknowledges the previous
+        one unless epoch names another database
+        """
+        if ack and (epoch is None or epoch == self.epoch):
+            self.ack(bot_id, ack)
+        deadline = time.monotonic() + wait
+        while True:
+            command = self._lease(bot_id)
+            remaining = deadline - time.monotonic()
+            if command is not None or remaining <= 0:
+                return command
+            with self.pushed:
+                self.pushed.wait(min(POLL_INTERVAL, remaining))
+
+    def remove(self, bot_id):
+        with self.backend.write() as conn:
+            return conn.execute('DELETE FROM audio_commands WHERE bot_id = ?', (bot_id,)).rowcount > 0
+
+    def depth(self, bot_id):
+        return self.backend.connection().execute(
+            'SELECT COUNT(*) FROM audio_commands WHERE bot_id = ?', (bot_id,)
+        ).fetchone()[0]
+
+    def stats(self):
+        bots, pending, leased = self.backend.connection().execute(
+            'SELECT COUNT(DISTINCT bot_id), COALESCE(SUM(deliveries = 0), 0), COALESCE(SUM(deliveries > 0), 0) '
+            'FROM audio_commands'
+        ).fetchone()
+        return {"bots": bots, "pending": pending, "leased": leased}
+
+
+class SQLiteBotRegistry:
+    """BotRegistry kept in SQLite. Returned BotSession objects are copies - change state through the registry."""
+    SESSION_COLUMNS = ('bot_id, agent_token, meeting_url, agent_name, state, created_at, last_activity, '
+                       'status_changes, media_ready')
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)   # Wakes status streams in this process at once
+        self._touched = {}   # bot_id -> when this process last wrote its last_activity
+
+    @staticmethod
+    def _session(row):
+        if row is None:
+            return None
+        session = BotSession(row[0], row[1], row[2], row[3], row[4])
+        session.created_at = row[5]
+        session.last_activity = row[6]
+        session.status_changes = json.loads(row[7])
+        session.media_ready = bool(row[8])
+        return session
+
+    def _select(self, conn, where, params=()):
+        return conn.execute(f'SELECT {self.SESSION_COLUMNS} FROM bot_sessions {where}', params)
+
+    def _save(self, conn, session):
+        # An upsert keeps the rowid, which orders sessions by deploy time
+        conn.execute(
+            f'INSERT INTO bot_sessions ({self.SESSION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (bot_id) DO UPDATE SET state = excluded.state, last_activity = excluded.last_activity, '
+            'status_changes = excluded.status_changes, media_ready = excluded.media_ready',
+            (session.bot_id, session.agent_token, session.meeting_url, session.agent_name, session.state,
+             session.created_at, session.last_activity, json.dumps(session.status_changes), int(session.media_ready))
+        )
+
+    def __len__(self):
+        return self.backend.connection().execute('SELECT COUNT(*) FROM bot_sessions').fetchone()[0]
+
+    def __contains__(self, bot_id):
+        return self.backend.connection().execute(
+            'SELECT 1 FROM bot_sessions WHERE bot_id = ?', (bot_id,)
+        ).fetchone() is not None
+
+    def register(self, bot_id, agent_token=None, meeting_url=None, agent_name=None, state=STATE_JOINING):
+        """Add (or refresh) a session; returns the BotSession"""
+        with self.backend.write() as conn:
+            session = self._session(self._select(conn, 'WHERE bot_id = ?', (bot_id,)).fetchone())
+            if session is None:
+                session = BotSession(bot_id, agent_token, meeting_url, agent_name, state)
+                self._save(conn, session)
+            else:
+                conn.execute('UPDATE bot_sessions SET meeting_url = COALESCE(?, meeting_url), '
+                             'agent_name = COALESCE(?, agent_name), agent_token = COALESCE(?, agent_token) '
+                             'WHERE bot_id = ?', (meeting_url or None, agent_name or None, agent_token or None, bot_id))
+                session = self._session(self._select(conn, 'WHERE bot_id = ?', (bot_id,)).fetchone())
+        return session
+
+    def get(self, bot_id):
+        return self._session(self._select(self.backend.connection(), 'WHERE bot_id = ?', (bot_id,)).fetchone())
+
+    def by_token(self, agent_token):
+        return self._session(self._select(self.backend.connection(), 'WHERE agent_token = ?', (agent_token,)).fetchone())
+
+    def most_recent(self):
+        """Bot ID of the most recently deployed session that hasn't ended, or None"""
+        row = self.backend.connection().execute(
+            'SELECT bot_id FROM bot_sessions WHERE state != ? ORDER BY rowid DESC LIMIT 1', (STATE_ENDED,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def touch(self, bot_id, activate=False):
+        """Record activity for a bot; activate moves a joining bot to active"""
+        now = time.time()
+        if now - self._touched.get(bot_id, 0) < TOUCH_INTERVAL:
+            # Written moments ago by this process - spare the write lock on every agent poll
+            session = self.get(bot_id)
+            if session is None or not (activate and session.state == STATE_JOINING):
+                return session
+        with self.backend.write() as conn:
+            conn.execute('UPDATE bot_sessions SET last_activity = ?, state = CASE WHEN ? AND state = ? '
+                         'THEN ? ELSE state END WHERE bot_id = ?',
+                         (now, activate, STATE_JOINING, STATE_ACTIVE, bot_id))
+            session = self._session(self._select(conn, 'WHERE bot_id = ?', (bot_id,)).fetchone())
+        if session is not None:
+            self._touched[bot_id] = now
+        return session
+
+    def set_state(self, bot_id, state):
+        with self.backend.write() as conn:
+            conn.execute('UPDATE bot_sessions SET state = ?, last_activity = ? WHERE bot_id = ?',
+                         (state, time.time(), bot_id))
+            return self._session(self._select(conn, 'WHERE bot_id = ?', (bot_id,)).fetchone())
+
+    def record_status(self, bot_id, code, sub_code=None, created_at=None, media_ready=False):
+        """Apply a lifecycle event from Recall.ai (adopting unknown bots) and publish it to status streams"""
+        with self.backend.write() as conn:
+            session = self._session(self._select(conn, 'WHERE bot_id = ?', (bot_id,)).fetchone()) or BotSession(bot_id)
+            if code:
+                session.status_changes.append({
+                    "code": code,
+                    "sub_code": sub_code,
+                    "created_at": created_at
+                })
+                del session.status_changes[:-MAX_STATUS_CHANGES]
+                if code in RECALL_ENDED_CODES:
+                    session.state = STATE_ENDED
+                elif code in RECALL_ACTIVE_CODES and session.state == STATE_JOINING:
+                    session.state = STATE_ACTIVE
+            session.media_ready = session.media_ready or media_ready
+            session.last_activity = time.time()
+            self._save(conn, session)
+
+            conn.execute('INSERT INTO status_feed (session) VALUES (?)', (json.dumps(session.to_dict()),))
+            conn.execute('DELETE FROM status_feed WHERE seq <= (SELECT MAX(seq) FROM status_feed) - ?',
+                         (STATUS_FEED_SIZE,))
+        with self.changed:
+            self.changed.notify_all()
+        return session
+
+    def status_seq(self):
+        row = self.backend.connection().execute('SELECT MAX(seq) FROM status_feed').fetchone()
+        return row[0] or 0
+
+    def wait_for_status(self, after_seq, timeout):
+        """Status changes newer than after_seq as (seq, session dict), waiting up to timeout for one"""
+        deadline = time.monotonic() + timeout
+        while True:
+            rows = self.backend.connection().execute(
+                'SELECT seq, session FROM status_feed WHERE seq > ? ORDER BY seq', (after_seq,)
+            ).fetchall()
+            remaining = deadline - time.monotonic()
+            if rows or remaining <= 0:
+                return [(seq, json.loads(session)) for seq, session in rows]
+            with self.changed:
+                self.changed.wait(min(POLL_INTERVAL, remaining))
+
+    def remove(self, bot_id):
+        with self.backend.write() as conn:
+            session = self._session(self._select(conn, 'WHERE bot_id = ?', (bot_id,)).fetchone())
+            conn.execute('DELETE FROM bot_sessions WHERE bot_id = ?', (bot_id,))
+        self._touched.pop(bot_id, None)
+        return session
+
+    def prune(self, idle_timeout, ended_grace):
+        """Remove sessions idle longer than idle_timeout or ended longer than ended_grace ago"""
+        now = time.time()
+        with self.backend.write() as conn:
+            expired = [row[0] for row in conn.execute(
+                'SELECT bot_id FROM bot_sessions WHERE ? - last_activity > CASE WHEN state = ? THEN ? ELSE ? END',
+                (now, STATE_ENDED, ended_grace, idle_timeout)
+            ).fetchall()]
+            conn.executemany('DELETE FROM bot_sessions WHERE bot_id = ?', [(bot_id,) for bot_id in expired])
+        for bot_id in expired:
+            self._touched.pop(bot_id, None)
+        return expired
+
+    def sessions(self):
+        """Every session, most recently deployed first"""
+        rows = self._select(self.backend.connection(), 'ORDER BY rowid DESC').fetchall()
+        return [self._session(row) for row in rows]
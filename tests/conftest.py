@@ -0,0 +1,27 @@
+# conftest.py - Imports the app with persistence off and Recall.ai pointed nowhere
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)   # The app resolves audio/ and version.json against the working directory
+os.environ['TRANSCRIPT_LOG_PATH'] = ''
+os.environ['STATE_BACKEND'] = 'memory'
+os.environ['RECALL_API_BASE'] = 'http://127.0.0.1:9/api/v1'
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app as dashboard
+
+
+@pytest.fixture
+def app_module():
+    return dashboard
+
+
+@pytest.fixture
+def client():
+    return dashboard.app.test_client()
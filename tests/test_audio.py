@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from audio_cache import AudioPayloadCache
+
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'audio')
+CLIP = sorted(name for name in os.listdir(AUDIO_DIR) if name.endswith('.mp3'))[0]
+
+
+@pytest.fixture
+def clip():
+    with open(os.path.join(AUDIO_DIR, CLIP), 'rb') as f:
+        return f.read()
+
+
+def test_single_range(client, clip):
+    response = client.get(f'/audio/{CLIP}', headers={'Range': 'bytes=0-99'})
+    assert response.status_code == 206
+    assert response.data == clip[:100]
+
+
+def test_sorted_ranges_are_multipart(client, clip):
+    response = client.get(f'/audio/{CLIP}', headers={'Range': 'bytes=0-9, 100-109'})
+    assert response.status_code == 206
+    assert response.mimetype == 'multipart/byteranges'
+    assert clip[100:110] in response.data
+
+
+@pytest.mark.parametrize('ranges', [
+    'bytes=100-199, 0-99',    # Unsorted
+    'bytes=0-99, 50-149',     # Overlapping
+    'bytes=-100, 0-99',       # Suffix range first
+], ids=['unsorted', 'overlapping', 'suffix-first'])
+def test_ranges_werkzeug_cannot_normalise_get_whole_file(client, clip, ranges):
+    response = client.get(f'/audio/{CLIP}', headers={'Range': ranges})
+    assert response.status_code == 200
+    assert response.data == clip
+    assert 'Content-Range' not in response.headers
+
+
+def test_too_many_ranges_get_whole_file(client, app_module, clip):
+    count = app_module.MAX_AUDIO_RANGES + 1
+    ranges = 'bytes=' + ', '.join(f'{i * 10}-{i * 10 + 4}' for i in range(count))
+    response = client.get(f'/audio/{CLIP}', headers={'Range': ranges})
+    assert response.status_code == 200
+    assert response.data == clip
+
+
+def test_unsatisfiable_single_range(client, clip):
+    response = client.get(f'/audio/{CLIP}', headers={'Range': f'bytes={len(clip) + 10}-'})
+    assert response.status_code == 416
+
+
+def test_warm_up_loads_are_not_counted_as_misses(tmp_path):
+    (tmp_path / 'chime.mp3').write_bytes(b'ID3' + b'\x00' * 64)
+    cache = AudioPayloadCache(str(tmp_path))
+
+    assert cache.warm() == 1
+    assert (cache.stats()['hits'], cache.stats()['misses'], cache.stats()['hit_rate']) == (0, 0, None)
+
+    assert cache.payload('chime.mp3') is not None
+    assert (cache.stats()['hits'], cache.stats()['misses'], cache.stats()['hit_rate']) == (1, 0, 1.0)
@@ -0,0 +1,63 @@
+from audio_queue import AudioCommandQueue
+
+
+def test_commands_are_delivered_in_order_until_acked():
+    queue = AudioCommandQueue(lease_seconds=0, max_deliveries=2)
+    play = queue.push('bot-1', 'play', audio_file='a.mp3')
+    stop = queue.push('bot-1', 'stop')
+
+    assert queue.poll('bot-1')['id'] == play['id']
+    # The lease has lapsed without an ack - the same command comes back
+    assert queue.poll('bot-1')['id'] == play['id']
+    assert queue.poll('bot-1', ack=play['id'])['id'] == stop['id']
+    assert queue.poll('bot-1', ack=stop['id']) is None
+    assert queue.stats()['acked'] == 2
+
+
+def test_unacked_command_expires_after_max_deliveries():
+    queue = AudioCommandQueue(lease_seconds=0, max_deliveries=2)
+    queue.push('bot-1', 'play', audio_file='a.mp3')
+
+    assert queue.poll('bot-1') is not None
+    assert queue.poll('bot-1') is not None
+    assert queue.poll('bot-1') is None
+    assert queue.stats()['expired'] == 1
+
+
+def test_full_queue_refuses_pushes():
+    queue = AudioCommandQueue(max_pending=2)
+    assert queue.push('bot-1', 'play') and queue.push('bot-1', 'stop')
+    assert queue.push('bot-1', 'play') is None
+    assert queue.push('bot-2', 'play') is not None
+
+
+def test_new_queue_has_new_epoch_and_ignores_stale_acks():
+    queue = AudioCommandQueue()
+    first = queue.push('bot-1', 'play', audio_file='a.mp3')
+    assert queue.poll('bot-1', ack=None)['epoch'] == first['epoch']
+    queue.remove('bot-1')
+
+    # IDs start over, but the epoch tells the page to start its cursor over too
+    second = queue.push('bot-1', 'play', audio_file='b.mp3')
+    assert second['id'] == first['id']
+    assert second['epoch'] != first['epoch']
+
+    # The page's ack of the old command must not acknowledge the new one with the same ID
+    assert queue.poll('bot-1', ack=first['id'], epoch=first['epoch'])['id'] == second['id']
+    assert queue.depth('bot-1') == 1
+    assert queue.poll('bot-1', ack=second['id'], epoch=second['epoch']) is None
+    assert queue.depth('bot-1') == 0
+
+
+def test_audio_command_route_carries_the_epoch(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'audio_commands', AudioCommandQueue())
+    pushed = client.post('/api/bot/epoch-bot/play-audio', json={'audio_file': 'a.mp3'}).get_json()
+
+    command = client.get('/api/bot/epoch-bot/audio-command').get_json()
+    assert (command['id'], command['command']) == (pushed['command_id'], 'play')
+    assert command['epoch']
+
+    client.get(f"/api/bot/epoch-bot/audio-command?ack={command['id']}&epoch=stale")
+    assert app_module.audio_commands.depth('epoch-bot') == 1
+    client.get(f"/api/bot/epoch-bot/audio-command?ack={command['id']}&epoch={command['epoch']}")
+    assert app_module.audio_commands.depth('epoch-bot') == 0
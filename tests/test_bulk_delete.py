@@ -0,0 +1,46 @@
+import pytest
+
+
+@pytest.fixture
+def submitted(app_module, monkeypatch):
+    """Items handed to the bulk job runner, instead of deleting anything"""
+    jobs = []
+    original = app_module.bulk_jobs.submit
+
+    def submit(kind, items, action):
+        jobs.append((kind, list(items)))
+        return original(kind, [], action)
+
+    monkeypatch.setattr(app_module.bulk_jobs, 'submit', submit)
+    monkeypatch.setattr(app_module, '_all_recall_bot_ids', lambda: iter(['every-1', 'every-2']))
+    return jobs
+
+
+@pytest.mark.parametrize('body', [
+    None,
+    {},
+    {'bot_ids': []},
+    {'bot_ids': 'bot-1'},
+    {'bot_ids': ['bot-1', 7]},
+    {'bot_ids': ['bot-1', '']},
+    {'all': 'yes'},
+    ['bot-1'],
+])
+def test_rejects_anything_but_bot_ids_or_all(client, submitted, body):
+    response = client.post('/api/recall-bots/bulk-delete', json=body) if body is not None \
+        else client.post('/api/recall-bots/bulk-delete')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert submitted == []
+
+
+def test_deletes_given_bot_ids_once_each(client, submitted):
+    response = client.post('/api/recall-bots/bulk-delete', json={'bot_ids': ['bot-1', 'bot-2', 'bot-1']})
+    assert response.status_code == 202
+    assert submitted == [('delete_bots', ['bot-1', 'bot-2'])]
+
+
+def test_all_deletes_every_bot(client, submitted):
+    response = client.post('/api/recall-bots/bulk-delete', json={'all': True})
+    assert response.status_code == 202
+    assert submitted == [('delete_bots', ['every-1', 'every-2'])]
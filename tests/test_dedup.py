@@ -0,0 +1,40 @@
+import threading
+
+from dedup import DedupWindow
+
+
+def test_repeated_identity_is_a_duplicate_until_discarded():
+    window = DedupWindow()
+    assert window.check('bot-1', ('delivery', 'a')) is False
+    assert window.check('bot-1', ('delivery', 'a')) is True
+    assert window.check('bot-2', ('delivery', 'a')) is False
+
+    window.discard('bot-1', ('delivery', 'a'))
+    assert window.check('bot-1', ('delivery', 'a')) is False
+    assert window.stats()['duplicates_dropped'] == 1
+
+
+def test_window_forgets_past_max_keys():
+    window = DedupWindow(max_keys=2)
+    for key in ('a', 'b', 'c'):
+        window.check('bot-1', key)
+    assert window.check('bot-1', 'a') is False
+    assert window.check('bot-1', 'c') is True
+
+
+def test_counts_from_concurrent_bots_add_up():
+    window = DedupWindow(max_keys=10000)
+
+    def check(thread):
+        for n in range(2000):
+            window.check(f'bot-{thread}', n % 1000)
+
+    threads = [threading.Thread(target=check, args=(thread,)) for thread in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = window.stats()
+    assert stats['checked'] == 16000
+    assert stats['duplicates_dropped'] == 8000
@@ -0,0 +1,53 @@
+import pytest
+
+
+@pytest.fixture
+def deployed(app_module, monkeypatch):
+    """Meetings handed to the deploy job runner, instead of creating any bots"""
+    jobs = []
+    original = app_module.deploy_jobs.submit
+
+    def submit(kind, items, action, **options):
+        jobs.append((kind, list(items)))
+        return original(kind, [], action, **options)
+
+    monkeypatch.setattr(app_module.deploy_jobs, 'submit', submit)
+    monkeypatch.setattr(app_module, 'get_current_backend_url', lambda: 'https://backend.example')
+    monkeypatch.setattr(app_module, 'cleanup_old_bots', lambda: None)
+    return jobs
+
+
+@pytest.mark.parametrize('body', [
+    None,
+    {},
+    ['https://zoom.us/j/1'],
+    {'meetings': 'https://zoom.us/j/1'},
+    {'meetings': []},
+    {'meetings': {'meeting_url': 'https://zoom.us/j/1'}},
+    {'meetings': ['https://zoom.us/j/1', '']},
+    {'meetings': ['https://zoom.us/j/1', 7]},
+    {'meetings': [{'agent_name': 'Ann'}]},
+    {'meetings': [{'meeting_url': 'https://zoom.us/j/1', 'agent_name': ['Ann']}]},
+    {'meetings': ['https://zoom.us/j/1'], 'agent_name': 7},
+])
+def test_bulk_deploy_rejects_anything_but_meeting_urls(client, deployed, body):
+    response = client.post('/api/deploy-agents', json=body) if body is not None \
+        else client.post('/api/deploy-agents')
+    assert response.status_code == 400
+    assert deployed == []
+
+
+def test_bulk_deploy_takes_urls_and_meeting_objects(client, deployed):
+    response = client.post('/api/deploy-agents', json={
+        'meetings': [' https://zoom.us/j/1 ', {'meeting_url': 'https://zoom.us/j/2', 'agent_name': 'Ann'}],
+        'agent_name': 'Helper'
+    })
+    assert response.status_code == 202
+    assert deployed == [('bulk_deploy', [('https://zoom.us/j/1', 'Helper'), ('https://zoom.us/j/2', 'Ann')])]
+
+
+@pytest.mark.parametrize('body', [None, ['https://zoom.us/j/1'], {'meeting_url': 7}, {'meeting_url': ' '}])
+def test_single_deploy_rejects_bad_bodies(client, deployed, body):
+    response = client.post('/deploy-agent', json=body) if body is not None else client.post('/deploy-agent')
+    assert response.status_code == 400
+    assert deployed == []
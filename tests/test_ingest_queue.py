@@ -0,0 +1,49 @@
+import threading
+
+from ingest_queue import IngestQueue, POLICY_DROP_OLDEST, POLICY_REJECT
+
+
+def test_events_for_one_key_are_applied_in_order():
+    applied = []
+    queue = IngestQueue(applied.append, workers=4).start()
+    for n in range(200):
+        assert queue.submit('bot-1', ('bot-1', n))
+    assert queue.flush()
+    assert [n for _, n in applied] == list(range(200))
+
+
+def test_counts_from_concurrent_submitters_add_up():
+    queue = IngestQueue(lambda item: None, workers=4, max_size=100000).start()
+
+    def submit(thread):
+        for n in range(2000):
+            queue.submit(f'bot-{thread}-{n % 7}', n)
+
+    threads = [threading.Thread(target=submit, args=(thread,)) for thread in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert queue.flush()
+
+    stats = queue.stats()
+    assert stats['enqueued'] == stats['processed'] == 16000
+    assert stats['depth'] == stats['errors'] == 0
+
+
+def test_full_queue_policies():
+    release = threading.Event()
+    queue = IngestQueue(lambda item: release.wait(5), workers=1, max_size=2, policy=POLICY_REJECT).start()
+    results = [queue.submit('bot-1', n) for n in range(4)]
+    release.set()
+    assert queue.flush()
+    # The first event may already be on the worker, leaving room for one more
+    assert results[:2] == [True, True] and results[3] is False
+    assert queue.stats()['rejected'] == results.count(False)
+
+    release.clear()
+    queue = IngestQueue(lambda item: release.wait(5), workers=1, max_size=2, policy=POLICY_DROP_OLDEST).start()
+    assert all(queue.submit('bot-1', n) for n in range(5))
+    release.set()
+    assert queue.flush()
+    assert queue.stats()['dropped'] >= 2
@@ -0,0 +1,34 @@
+import math
+
+from transcript_log import TranscriptLog
+
+
+def samples(text):
+    """(name with labels, value) for every sample line; the value must parse as a float"""
+    parsed = []
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        name, value = line.rsplit(' ', 1)
+        parsed.append((name, float(value)))
+    return parsed
+
+
+def test_every_sample_value_is_a_number(client, app_module, monkeypatch, tmp_path):
+    # Persistence is on by default in production - include the log's metrics
+    monkeypatch.setattr(app_module, 'transcript_log', TranscriptLog(str(tmp_path / 'transcripts.db')).start())
+    client.post('/api/webhook/transcript', json={
+        'event': 'transcript.data',
+        'data': {'bot': {'id': 'metrics-bot'},
+                 'data': {'participant': {'name': 'Ann'}, 'words': [{'text': 'hello'}]}}
+    })
+    app_module.ingest_queue.flush()
+    client.get('/api/bot/metrics-bot/transcript')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    parsed = samples(response.text)
+    names = {name.split('{')[0] for name, _ in parsed}
+    assert {'http_requests_total', 'transcript_log_lines_written_total', 'transcript_log_backlog'} <= names
+    assert all(not math.isnan(value) for _, value in parsed)
+    assert '# collector' not in response.text
@@ -0,0 +1,41 @@
+from transcript_search import TranscriptIndex
+
+
+def test_search_ranks_matches_and_filters_by_bot():
+    index = TranscriptIndex()
+    index.add('bot-1', 1, 'Ann', 'the budget review is on friday', 1000.0)
+    index.add('bot-1', 2, 'Bob', 'budget budget budget', 1001.0)
+    index.add('bot-2', 1, 'Cat', 'friday works for the budget', 1002.0)
+
+    total, results = index.search('budget')
+    assert total == 3
+    assert (results[0]['bot_id'], results[0]['seq']) == ('bot-1', 2)
+
+    total, results = index.search('budget friday', bot_id='bot-2')
+    assert total == 1 and results[0]['speaker'] == 'Cat'
+    assert index.search('"friday works"')[0] == 1
+
+
+def test_superseded_lines_leave_nothing_behind():
+    index = TranscriptIndex(max_docs=3)
+    # Each fragment is merged into the next line, as the buffer does with merging on
+    for seq in range(1, 101):
+        index.add('bot-1', seq, 'Ann', f'fragment {seq}', 1000.0 + seq)
+        if seq > 1:
+            index.remove('bot-1', seq - 1)
+
+    assert len(index) == 1
+    assert len(index._docs) == len(index._doc_ids) == 1
+    assert index.search('fragment')[0] == 1
+
+
+def test_oldest_lines_are_evicted_past_max_docs():
+    index = TranscriptIndex(max_docs=2)
+    for seq in (1, 2, 3):
+        index.add('bot-1', seq, 'Ann', f'line number {seq}', 1000.0 + seq)
+    index.remove('bot-1', 2)
+    index.add('bot-1', 4, 'Ann', 'line number 4', 1004.0)
+    index.add('bot-1', 5, 'Ann', 'line number 5', 1005.0)
+
+    assert sorted(result['seq'] for result in index.search('line')[1]) == [4, 5]
+    assert index.stats()['documents'] == 2
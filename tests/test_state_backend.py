@@ -0,0 +1,86 @@
+import pytest
+
+from bot_registry import STATE_ACTIVE, STATE_ENDED
+from bulk_ops import Job
+from state_backend import BACKENDS, create_backend
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, tmp_path):
+    return create_backend(request.param, str(tmp_path / 'state.db'))
+
+
+def test_transcript_store(backend):
+    store = backend.transcript_store(max_lines=3, merge_gap=2)
+    store.append('bot-1', 'Ann', 'so the plan', 1000.0)
+    merged, _ = store.append('bot-1', 'Ann', 'is friday', 1001.0)
+    for n in range(3):
+        store.append('bot-1', 'Bob', f'line {n}', 1100.0 + n * 10)
+
+    assert merged.replaces == 1
+    snapshot = store.snapshot('bot-1')
+    assert [line.text for line in snapshot.lines] == ['line 0', 'line 1', 'line 2']
+    assert snapshot.seq == store.latest_seq('bot-1') == 5
+    assert store.line_counts() == {'bot-1': 3}
+
+    # Numbering carries on after the bot's buffer is removed
+    assert store.remove('bot-1')
+    assert 'bot-1' not in store
+    line, _ = store.append('bot-1', 'Ann', 'back again', 1200.0)
+    assert line.seq == 6
+
+
+def test_audio_command_queue(backend):
+    queue = backend.audio_command_queue(lease_seconds=30)
+    play = queue.push('bot-1', 'play', audio_file='a.mp3')
+    stop = queue.push('bot-1', 'stop')
+
+    first = queue.poll('bot-1')
+    assert (first['id'], first['command'], first['audio_file']) == (play['id'], 'play', 'a.mp3')
+    assert first['epoch'] == play['epoch']
+    second = queue.poll('bot-1', ack=first['id'], epoch=first['epoch'])
+    assert second['id'] == stop['id']
+    assert queue.poll('bot-1', ack=second['id'], epoch=second['epoch']) is None
+    assert queue.depth('bot-1') == 0
+
+
+def test_bot_registry(backend):
+    registry = backend.bot_registry()
+    registry.register('bot-1', agent_token='token-1', meeting_url='https://zoom.us/j/1', agent_name='Helper')
+    assert 'bot-1' in registry and len(registry) == 1
+    assert registry.by_token('token-1').bot_id == 'bot-1'
+
+    assert registry.record_status('bot-1', 'in_call_recording').state == STATE_ACTIVE
+    assert registry.record_status('bot-1', 'call_ended').state == STATE_ENDED
+    assert [change['code'] for change in registry.get('bot-1').status_changes] == ['in_call_recording', 'call_ended']
+
+    # Status webhooks for bots this process never deployed adopt them
+    registry.record_status('bot-2', 'joining_call')
+    assert 'bot-2' in registry
+    assert registry.remove('bot-1')
+    assert registry.get('bot-1') is None
+
+
+def test_sqlite_state_is_shared_between_backends_on_one_file(tmp_path):
+    path = str(tmp_path / 'state.db')
+    first, second = create_backend('sqlite', path), create_backend('sqlite', path)
+    assert first.epoch == second.epoch
+
+    first.transcript_store().append('bot-1', 'Ann', 'from worker one', 1000.0)
+    assert [line.text for line in second.transcript_store().snapshot('bot-1').lines] == ['from worker one']
+
+    pushed = first.audio_command_queue().push('bot-1', 'stop')
+    assert second.audio_command_queue().poll('bot-1')['id'] == pushed['id']
+
+    first.bot_registry().register('bot-1', agent_token='token-1')
+    assert second.bot_registry().by_token('token-1').bot_id == 'bot-1'
+
+    job = Job('delete_bots')
+    first.save_job(job)
+    assert second.load_job(job.id)['job_id'] == job.id
+    assert [saved['job_id'] for saved in second.recent_jobs()] == [job.id]
+
+
+def test_unknown_backend_is_refused():
+    with pytest.raises(ValueError):
+        create_backend('redis')
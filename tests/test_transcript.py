@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.fixture
+def etag(client, app_module):
+    app_module.transcripts.append('etag-bot', 'Ann', 'hello', 1000.0)
+    return client.get('/api/bot/etag-bot/transcript').headers['ETag']
+
+
+def test_matching_etag_is_not_modified(client, etag):
+    for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+        assert client.get('/api/bot/etag-bot/transcript', headers={'If-None-Match': header}).status_code == 304
+
+
+def test_etag_is_compared_whole(client, etag):
+    # The same tag with one more digit on the seq must not match
+    longer = etag[:-1] + '0"'
+    for header in (longer, f'"x{etag[1:]}'):
+        assert client.get('/api/bot/etag-bot/transcript', headers={'If-None-Match': header}).status_code == 200
@@ -0,0 +1,93 @@
+import json
+from array import array
+
+from transcript_buffer import TranscriptStore, lines_since, snapshot_body_since, word_timings
+
+
+def seqs(snapshot):
+    return [line.seq for line in snapshot.lines]
+
+
+def test_buffer_keeps_the_newest_lines():
+    store = TranscriptStore(max_lines=3)
+    for n in range(1, 6):
+        store.append('bot-1', 'Ann', f'line {n}', 1000.0 + n)
+
+    snapshot = store.snapshot('bot-1')
+    assert seqs(snapshot) == [3, 4, 5]
+    assert (snapshot.seq, snapshot.first_seq) == (5, 3)
+    assert [line['text'] for line in json.loads(snapshot.body)] == ['line 3', 'line 4', 'line 5']
+
+
+def test_snapshot_deltas_since_a_cursor():
+    store = TranscriptStore(max_lines=3)
+    for n in range(1, 6):
+        store.append('bot-1', 'Ann', f'line {n}', 1000.0 + n)
+    snapshot = store.snapshot('bot-1')
+
+    assert [line.seq for line in lines_since(snapshot, 4)] == [5]
+    assert json.loads(snapshot_body_since(snapshot, 4)) == [snapshot.lines[-1].to_dict()]
+    assert lines_since(snapshot, 5) == ()
+    # A cursor older than the buffer gets everything still buffered
+    assert snapshot_body_since(snapshot, 1) == snapshot.body
+    assert snapshot.jsonp_body == b'(' + snapshot.body + b');'
+
+
+def test_snapshot_is_cached_until_the_next_append():
+    store = TranscriptStore()
+    store.append('bot-1', 'Ann', 'hello', 1000.0)
+    first = store.snapshot('bot-1')
+    assert store.snapshot('bot-1') is first
+    store.append('bot-1', 'Ann', 'again', 1001.0)
+    assert store.snapshot('bot-1') is not first
+
+
+def test_fragments_from_one_speaker_merge():
+    store = TranscriptStore(merge_gap=2)
+    store.append('bot-1', 'Ann', 'so the plan', 1000.0)
+    line, _ = store.append('bot-1', 'Ann', 'is to ship friday', 1001.0)
+    assert (line.seq, line.replaces, line.text) == (2, 1, 'so the plan is to ship friday')
+
+    # Another speaker, or a long pause, starts a new line
+    other, _ = store.append('bot-1', 'Bob', 'sounds good', 1001.5)
+    late, _ = store.append('bot-1', 'Bob', 'see you then', 1010.0)
+    assert other.replaces is None and late.replaces is None
+    assert seqs(store.snapshot('bot-1')) == [2, 3, 4]
+
+
+def test_timed_fragments_merge_on_word_gaps():
+    store = TranscriptStore(merge_gap=1)
+    store.append('bot-1', 'Ann', 'hello', 1000.0, array('d', [0.0]), array('d', [0.4]))
+    line, _ = store.append('bot-1', 'Ann', 'there', 1030.0, array('d', [0.9]), array('d', [1.2]))
+    assert line.replaces == 1
+    assert (list(line.starts), list(line.ends)) == ([0.0, 0.9], [0.4, 1.2])
+    assert (line.to_dict()['start'], line.to_dict()['end']) == (0.0, 1.2)
+
+    gap, _ = store.append('bot-1', 'Ann', 'later', 1031.0, array('d', [5.0]), array('d', [5.5]))
+    assert gap.replaces is None
+
+
+def test_word_timings_need_every_word_timed():
+    words = [{'text': 'a', 'start_timestamp': {'relative': 1.0}, 'end_timestamp': {'relative': 1.5}},
+             {'text': 'b', 'start_timestamp': {'relative': 2.0}, 'end_timestamp': {'relative': 2.5}}]
+    starts, ends = word_timings(words)
+    assert (list(starts), list(ends)) == ([1.0, 2.0], [1.5, 2.5])
+    assert word_timings(words + [{'text': 'c'}]) == (None, None)
+
+
+def test_removed_bot_keeps_its_sequence():
+    store = TranscriptStore()
+    store.append('bot-1', 'Ann', 'one', 1000.0)
+    store.append('bot-1', 'Ann', 'two', 1001.0)
+    assert store.remove('bot-1')
+    line, _ = store.append('bot-1', 'Ann', 'three', 1002.0)
+    assert line.seq == 3
+
+
+def test_memory_budget_evicts_least_recently_updated_bots():
+    store = TranscriptStore(max_total_bytes=2000)
+    for bot_id in ('old', 'middle', 'new'):
+        for n in range(3):
+            store.append(bot_id, 'Ann', 'x' * 100 + str(n), 1000.0)
+    assert 'old' not in store and 'new' in store
+    assert store.stats()['evicted_bots'] >= 1
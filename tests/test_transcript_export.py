@@ -0,0 +1,79 @@
+import sqlite3
+from array import array
+
+from transcript_buffer import TranscriptLine
+from transcript_export import iter_log_lines, render
+from transcript_log import TranscriptLog
+
+
+def timed_line(seq, text, timestamp, start, end, replaces=None):
+    return TranscriptLine(seq, 'Ann', text, timestamp, array('d', [start]), array('d', [end]), replaces)
+
+
+def stored(tmp_path, lines):
+    log = TranscriptLog(str(tmp_path / 'transcripts.db')).start()
+    log.append_many(('bot-1', line) for line in lines)
+    assert log.flush()
+    return log
+
+
+def test_log_keeps_word_timings(tmp_path):
+    log = stored(tmp_path, [timed_line(1, 'hello there', 1000.0, 2.5, 3.25),
+                            TranscriptLine(2, 'Bob', 'no timings', 1001.0)])
+
+    lines, _ = log.query('bot-1')
+    assert lines[0]['start'] == 2.5 and lines[0]['end'] == 3.25
+    assert 'start' not in lines[1] and 'end' not in lines[1]
+
+
+def test_old_log_gains_timing_columns(tmp_path):
+    path = str(tmp_path / 'transcripts.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE transcript_lines (bot_id TEXT NOT NULL, seq INTEGER NOT NULL, '
+                 'speaker TEXT NOT NULL, text TEXT NOT NULL, timestamp REAL NOT NULL, '
+                 'PRIMARY KEY (bot_id, seq)) WITHOUT ROWID')
+    conn.execute("INSERT INTO transcript_lines VALUES ('bot-1', 1, 'Ann', 'from before', 1000.0)")
+    conn.commit()
+    conn.close()
+
+    log = TranscriptLog(path).start()
+    log.append('bot-1', timed_line(2, 'after the upgrade', 1005.0, 4.0, 5.5))
+    assert log.flush()
+
+    lines, _ = log.query('bot-1')
+    assert 'start' not in lines[0]
+    assert (lines[1]['start'], lines[1]['end']) == (4.0, 5.5)
+
+
+def test_srt_cues_use_word_timings(tmp_path):
+    log = stored(tmp_path, [timed_line(1, 'first line', 1010.0, 1.0, 2.5),
+                            timed_line(2, 'second line', 1012.0, 3.0, 4.75)])
+
+    srt = ''.join(render(iter_log_lines(log, 'bot-1'), 'srt', log.first_timestamp('bot-1')))
+    assert '00:00:01,000 --> 00:00:02,500' in srt
+    assert '00:00:03,000 --> 00:00:04,750' in srt
+
+
+def test_untimed_lines_fall_back_to_arrival(tmp_path):
+    # The timed line arrived at the origin and ended 2s into the recording, so the untimed
+    # line, arriving 14s after the origin, ends 16s into the recording
+    log = stored(tmp_path, [timed_line(1, 'timed', 1010.0, 1.0, 2.0),
+                            TranscriptLine(2, 'Ann', 'one two three four five', 1024.0)])
+
+    srt = ''.join(render(iter_log_lines(log, 'bot-1'), 'srt', log.first_timestamp('bot-1')))
+    assert '00:00:01,000 --> 00:00:02,000' in srt
+    assert '00:00:14,000 --> 00:00:16,000' in srt
+
+
+def test_cues_are_numbered_consecutively_across_pages(tmp_path, client, app_module, monkeypatch):
+    # Merges leave gaps in seq; players expect cues numbered 1..N
+    log = stored(tmp_path, [timed_line(seq, f'line {seq}', 1000.0 + seq, seq, seq + 0.5) for seq in (1, 4, 9, 12)])
+    monkeypatch.setattr(app_module, 'transcript_log', log)
+
+    first = client.get('/api/bot/bot-1/transcript/export?format=srt&limit=2')
+    second = client.get(f"/api/bot/bot-1/transcript/export?format=srt&limit=2&after_seq={first.headers['X-Next-Cursor']}")
+    vtt = client.get('/api/bot/bot-1/transcript/export?format=vtt')
+
+    assert [block.split('\n')[0] for block in first.text.strip().split('\n\n')] == ['1', '2']
+    assert [block.split('\n')[0] for block in second.text.strip().split('\n\n')] == ['3', '4']
+    assert [block.split('\n')[0] for block in vtt.text.strip().split('\n\n')[1:]] == ['1', '2', '3', '4']
@@ -0,0 +1,60 @@
+import json
+
+
+def transcript_event(bot_id, text, start, speaker='Ann'):
+    return {
+        'event': 'transcript.data',
+        'data': {
+            'bot': {'id': bot_id},
+            'data': {
+                'participant': {'id': 1, 'name': speaker},
+                'words': [{'text': text,
+                           'start_timestamp': {'relative': start},
+                           'end_timestamp': {'relative': start + 0.5}}]
+            }
+        }
+    }
+
+
+def test_batch_skips_malformed_events(client, app_module):
+    bot_id = 'batch-mixed-bot'
+    bad_word_missing_text = transcript_event(bot_id, 'x', 5.0)
+    del bad_word_missing_text['data']['data']['words'][0]['text']
+    bad_word_not_dict = transcript_event(bot_id, 'x', 6.0)
+    bad_word_not_dict['data']['data']['words'] = ['hello']
+    bad_timestamp = transcript_event(bot_id, 'x', 7.0)
+    bad_timestamp['data']['data']['words'][0]['start_timestamp'] = {'relative': 'soon'}
+    events = [
+        transcript_event(bot_id, 'first', 1.0),
+        bad_word_missing_text,
+        bad_word_not_dict,
+        bad_timestamp,
+        [1, 2, 3],
+        {'event': 'transcript.data', 'data': 'nope'},
+        transcript_event(bot_id, 'second', 20.0, speaker='Bob'),
+    ]
+    body = '\n'.join(json.dumps(event) for event in events)
+
+    response = client.post('/api/webhook/transcript/batch', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200
+    counts = response.get_json()
+    assert counts['events'] == 7
+    assert counts['accepted'] == 2
+    assert counts['ignored'] == 5
+
+    assert app_module.ingest_queue.flush()
+    assert [line.text for line in app_module.transcripts.snapshot(bot_id).lines] == ['first', 'second']
+
+    # A retry of the same body is recognised, not ingested again
+    retry = client.post('/api/webhook/transcript/batch', data=body, content_type='application/x-ndjson')
+    assert retry.get_json()['duplicates'] == 2
+    assert app_module.ingest_queue.flush()
+    assert len(app_module.transcripts.snapshot(bot_id).lines) == 2
+
+
+def test_single_webhook_ignores_malformed_words(client):
+    event = transcript_event('single-bad-bot', 'x', 1.0)
+    event['data']['data']['words'] = [{'start_timestamp': {'relative': 1.0}}]
+    response = client.post('/api/webhook/transcript', json=event)
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'ignoring, missing data'
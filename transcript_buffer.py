@@ -0,0 +1,383 @@
+# transcript_buffer.py - Bounded per-bot transcript storage
+import sys
+import json
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, namedtuple
+
+# Rough per-line cost of the slotted record and its text, on top of the encoded JSON
+LINE_OVERHEAD_BYTES = 120
+# Two doubles (start and end offset) per retained word
+WORD_TIMING_BYTES = 16
+
+# How many retired bots remember their last sequence number (see TranscriptStore.remove)
+RETIRED_SEQ_LIMIT = 10000
+
+
+def encode_json(data):
+    """Compact JSON bytes - the format all pre-serialized transcript payloads use"""
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def word_timings(words):
+    """
+    Per-word (starts, ends) offsets in seconds from a Recall words list, as compact
+    array('d') columns - or (None, None) unless every word carries both timestamps.
+    """
+    starts = array('d')
+    ends = array('d')
+    for word in words:
+        start = (word.get('start_timestamp') or {}).get('relative')
+        end = (word.get('end_timestamp') or {}).get('relative')
+        if start is None or end is None:
+            return None, None
+        starts.append(start)
+        ends.append(end)
+    return (starts, ends) if starts else (None, None)
+
+
+class TranscriptLine:
+    """
+    One transcript line (an utterance). Speaker names are interned so repeated speakers
+    share one string; word timings are kept as two array('d') columns of offsets.
+    A line merged from earlier fragments records the seq it replaces.
+    """
+    __slots__ = ('seq', 'speaker', 'text', 'timestamp', 'starts', 'ends', 'replaces', 'encoded', 'size')
+
+    def __init__(self, seq, speaker, text, timestamp, starts=None, ends=None, replaces=None):
+        self.seq = seq
+        self.speaker = sys.intern(speaker)
+        self.text = text
+        self.timestamp = timestamp
+        self.starts = starts
+        self.ends = ends
+        self.replaces = replaces
+        # Encoded once on write so readers never have to
+        self.encoded = encode_json(self.to_dict())
+        self.size = (len(self.encoded) + len(text) + LINE_OVERHEAD_BYTES
+                     + (len(starts) * WORD_TIMING_BYTES if starts else 0))
+
+    def to_dict(self):
+        data = {
+            "seq": self.seq,
+            "speaker": self.speaker,
+            "text": self.text,
+            "timestamp": self.timestamp
+        }
+        if self.starts:
+            # Offsets of the first and last word in the recording, in seconds
+            data["start"] = self.starts[0]
+            data["end"] = self.ends[-1]
+        if self.replaces is not None:
+            data["replaces"] = self.replaces
+        return data
+
+    def can_merge(self, speaker, text, timestamp, starts, max_gap, max_chars):
+        """True if a fragment continues this utterance: same speaker, close in time, short enough"""
+        if speaker != self.speaker or len(self.text) + len(text) + 1 > max_chars:
+            return False
+        if self.ends and starts:
+            return 0 <= starts[0] - self.ends[-1] <= max_gap
+        return timestamp - self.timestamp <= max_gap
+
+    def merged(self, seq, text, timestamp, starts, ends):
+        """A new line joining this one and the next fragment"""
+        timed = self.starts is not None and starts is not None
+        return TranscriptLine(
+            seq, self.speaker, self.text + ' ' + text, timestamp,
+            self.starts + starts if timed else None,
+            self.ends + ends if timed else None,
+            replaces=self.seq
+        )
+
+
+# Pre-encoded view of a bot's transcript buffer. Snapshots are immutable, so readers
+# grab the current one and serve its bytes without encoding.
+#   seq        - sequence number of the newest line (0 when empty)
+#   first_seq  - sequence number of the oldest buffered line
+#   lines      - tuple of TranscriptLine, oldest first (sequence numbers increase but
+#                have gaps where merged fragments were replaced)
+#   body       - JSON array of every buffered line
+#   jsonp_body - body wrapped as "(<body>);" so JSONP only needs the callback name prepended
+TranscriptSnapshot = namedtuple('TranscriptSnapshot', 'seq first_seq lines body jsonp_body')
+EMPTY_TRANSCRIPT_SNAPSHOT = TranscriptSnapshot(0, 1, (), b'[]', b'([]);')
+
+
+def build_snapshot(seq, lines):
+    """TranscriptSnapshot of lines (a tuple, oldest first) whose newest sequence number is seq"""
+    if not lines:
+        return TranscriptSnapshot(seq, seq + 1, (), b'[]', b'([]);')
+    body = b'[' + b','.join(line.encoded for line in lines) + b']'
+    return TranscriptSnapshot(
+        seq=seq,
+        first_seq=lines[0].seq,
+        lines=lines,
+        body=body,
+        jsonp_body=b'(' + body + b');'
+    )
+
+
+def lines_since(snapshot, since):
+    """Snapshot lines newer than since"""
+    if since < snapshot.first_seq:
+        return snapshot.lines
+    return snapshot.lines[bisect_right(snapshot.lines, since, key=lambda line: line.seq):]
+
+
+def snapshot_body_since(snapshot, since):
+    """JSON array bytes of the snapshot lines newer than since, without re-encoding"""
+    if since < snapshot.first_seq:
+        return snapshot.body
+    return b'[' + b','.join(line.encoded for line in lines_since(snapshot, since)) + b']'
+
+
+class TranscriptBuffer:
+    """
+    Fixed-capacity ring of transcript lines for one bot.
+    Appends are O(1); the oldest lines are dropped once the line or byte cap is hit.
+    With merging enabled, a fragment that continues the newest line replaces it.
+    """
+    __slots__ = ('bot_id', 'capacity', 'max_bytes', 'seq', 'bytes', 'created_at', 'updated_at',
+                 '_slots', '_start', '_count', '_snapshot')
+
+    def __init__(self, bot_id, capacity, max_bytes, seq=0):
+        self.bot_id = bot_id
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.seq = seq
+        self.bytes = 0
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self._slots = [None] * capacity
+        self._start = 0
+        self._count = 0
+        self._snapshot = EMPTY_TRANSCRIPT_SNAPSHOT
+
+    def __len__(self):
+        return self._count
+
+    def _drop_oldest(self):
+        line = self._slots[self._start]
+        self._slots[self._start] = None
+        self._start = (self._start + 1) % self.capacity
+        self._count -= 1
+        self.bytes -= line.size
+
+    def _drop_newest(self):
+        index = (self._start + self._count - 1) % self.capacity
+        line = self._slots[index]
+        self._slots[index] = None
+        self._count -= 1
+        self.bytes -= line.size
+
+    def append(self, speaker, text, timestamp, starts=None, ends=None, merge_gap=0, merge_max_chars=0):
+        """
+        Add a line with the next sequence number and return it.
+        If merge_gap is set and the fragment continues the newest line, the returned
+        line replaces that one (its replaces field holds the old seq).
+        """
+        self.seq += 1
+        last = self._slots[(self._start + self._count - 1) % self.capacity] if self._count else None
+        if last is not None and merge_gap and last.can_merge(speaker, text, timestamp, starts,
+                                                             merge_gap, merge_max_chars):
+            line = last.merged(self.seq, text, timestamp, starts, ends)
+            self._drop_newest()
+        else:
+            line = TranscriptLine(self.seq, speaker, text, timestamp, starts, ends)
+
+        if self._count == self.capacity:
+            self._drop_oldest()
+        while self._count and self.bytes + line.size > self.max_bytes:
+            self._drop_oldest()
+
+        self._slots[(self._start + self._count) % self.capacity] = line
+        self._count += 1
+        self.bytes += line.size
+        self.updated_at = time.time()
+        # The snapshot is rebuilt lazily, once per version, by the first reader
+        self._snapshot = None
+        return line
+
+    def lines(self):
+        """Buffered lines, oldest first"""
+        slots, start, capacity = self._slots, self._start, self.capacity
+        return [slots[(start + i) % capacity] for i in range(self._count)]
+
+    def snapshot(self):
+        """Current TranscriptSnapshot - the caller must hold the shard lock"""
+        if self._snapshot is None:
+            self._snapshot = build_snapshot(self.seq, tuple(self.lines()))
+        return self._snapshot
+
+
+class _Shard:
+    """One slice of the store: its own lock, buffers and byte count"""
+    __slots__ = ('lock', 'updated', 'buffers', 'retired_seq', 'bytes')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.updated = threading.Condition(self.lock)  # Notified on every new line in this shard
+        self.buffers = OrderedDict()      # bot_id -> TranscriptBuffer, least recently updated first
+        self.retired_seq = OrderedDict()  # bot_id -> last seq of a removed buffer
+        self.bytes = 0
+
+
+class TranscriptStore:
+    """
+    Transcript buffers for every bot, with a global memory budget.
+    Bots are hash-sharded across independent locks, so a busy meeting only contends
+    with the few bots that share its shard. When the budget is exceeded, whole bots
+    are evicted least recently updated first.
+    """
+
+    def __init__(self, max_lines=20, max_bytes_per_bot=64 * 1024, max_total_bytes=64 * 1024 * 1024,
+                 seq_seed=None, shards=32, merge_gap=0, merge_max_chars=500):
+        self.max_lines = max_lines
+        # Consecutive same-speaker fragments at most merge_gap seconds apart become one line
+        self.merge_gap = merge_gap
+        self.merge_max_chars = merge_max_chars
+        self.max_bytes_per_bot = max_bytes_per_bot
+        self.max_total_bytes = max_total_bytes
+        self.evicted_bots = 0
+        self._shards = [_Shard() for _ in range(max(1, shards))]
+        # Only taken when the budget is exceeded, never on the normal append path
+        self._budget_lock = threading.Lock()
+        # Optional bot_id -> last persisted seq, so numbering survives restarts
+        self.seq_seed = seq_seed
+
+    def _shard(self, bot_id):
+        return self._shards[hash(bot_id) % len(self._shards)]
+
+    @property
+    def total_bytes(self):
+        return sum(shard.bytes for shard in self._shards)
+
+    def append(self, bot_id, speaker, text, timestamp, starts=None, ends=None):
+        """
+        Append a line for bot_id, enforce the memory budget and wake waiting readers.
+        Returns (line, evicted bot IDs); line.replaces is set when it absorbed the previous line.
+        """
+        lines, evicted = self.append_many(bot_id, ((speaker, text, timestamp, starts, ends),))
+        return lines[0], evicted
+
+    def append_many(self, bot_id, entries):
+        """
+        Append (speaker, text, timestamp, starts, ends) entries for bot_id in order under a
+        single lock acquisition, waking readers once. Returns (lines, evicted bot IDs).
+        """
+        shard = self._shard(bot_id)
+        with shard.lock:
+            buffer = shard.buffers.get(bot_id)
+            if buffer is None:
+                # Carry the sequence over so cursors and ETags never repeat for a bot
+                seq = shard.retired_seq.pop(bot_id, None)
+                if seq is None:
+                    seq = self.seq_seed(bot_id) if self.seq_seed else 0
+                buffer = TranscriptBuffer(bot_id, self.max_lines, self.max_bytes_per_bot, seq=seq)
+                shard.buffers[bot_id] = buffer
+            else:
+                shard.buffers.move_to_end(bot_id)
+
+            before = buffer.bytes
+            lines = [buffer.append(speaker, text, timestamp, starts, ends,
+                                   merge_gap=self.merge_gap, merge_max_chars=self.merge_max_chars)
+                     for speaker, text, timestamp, starts, ends in entries]
+            shard.bytes += buffer.bytes - before
+            shard.updated.notify_all()
+
+        evicted = self._enforce_budget(keep=bot_id) if self.total_bytes > self.max_total_bytes else []
+        return lines, evicted
+
+    def _enforce_budget(self, keep):
+        evicted = []
+        with self._budget_lock:
+            while self.total_bytes > self.max_total_bytes:
+                # The least recently updated bot is at the head of one of the shards
+                oldest = None
+                for shard in self._shards:
+                    with shard.lock:
+                        for bot_id, buffer in shard.buffers.items():
+                            if bot_id != keep and (oldest is None or buffer.updated_at < oldest[1]):
+                                oldest = (bot_id, buffer.updated_at)
+                            break
+                if oldest is None:
+                    break
+                if self.remove(oldest[0]):
+                    self.evicted_bots += 1
+                    evicted.append(oldest[0])
+        return evicted
+
+    def _remove_locked(self, shard, bot_id):
+        buffer = shard.buffers.pop(bot_id, None)
+        if buffer is None:
+            return False
+        shard.bytes -= buffer.bytes
+        shard.retired_seq[bot_id] = buffer.seq
+        while len(shard.retired_seq) > RETIRED_SEQ_LIMIT // len(self._shards) + 1:
+            shard.retired_seq.popitem(last=False)
+        return True
+
+    def remove(self, bot_id):
+        """Drop a bot's buffer; returns True if it existed"""
+        shard = self._shard(bot_id)
+        with shard.lock:
+            return self._remove_locked(shard, bot_id)
+
+    def keep_only(self, bot_ids):
+        """Drop every buffer whose bot is not in bot_ids; returns the removed bot IDs"""
+        removed = []
+        for shard in self._shards:
+            with shard.lock:
+                doomed = [bot_id for bot_id in shard.buffers if bot_id not in bot_ids]
+                for bot_id in doomed:
+                    self._remove_locked(shard, bot_id)
+            removed.extend(doomed)
+        return removed
+
+    def snapshot(self, bot_id):
+        """Current TranscriptSnapshot for bot_id (empty if unknown)"""
+        shard = self._shard(bot_id)
+        with shard.lock:
+            buffer = shard.buffers.get(bot_id)
+            return buffer.snapshot() if buffer is not None else EMPTY_TRANSCRIPT_SNAPSHOT
+
+    def latest_seq(self, bot_id):
+        buffer = self._shard(bot_id).buffers.get(bot_id)
+        return buffer.seq if buffer is not None else 0
+
+    def wait_for_line(self, bot_id, after_seq, timeout):
+        """Block until bot_id has a line newer than after_seq or timeout passes; returns the latest seq"""
+        shard = self._shard(bot_id)
+        with shard.updated:
+            shard.updated.wait_for(lambda: self.latest_seq(bot_id) > after_seq, timeout=timeout)
+        return self.latest_seq(bot_id)
+
+    def __contains__(self, bot_id):
+        return bot_id in self._shard(bot_id).buffers
+
+    def _all_buffers(self):
+        buffers = []
+        for shard in self._shards:
+            with shard.lock:
+                buffers.extend(shard.buffers.values())
+        return buffers
+
+    def bot_ids(self):
+        """Bot IDs with buffered transcript data, most recently updated first"""
+        buffers = sorted(self._all_buffers(), key=lambda buffer: buffer.updated_at, reverse=True)
+        return [buffer.bot_id for buffer in buffers]
+
+    def line_counts(self):
+        """bot_id -> number of buffered lines"""
+        return {buffer.bot_id: len(buffer) for buffer in self._all_buffers()}
+
+    def stats(self):
+        return {
+            "bots": sum(len(shard.buffers) for shard in self._shards),
+            "shards": len(self._shards),
+            "total_bytes": self.total_bytes,
+            "max_total_bytes": self.max_total_bytes,
+            "evicted_bots": self.evicted_bots
+        }
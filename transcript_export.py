@@ -0,0 +1,124 @@
+# transcript_export.py - Streaming transcript exports (NDJSON, plain text, SRT, WebVTT)
+import json
+import zlib
+from datetime import datetime
+
+# format -> (Content-Type, file extension)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'txt': ('text/plain; charset=utf-8', 'txt'),
+    'srt': ('application/x-subrip; charset=utf-8', 'srt'),
+    'vtt': ('text/vtt; charset=utf-8', 'vtt')
+}
+
+# Subtitle cues use the line's word timings; lines stored without them end when they
+# arrived and their start is estimated from the word count
+SECONDS_PER_WORD = 0.4
+MIN_CUE_SECONDS = 1.0
+MAX_CUE_SECONDS = 10.0
+
+
+def iter_log_lines(log, bot_id, after_seq=0, until_seq=None, page_size=1000):
+    """Yield a bot's stored lines oldest first, one page of the log in memory at a time"""
+    cursor = after_seq
+    while True:
+        lines, next_cursor = log.query(bot_id, after_seq=cursor, until_seq=until_seq, limit=page_size)
+        yield from lines
+        if next_cursor is None:
+            return
+        cursor = next_cursor
+
+
+def _clock(seconds, separator):
+    millis = int(round(max(seconds, 0) * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f'{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}'
+
+
+def _cues(lines, origin):
+    """
+    (line, start, end) in seconds; cues never overlap the previous one.
+    Timed lines use their recording offsets. Untimed ones are placed by arrival since
+    origin, shifted by how far arrival lagged the recording on the last timed line.
+    """
+    previous_end = 0.0
+    lag = 0.0
+    for line in lines:
+        arrived = line['timestamp'] - origin
+        if line.get('start') is not None and line.get('end') is not None:
+            start, end = line['start'], line['end']
+            lag = arrived - end
+        else:
+            end = max(arrived - lag, 0.0)
+            duration = min(max(len(line['text'].split()) * SECONDS_PER_WORD, MIN_CUE_SECONDS), MAX_CUE_SECONDS)
+            start = end - duration
+        start = max(start, previous_end)
+        if start >= end:
+            end = start + MIN_CUE_SECONDS
+        previous_end = end
+        yield line, start, end
+
+
+def render(lines, fmt, origin=None, first_cue=1):
+    """
+    Yield the export of lines as text chunks, one per line (plus any header).
+    origin is the meeting's first timestamp; subtitle times of lines without word
+    timings are relative to it, so consecutive pages of one meeting line up.
+    Cues are numbered consecutively from first_cue - seqs have gaps where lines merged.
+    """
+    if fmt == 'ndjson':
+        for line in lines:
+            yield json.dumps(line, ensure_ascii=False) + '\n'
+    elif fmt == 'txt':
+        for line in lines:
+            spoken_at = datetime.fromtimestamp(line['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
+            yield f"[{spoken_at}] {line['speaker']}: {line['text']}\n"
+    elif fmt == 'srt':
+        for cue, (line, start, end) in enumerate(_cues(lines, origin or 0), first_cue):
+            yield (f"{cue}\n{_clock(start, ',')} --> {_clock(end, ',')}\n"
+                   f"{line['speaker']}: {line['text']}\n\n")
+    elif fmt == 'vtt':
+        yield 'WEBVTT\n\n'
+        for cue, (line, start, end) in enumerate(_cues(lines, origin or 0), first_cue):
+            speaker = line['speaker'].replace('>', '')
+            text = line['text'].replace('&', '&amp;').replace('<', '&lt;')
+            yield f"{cue}\n{_clock(start, '.')} --> {_clock(end, '.')}\n<v {speaker}>{text}\n\n"
+    else:
+        raise ValueError(f'Unknown export format {fmt!r}')
+
+
+def gzip_stream(chunks, level=6, flush_bytes=64 * 1024):
+    """
+    Gzip text chunks on the fly, yielding compressed bytes.
+    The compressor is flushed every flush_bytes of input so output keeps streaming.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)   # wbits 31 = gzip container
+    pending = 0
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        pending += len(data)
+        out = compressor.compress(data)
+        if pending >= flush_bytes:
+            out += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def encode_stream(chunks, buffer_bytes=16 * 1024):
+    """UTF-8 encode text chunks, coalescing them into writes of about buffer_bytes"""
+    buffered = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        buffered.append(data)
+        size += len(data)
+        if size >= buffer_bytes:
+            yield b''.join(buffered)
+            buffered = []
+            size = 0
+    if buffered:
+        yield b''.join(buffered)
@@ -0,0 +1,256 @@
+# transcript_log.py - Durable append-only transcript log (SQLite in WAL mode)
+import queue
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcript_lines (
+    bot_id    TEXT    NOT NULL,
+    seq       INTEGER NOT NULL,
+    speaker   TEXT    NOT NULL,
+    text      TEXT    NOT NULL,
+    timestamp REAL    NOT NULL,
+    start_offset REAL,   -- First and last word's offset in the recording (seconds), when Recall sent timings
+    end_offset   REAL,
+    PRIMARY KEY (bot_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_transcript_lines_time ON transcript_lines (bot_id, timestamp);
+"""
+
+# Columns added since the first schema, for logs created before them
+ADDED_COLUMNS = (('start_offset', 'REAL'), ('end_offset', 'REAL'))
+
+# Hard ceiling on one page of history, whatever the caller asks for
+MAX_PAGE_SIZE = 1000
+
+
+class TranscriptLog:
+    """
+    Appends every transcript line to SQLite without blocking the caller.
+    A background flusher drains the queue and commits each batch in one transaction
+    (group commit), so the webhook handler never waits on the disk.
+    """
+
+    def __init__(self, path, batch_size=500, flush_interval=0.25):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        self._thread = None
+        self._init_schema()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # WAL + NORMAL only syncs at checkpoints - durable across app crashes, fast per commit
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(transcript_lines)')}
+            for name, kind in ADDED_COLUMNS:
+                if name not in columns:
+                    conn.execute(f'ALTER TABLE transcript_lines ADD COLUMN {name} {kind}')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _reader(self):
+        """Per-thread read connection - sqlite3 connections can't be shared across threads"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def start(self):
+        """Start the background flusher (idempotent)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='transcript-log-flusher', daemon=True)
+            self._thread.start()
+        return self
+
+    def append(self, bot_id, line):
+        """
+        Queue a TranscriptLine for writing - never blocks.
+        A merged line deletes the row it replaces, so history holds each utterance once.
+        """
+        start, end = (line.starts[0], line.ends[-1]) if line.starts else (None, None)
+        self._queue.put_nowait((bot_id, line.seq, line.speaker, line.text, line.timestamp, start, end,
+                                line.replaces))
+
+    def append_many(self, rows):
+        """Queue (bot_id, TranscriptLine) pairs for writing"""
+        for bot_id, line in rows:
+            self.append(bot_id, line)
+
+    def backlog(self):
+        """Lines queued but not yet committed"""
+        return self._queue.qsize()
+
+    def flush(self, timeout=10):
+        """Wait until everything queued so far is committed (used at shutdown)"""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.01)
+        return self._queue.unfinished_tasks == 0
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            # Give a busy meeting a moment to fill the batch, then take everything queued
+            deadline = time.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                with conn:
+                    conn.executemany(
+                        'INSERT OR IGNORE INTO transcript_lines '
+                        '(bot_id, seq, speaker, text, timestamp, start_offset, end_offset) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        [row[:7] for row in batch]
+                    )
+                    # Superseded fragments go in the same transaction as the line that replaces them
+                    conn.executemany(
+                        'DELETE FROM transcript_lines WHERE bot_id = ? AND seq = ?',
+                        [(row[0], row[7]) for row in batch if row[7] is not None]
+                    )
+                self.written += len(batch)
+                self.batches += 1
+            except sqlite3.Error as e:
+                self.errors += 1
+                print(f"❌ Transcript log write failed ({len(batch)} lines): {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def last_seq(self, bot_id):
+        """Highest sequence number stored for bot_id (0 if none)"""
+        row = self._reader().execute(
+            'SELECT MAX(seq) FROM transcript_lines WHERE bot_id = ?', (bot_id,)
+        ).fetchone()
+        return row[0] or 0
+
+    def query(self, bot_id, after_seq=0, until_seq=None, start=None, end=None, limit=100):
+        """
+        One page of a bot's stored transcript, oldest first.
+        Filters by sequence range (after_seq, until_seq] and/or time range [start, end).
+        Returns (lines, next_cursor) where next_cursor is the after_seq of the next page or None.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        sql = ('SELECT seq, speaker, text, timestamp, start_offset, end_offset FROM transcript_lines '
+               'WHERE bot_id = ? AND seq > ?')
+        params = [bot_id, after_seq]
+        if until_seq is not None:
+            sql += ' AND seq <= ?'
+            params.append(until_seq)
+        if start is not None:
+            sql += ' AND timestamp >= ?'
+            params.append(start)
+        if end is not None:
+            sql += ' AND timestamp < ?'
+            params.append(end)
+        # Fetch one extra row to know whether another page exists
+        sql += ' ORDER BY seq LIMIT ?'
+        params.append(limit + 1)
+
+        rows = self._reader().execute(sql, params).fetchall()
+        lines = [_line_dict(row) for row in rows[:limit]]
+        next_cursor = lines[-1]['seq'] if len(rows) > limit else None
+        return lines, next_cursor
+
+    def count(self, bot_id, until_seq=None):
+        """Stored lines for bot_id, or just those up to and including until_seq"""
+        if until_seq is None:
+            row = self._reader().execute(
+                'SELECT COUNT(*) FROM transcript_lines WHERE bot_id = ?', (bot_id,)
+            ).fetchone()
+        else:
+            row = self._reader().execute(
+                'SELECT COUNT(*) FROM transcript_lines WHERE bot_id = ? AND seq <= ?', (bot_id, until_seq)
+            ).fetchone()
+        return row[0]
+
+    def first_timestamp(self, bot_id):
+        """Timestamp of the oldest stored line for bot_id, or None"""
+        row = self._reader().execute(
+            'SELECT timestamp FROM transcript_lines WHERE bot_id = ? ORDER BY seq LIMIT 1', (bot_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def page_end(self, bot_id, after_seq, limit):
+        """
+        Bounds of the next limit lines after after_seq, without reading them.
+        Returns (until_seq, next_cursor): the page's last seq (None if it runs to the end)
+        and the cursor of the page after it (None if there is none).
+        """
+        row = self._reader().execute(
+            'SELECT seq FROM transcript_lines WHERE bot_id = ? AND seq > ? ORDER BY seq LIMIT 1 OFFSET ?',
+            (bot_id, after_seq, limit - 1)
+        ).fetchone()
+        if row is None:
+            return None, None
+        more = self._reader().execute(
+            'SELECT 1 FROM transcript_lines WHERE bot_id = ? AND seq > ? LIMIT 1', (bot_id, row[0])
+        ).fetchone()
+        return (row[0], row[0]) if more else (row[0], None)
+
+    def iter_lines(self, batch_size=5000):
+        """Yield (bot_id, line dict) for every stored line, in (bot_id, seq) order"""
+        last_key = ('', 0)
+        while True:
+            rows = self._reader().execute(
+                'SELECT bot_id, seq, speaker, text, timestamp, start_offset, end_offset FROM transcript_lines '
+                'WHERE (bot_id, seq) > (?, ?) ORDER BY bot_id, seq LIMIT ?',
+                (last_key[0], last_key[1], batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row['bot_id'], _line_dict(row)
+            last_key = (rows[-1]['bot_id'], rows[-1]['seq'])
+
+    def bot_ids(self):
+        """Every bot with stored transcript lines"""
+        rows = self._reader().execute('SELECT DISTINCT bot_id FROM transcript_lines').fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "written": self.written,
+            "batches": self.batches,
+            "errors": self.errors,
+            "backlog": self.backlog()
+        }
+
+
+def _line_dict(row):
+    """A stored line in the shape TranscriptLine.to_dict() gives live ones"""
+    line = {
+        "seq": row['seq'],
+        "speaker": row['speaker'],
+        "text": row['text'],
+        "timestamp": row['timestamp']
+    }
+    if row['start_offset'] is not None and row['end_offset'] is not None:
+        line["start"] = row['start_offset']
+        line["end"] = row['end_offset']
+    return line
@@ -0,0 +1,189 @@
+# transcript_search.py - Incremental full-text index over meeting transcripts
+import math
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z0-9]+)*")
+PHRASE_RE = re.compile(r'"([^"]+)"')
+
+# BM25 tuning - the usual defaults
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Characters of context shown either side of the first match
+SNIPPET_CONTEXT = 60
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class TranscriptIndex:
+    """
+    Inverted index of transcript lines, built incrementally as lines arrive.
+    Queries intersect posting lists (every term must match), rank with BM25 and
+    can be narrowed by bot, speaker and time range. Quoted phrases must match exactly.
+    """
+
+    def __init__(self, max_docs=1000000):
+        self.max_docs = max_docs
+        self.lock = threading.Lock()
+        self._postings = {}      # term -> {doc_id: term frequency}
+        # doc_id -> (bot_id, seq, speaker, timestamp, text, length), oldest first for evicting
+        # past max_docs - removing a superseded line leaves nothing behind
+        self._docs = OrderedDict()
+        self._doc_ids = {}       # (bot_id, seq) -> doc_id
+        self._next_doc_id = 0
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, bot_id, seq, speaker, text, timestamp):
+        """Index one line; re-adding the same (bot_id, seq) is a no-op"""
+        terms = tokenize(text)
+        with self.lock:
+            if (bot_id, seq) in self._doc_ids:
+                return False
+            doc_id = self._next_doc_id
+            self._next_doc_id += 1
+
+            frequencies = {}
+            for term in terms:
+                frequencies[term] = frequencies.get(term, 0) + 1
+            for term, count in frequencies.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[sys.intern(term)] = {}
+                postings[doc_id] = count
+
+            self._docs[doc_id] = (bot_id, seq, sys.intern(speaker), timestamp, text, len(terms))
+            self._doc_ids[(bot_id, seq)] = doc_id
+            self._total_length += len(terms)
+
+            while len(self._docs) > self.max_docs:
+                self._remove_locked(next(iter(self._docs)))
+        return True
+
+    def remove(self, bot_id, seq):
+        """Drop a line from the index (e.g. when it has been superseded)"""
+        with self.lock:
+            doc_id = self._doc_ids.get((bot_id, seq))
+            if doc_id is None:
+                return False
+            self._remove_locked(doc_id)
+        return True
+
+    def _remove_locked(self, doc_id):
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        bot_id, seq, _, _, text, length = doc
+        del self._doc_ids[(bot_id, seq)]
+        self._total_length -= length
+        for term in set(tokenize(text)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def search(self, query, bot_id=None, speaker=None, start=None, end=None, limit=20, offset=0):
+        """Ranked matches for query; returns (total_matches, page of result dicts)"""
+        phrases = [phrase.lower() for phrase in PHRASE_RE.findall(query)]
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return 0, []
+
+        with self.lock:
+            posting_lists = []
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    return 0, []
+                posting_lists.append((term, postings))
+            # Intersect starting from the rarest term so the candidate set stays small
+            posting_lists.sort(key=lambda item: len(item[1]))
+            candidates = set(posting_lists[0][1])
+            for _, postings in posting_lists[1:]:
+                candidates.intersection_update(postings)
+                if not candidates:
+                    return 0, []
+
+            doc_count = len(self._docs)
+            avg_length = self._total_length / doc_count if doc_count else 1
+            idf = {
+                term: math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for term, postings in posting_lists
+            }
+
+            scored = []
+            for doc_id in candidates:
+                doc = self._docs[doc_id]
+                doc_bot_id, _, doc_speaker, timestamp, text, length = doc
+                if bot_id is not None and doc_bot_id != bot_id:
+                    continue
+                if speaker is not None and doc_speaker.lower() != speaker.lower():
+                    continue
+                if start is not None and timestamp < start:
+                    continue
+                if end is not None and timestamp >= end:
+                    continue
+                if phrases and not all(phrase in text.lower() for phrase in phrases):
+                    continue
+
+                score = 0.0
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                for term, postings in posting_lists:
+                    tf = postings[doc_id]
+                    score += idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+                scored.append((score, timestamp, doc))
+
+        # Best score first; newer lines win ties
+        scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        page = scored[offset:offset + limit]
+        return len(scored), [
+            {
+                "bot_id": doc[0],
+                "seq": doc[1],
+                "speaker": doc[2],
+                "timestamp": doc[3],
+                "snippet": make_snippet(doc[4], phrases or terms),
+                "score": round(score, 4)
+            }
+            for score, _, doc in page
+        ]
+
+    def backfill(self, transcript_log):
+        """Index every line already in the durable log (run in the background at startup)"""
+        added = 0
+        for bot_id, line in transcript_log.iter_lines():
+            if self.add(bot_id, line['seq'], line['speaker'], line['text'], line['timestamp']):
+                added += 1
+        return added
+
+    def stats(self):
+        with self.lock:
+            return {
+                "documents": len(self._docs),
+                "terms": len(self._postings),
+                "max_docs": self.max_docs
+            }
+
+
+def make_snippet(text, needles):
+    """Cut text down to the area around the first needle found"""
+    lowered = text.lower()
+    position = -1
+    for needle in needles:
+        position = lowered.find(needle)
+        if position >= 0:
+            break
+    if position < 0 or len(text) <= 2 * SNIPPET_CONTEXT:
+        return text if len(text) <= 2 * SNIPPET_CONTEXT else text[:2 * SNIPPET_CONTEXT] + '…'
+
+    begin = max(position - SNIPPET_CONTEXT, 0)
+    finish = min(position + SNIPPET_CONTEXT, len(text))
+    return ('…' if begin > 0 else '') + text[begin:finish] + ('…' if finish < len(text) else '')
@@ -0,0 +1,98 @@
+# ttl_cache.py - Read-through TTL cache with single-flight loading
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+    """One in-progress load that concurrent callers for the same key wait on"""
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Caches loader results for ttl seconds.
+    Concurrent misses for one key share a single load (single-flight), and an
+    invalidation during a load keeps that possibly stale result out of the cache.
+    """
+
+    def __init__(self, ttl, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (expires_at, value), least recently used first
+        self._flights = {}              # key -> _Flight
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.collapsed = 0
+
+    def get(self, key, loader, cache_if=None):
+        """
+        Cached value for key, calling loader() on a miss.
+        cache_if(value) decides whether a loaded value may be cached (e.g. only successes).
+        Exceptions from loader propagate to every caller waiting on that load.
+        """
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.collapsed += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                generation = self._generation
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self._flights[key]
+                cacheable = flight.error is None and (cache_if is None or cache_if(flight.value))
+                if cacheable and generation == self._generation:
+                    self._entries[key] = (time.monotonic() + self.ttl, flight.value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            flight.done.set()
+        return flight.value
+
+    def invalidate(self, *keys):
+        """Drop the given keys, or everything when no keys are given"""
+        with self.lock:
+            self._generation += 1
+            if keys:
+                for key in keys:
+                    self._entries.pop(key, None)
+            else:
+                self._entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self._entries),
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "collapsed": self.collapsed
+            }